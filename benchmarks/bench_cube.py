@@ -0,0 +1,70 @@
+"""Benchmark of the overview cube: build time and the slowest two-dimension pivot
+
+Cases get random quarters, countries, sexes, age groups, report types, a
+Zipf-distributed suspect drug and 1-5 Zipf-distributed PTs.
+
+    python benchmarks/bench_cube.py --cases 400000
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_signals import zipf_labels
+from dsgcore.cube import CUBE_DIMENSIONS, CaseCube
+
+def synthetic_cases(rng, n, drugs, pts):
+    """Case frame with the columns the cube reads"""
+    pt_counts = rng.integers(1, 6, n)
+    pt_names = zipf_labels(rng, int(pt_counts.sum()), pts, 'PT')
+    packed_pts = [' ; '.join(chunk) for chunk in np.split(pt_names, np.cumsum(pt_counts)[:-1])]
+    days = rng.integers(0, 5 * 365, n)
+    return pd.DataFrame({
+        'primaryid': np.arange(n) + 1_000_000,
+        'caseid': np.arange(n) + 100_000,
+        'caseversion': 1,
+        'fda_dt': (pd.Timestamp('2020-01-01') + pd.to_timedelta(days, unit='D')).strftime('%Y%m%d'),
+        'occr_country': rng.choice(['US', 'GB', 'DE', 'FR', 'JP', 'CA', 'IT', 'ES', 'BR', 'CN'], n),
+        'sex': rng.choice(['F', 'M', 'UNK'], n, p=[0.55, 0.4, 0.05]),
+        'age_grp': rng.choice(['N', 'I', 'C', 'T', 'A', 'E'], n),
+        'rept_cod': rng.choice(['EXP', 'PER', 'DIR'], n, p=[0.8, 0.15, 0.05]),
+        'drug_seq': '1 ; 2',
+        'role_cod': 'PS ; C',
+        'drugname': [f'{d} ; ASPIRIN' for d in zipf_labels(rng, n, drugs, 'DRUG')],
+        'pt': packed_pts,
+    })
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=400_000)
+    parser.add_argument('--drugs', type=int, default=40_000)
+    parser.add_argument('--pts', type=int, default=15_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    df = synthetic_cases(rng, args.cases, args.drugs, args.pts)
+
+    start = time.perf_counter()
+    cube = CaseCube.from_frame(df)
+    print(f"cube build for {len(cube):,} cases: {time.perf_counter() - start:.2f}s")
+
+    filters = [None, {'sex': ['F']}, {'quarter': ['2022Q3'], 'occr_country': ['US']}]
+    timings = []
+    for (row_dim, col_dim), flt in itertools.product(itertools.permutations(CUBE_DIMENSIONS, 2), filters):
+        start = time.perf_counter()
+        cube.pivot(row_dim, col_dim, flt)
+        timings.append((time.perf_counter() - start, row_dim, col_dim, flt))
+    timings.sort(key=lambda t: t[0])
+    seconds = np.array([t[0] for t in timings]) * 1000
+    print(f"{len(timings)} pivots: median {np.median(seconds):.1f} ms, max {seconds.max():.1f} ms "
+          f"({timings[-1][1]} x {timings[-1][2]}, filters {timings[-1][3]})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Upload formats benchmark: bytes sent and read time of each accepted format
+
+One seeded synthetic case file (dsgcore.synthetic, cached like bench_suite)
+is written as plain CSV, CSV compressed with gzip, zip and zstd (when the
+zstandard package is installed), Parquet and Feather. Each is read from
+memory with read_case_file, as an upload is, and the table shows the
+upload size, the read time and both relative to plain CSV.
+
+Compressed CSV only buys a smaller upload: the text is decompressed as a
+stream into the same parser, so it reads somewhat slower than plain CSV.
+Parquet and Feather are both smaller and faster to read.
+
+    python benchmarks/bench_formats.py --rows 100000
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_suite import case_file
+from dsgcore.loaders import read_case_file
+
+def encode(df, csv_bytes, fmt):
+    """Upload bytes and file name of the case frame in one format (None when unsupported)"""
+    if fmt == 'csv':
+        return csv_bytes, 'cases.csv'
+    if fmt == 'csv.gz':
+        import gzip
+        return gzip.compress(csv_bytes, compresslevel=6), 'cases.csv.gz'
+    if fmt == 'zip':
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('cases.csv', csv_bytes)
+        return out.getvalue(), 'cases.zip'
+    if fmt == 'csv.zst':
+        try:
+            import zstandard
+        except ImportError:
+            return None
+        return zstandard.ZstdCompressor(level=3).compress(csv_bytes), 'cases.csv.zst'
+    out = io.BytesIO()
+    if fmt == 'parquet':
+        df.to_parquet(out, index=False)
+    else:
+        df.to_feather(out)
+    return out.getvalue(), f'cases.{fmt}'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--narrative-kb', type=float, default=2.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--formats', nargs='+', default=['csv', 'csv.gz', 'zip', 'csv.zst', 'parquet', 'feather'])
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'dsg_bench'))
+    args = parser.parse_args(argv)
+
+    path = case_file(args.data_dir, args.rows, args.seed, args.narrative_kb)
+    with open(path, 'rb') as fh:
+        csv_bytes = fh.read()
+    df = pd.read_csv(io.BytesIO(csv_bytes))
+
+    print(f"{args.rows:,} rows")
+    print(f"{'format':<10}{'upload MB':>11}{'vs csv':>8}{'read s':>9}{'vs csv':>8}")
+    baseline = None
+    for fmt in args.formats:
+        encoded = encode(df, csv_bytes, fmt)
+        if encoded is None:
+            print(f"{fmt:<10}  skipped (optional dependency missing)")
+            continue
+        data, name = encoded
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            read_case_file(data, name)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        if baseline is None:
+            baseline = (len(data), best)
+        print(f"{fmt:<10}{len(data) / 1e6:>11.1f}{baseline[0] / len(data):>7.1f}x"
+              f"{best:>9.2f}{baseline[1] / best:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
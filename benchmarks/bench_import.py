@@ -0,0 +1,96 @@
+"""Cold-start benchmark of the core package: import time and what gets pulled in
+
+Every module is imported in a fresh interpreter, several times, and the
+fastest run is kept. The baseline (numpy and pandas, which every module
+needs) is measured the same way so the table shows what dsgcore itself
+adds. The run fails when a module imports Streamlit, gspread, google-auth
+or one of the lazily imported optional dependencies, or when its own cost
+exceeds the budget.
+
+    python benchmarks/bench_import.py --repeat 5 --budget 0.25
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CORE_MODULES = [
+    'dsgcore.assessments',
+    'dsgcore.assignment',
+    'dsgcore.browse',
+    'dsgcore.causality',
+    'dsgcore.compare',
+    'dsgcore.cube',
+    'dsgcore.dataset',
+    'dsgcore.dedup',
+    'dsgcore.dossier',
+    'dsgcore.export',
+    'dsgcore.fields',
+    'dsgcore.highlight',
+    'dsgcore.loaders',
+    'dsgcore.merge',
+    'dsgcore.metrics',
+    'dsgcore.network',
+    'dsgcore.packed',
+    'dsgcore.quality',
+    'dsgcore.signals',
+    'dsgcore.sources',
+    'dsgcore.timing',
+    'dsgcore.versions',
+    'dsgcore.writeback',
+]
+
+# Never imported by the core at import time (front-end, Google clients, optional formats)
+FORBIDDEN = ['streamlit', 'gspread', 'google.auth', 'google.oauth2', 'scipy', 'openpyxl', 'weasyprint', 'pyarrow.parquet']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'forbidden': [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+def time_import(module, repeat):
+    """Fastest cold import of `module` over `repeat` fresh interpreters, plus forbidden modules loaded"""
+    best, forbidden = None, []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(module=module, forbidden=FORBIDDEN)],
+                             cwd=ROOT, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        best = result['seconds'] if best is None else min(best, result['seconds'])
+        forbidden = result['forbidden']
+    return best, forbidden
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.25,
+                        help="maximum import time (s) of one module on top of the numpy/pandas baseline")
+    parser.add_argument('modules', nargs='*', default=CORE_MODULES)
+    args = parser.parse_args(argv)
+
+    baseline, _ = time_import('numpy, pandas', args.repeat)
+    print(f"baseline numpy + pandas: {baseline * 1000:7.1f} ms")
+    print(f"{'module':<24}{'import':>10}{'own':>10}  forbidden")
+    failures = []
+    for module in args.modules:
+        seconds, forbidden = time_import(module, args.repeat)
+        own = max(seconds - baseline, 0.0)
+        print(f"{module:<24}{seconds * 1000:8.1f}ms{own * 1000:8.1f}ms  {', '.join(forbidden) or '-'}")
+        if forbidden:
+            failures.append(f"{module} imports {', '.join(forbidden)}")
+        if own > args.budget:
+            failures.append(f"{module} takes {own:.3f}s over the baseline (budget {args.budget}s)")
+
+    seconds, forbidden = time_import('dsgcore.' + ', dsgcore.'.join(m.split('.')[-1] for m in CORE_MODULES), args.repeat)
+    print(f"{'all of dsgcore':<24}{seconds * 1000:8.1f}ms{max(seconds - baseline, 0.0) * 1000:8.1f}ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Parallel merge of quarterly extracts against a serial baseline
+
+A seeded synthetic case file (dsgcore.synthetic) is split into --files
+quarter files on disk, each repeating a share of the previous quarter's
+rows (--overlap) the way consecutive FAERS extracts repeat case versions.
+The directory is then read through ServerDirectorySource with one worker
+(the serial baseline) and with --workers processes, and the table shows
+the parse and total merge times and the speedup. Both merges must give the
+same frame.
+
+    python benchmarks/bench_merge.py --rows 200000 --files 4 --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dsgcore.sources import ServerDirectorySource
+from dsgcore.synthetic import synthetic_cases
+
+def quarter_files(directory, rows, files, overlap, seed, narrative_kb, fmt):
+    """Write the quarter files (once per settings) and return their directory"""
+    target = os.path.join(directory, f'quarters_{rows}_{files}_{overlap:g}_{seed}_{narrative_kb:g}kb_{fmt}')
+    if os.path.isdir(target):
+        return target
+    os.makedirs(target + '.tmp', exist_ok=True)
+    df = synthetic_cases(rows, seed=seed, narrative_kb=narrative_kb)
+    size = len(df) // files
+    for i in range(files):
+        start = max(0, i * size - int(size * overlap))
+        part = df.iloc[start:(i + 1) * size if i < files - 1 else len(df)]
+        path = os.path.join(target + '.tmp', f'faers_q{i + 1}.{fmt}')
+        part.to_parquet(path, index=False) if fmt == 'parquet' else part.to_csv(path, index=False)
+    os.replace(target + '.tmp', target)
+    return target
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--overlap', type=float, default=0.05, help="share of a quarter repeated by the next")
+    parser.add_argument('--format', choices=['csv', 'csv.gz', 'parquet'], default='csv')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--narrative-kb', type=float, default=2.0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'dsg_bench'))
+    args = parser.parse_args(argv)
+
+    directory = quarter_files(args.data_dir, args.rows, args.files, args.overlap, args.seed,
+                              args.narrative_kb, args.format)
+    print(f"{args.files} files, {args.rows:,} rows, {os.cpu_count()} CPUs: {directory}")
+    print(f"{'workers':>8}{'parse s':>10}{'merge s':>10}{'speedup':>9}{'rows':>10}{'dropped':>9}")
+    frames = {}
+    for workers in (1, args.workers):
+        start = time.perf_counter()
+        df = ServerDirectorySource(directory, workers=workers).read()
+        seconds = time.perf_counter() - start
+        report = df.attrs['merge']
+        frames[workers] = (df, report['parallel_parse_seconds'], seconds)
+        base = frames[1]
+        print(f"{report['workers']:>8}{report['parallel_parse_seconds']:>10.2f}{seconds:>10.2f}"
+              f"{base[2] / seconds:>8.2f}x{len(df):>10,}{report['repeated_rows_dropped']:>9,}")
+        if workers == 1 and args.workers == 1:
+            break
+    if not frames[1][0].equals(frames[args.workers][0]):
+        print("FAIL: parallel merge differs from the serial one")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
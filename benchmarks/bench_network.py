@@ -0,0 +1,57 @@
+"""Benchmark of the drug co-reporting network at FAERS-quarter scale
+
+Drugs and PTs per case follow the same Zipf-like model as bench_signals;
+about 5% of drug mentions are coded I (interacting).
+
+    python benchmarks/bench_network.py --cases 400000 --drugs 40000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_signals import zipf_labels
+from dsgcore.network import DrugNetwork
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=400_000)
+    parser.add_argument('--drugs', type=int, default=40_000)
+    parser.add_argument('--pts', type=int, default=15_000)
+    parser.add_argument('--top', type=int, default=1_000, help="pairs to expand into PT triplets")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    drug_rows = np.repeat(np.arange(args.cases), rng.geometric(0.25, args.cases))
+    event_rows = np.repeat(np.arange(args.cases), rng.geometric(0.4, args.cases))
+    drug_table = pd.DataFrame({
+        'row': drug_rows,
+        'drug_name': zipf_labels(rng, len(drug_rows), args.drugs, 'DRUG'),
+        'role_code': rng.choice(['PS', 'SS', 'C', 'I'], len(drug_rows), p=[0.3, 0.15, 0.5, 0.05]),
+    })
+    reaction_table = pd.Series(
+        zipf_labels(rng, len(event_rows), args.pts, 'PT'),
+        index=pd.MultiIndex.from_arrays([event_rows, np.zeros(len(event_rows), dtype=int)], names=['row', 'pos']),
+    )
+    print(f"{args.cases:,} cases, {len(drug_rows):,} drug rows, {len(event_rows):,} PT rows")
+
+    start = time.perf_counter()
+    network = DrugNetwork.from_drug_table(drug_table, reaction_table, args.cases)
+    print(f"incidence matrices: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    pairs = network.pairs(min_count=1)
+    print(f"drug-drug counts: {len(pairs):,} co-reported pairs in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    triplets = network.triplets(pairs.head(args.top))
+    print(f"pair x PT triplets for the top {args.top:,} pairs: {len(triplets):,} in {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""Load test of concurrent assessor sessions, driven headlessly with AppTest
+
+Every simulated assessor is an AppTest session of the app running in its
+own (spawned) process, so script runs overlap for real and throughput can
+grow with the number of sessions until the machine runs out of cores.
+AppTest swaps process globals for each script run, so two sessions cannot
+share one process without serialising their runs. The sessions share the
+assessment store (SQLite in WAL mode) as tabs of one server do; they do
+not share st.cache_* entries, so every session's memory includes its own
+copy of the app. The processes start the clock together once all of them
+have imported the app.
+
+An assessor first loads the dataset (unpickled from one blob, which is
+what an st.cache_data hit costs each session), then does --actions
+interactions separated by exponentially distributed think time: ID
+searches, flipping the assessor/country filters and submitting
+assessments of the case on screen. Sessions start spread over the first
+think time.
+
+Each level of --sessions runs in a fresh interpreter. For every level the
+run reports throughput (interactions per second), latency percentiles of
+the interactions, the mean peak resident memory of a session process and
+the sum over all of them. Input is a seeded synthetic case file
+(dsgcore.synthetic), cached like bench_suite.
+
+    python benchmarks/bench_sessions.py --rows 10000 --sessions 1 2 4 8 --think 1.0
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_suite import case_file, git_commit
+from dsgcore.loaders import read_case_file
+from dsgcore.profiling import rss_bytes
+
+DEFAULT_SESSIONS = [1, 2, 4, 8]
+
+# Relative frequency of the interactions of a simulated assessor
+ACTION_WEIGHTS = {'search_caseid': 0.35, 'search_primaryid': 0.15, 'filter': 0.3, 'submit': 0.2}
+
+def _widget(widgets, label):
+    for widget in widgets:
+        if label in widget.label:
+            return widget
+    raise LookupError(f'no widget labelled {label!r} on screen')
+
+def _search(session, box, other, value):
+    _widget(session.at.text_input, other).set_value('')
+    _widget(session.at.text_input, box).input(str(value))
+    session.rerun()
+
+def _flip_filter(session):
+    box = _widget(session.at.selectbox, str(session.rng.choice(['Filter by Assessor', 'Filter by Country'])))
+    box.set_value('All' if box.value != 'All' else str(session.rng.choice(box.options[1:] or ['All'])))
+    session.rerun()
+
+def _submit(session):
+    """Submit an assessment of the case on screen; False when the app shows no form"""
+    buttons = [b for b in session.at.button if 'Generate Assessment' in str(b.label)]
+    if not buttons:
+        return False
+    _widget([t for t in session.at.text_input if t.label == 'Assessor'], 'Assessor').set_value(f'loadtest-{session.index}')
+    buttons[0].click()
+    session.rerun()
+    return True
+
+class Assessor:
+    """One simulated assessor: load, then interactions with think time in between"""
+
+    def __init__(self, index, args, blob_path, ids):
+        self.index = index
+        self.args = args
+        self.blob_path = blob_path
+        self.ids = ids
+        self.rng = np.random.default_rng(args.seed + index)
+        self.records = []
+        self.error = None
+
+    def think(self, scale=1.0):
+        if self.args.think > 0:
+            time.sleep(self.rng.exponential(self.args.think * scale))
+
+    def rerun(self):
+        self.at.run()
+
+    def timed(self, action, call):
+        start = time.perf_counter()
+        done = call()
+        seconds = time.perf_counter() - start
+        if self.at.exception:
+            raise RuntimeError(f'{action}: {self.at.exception[0].value}')
+        if done is not False:
+            self.records.append((action, seconds))
+
+    def run(self, ready, go):
+        from streamlit.testing.v1 import AppTest
+        try:
+            try:
+                self.at = AppTest.from_file(os.path.join(ROOT, self.args.app), default_timeout=self.args.timeout)
+            finally:
+                ready.release()
+            go.wait()
+            self.think(0.5)
+
+            def load():
+                with open(self.blob_path, 'rb') as fh:
+                    self.at.session_state['df'] = pickle.load(fh)
+                self.rerun()
+            self.timed('load', load)
+
+            actions, weights = zip(*ACTION_WEIGHTS.items())
+            weights = np.array(weights) / sum(weights)
+            for _ in range(self.args.actions):
+                self.think()
+                action = self.rng.choice(actions, p=weights)
+                if action == 'search_caseid':
+                    self.timed(action, lambda: _search(self, 'Case ID', 'Primary ID', self.rng.choice(self.ids['caseid'])))
+                elif action == 'search_primaryid':
+                    self.timed(action, lambda: _search(self, 'Primary ID', 'Case ID', self.rng.choice(self.ids['primaryid'])))
+                elif action == 'filter':
+                    self.timed(action, lambda: _flip_filter(self))
+                else:
+                    self.timed(action, lambda: _submit(self))
+        except Exception as exc:
+            self.error = f'{type(exc).__name__}: {exc}'
+
+class MemorySampler(threading.Thread):
+    """Peak resident memory of the process, polled every `interval` seconds"""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_bytes() or 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+def run_assessor(index, args, blob_path, ids, ready, go, results):
+    """Process body of one assessor: its interactions, error and peak memory go to `results`"""
+    sampler = MemorySampler()
+    sampler.start()
+    assessor = Assessor(index, args, blob_path, ids)
+    assessor.run(ready, go)
+    sampler.stopped.set()
+    sampler.join()
+    results.put({'index': index, 'records': assessor.records, 'error': assessor.error, 'peak': sampler.peak})
+
+def run_level(sessions, args):
+    """Run `sessions` concurrent assessors, one process each, and summarise the run"""
+    workdir = tempfile.mkdtemp(prefix='dsg_sessions_')
+    os.environ['DSG_ASSESSMENT_DB'] = os.path.join(workdir, 'assessments.sqlite3')
+    path = case_file(args.data_dir, args.rows, args.seed, args.narrative_kb)
+    with open(path, 'rb') as fh:
+        df = read_case_file(fh.read(), os.path.basename(path))
+    rng = np.random.default_rng(args.seed)
+    sample = rng.choice(len(df), size=min(1000, len(df)), replace=False)
+    ids = {col: df[col].astype(str).to_numpy()[sample] for col in ('caseid', 'primaryid')}
+    blob_path = os.path.join(workdir, 'cases.pickle')
+    with open(blob_path, 'wb') as fh:
+        pickle.dump(df, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    del df
+
+    # Spawned, so every session starts from a clean interpreter as a server worker would
+    context = multiprocessing.get_context('spawn')
+    ready, go, results = context.Semaphore(0), context.Event(), context.Queue()
+    processes = [context.Process(target=run_assessor, args=(i, args, blob_path, ids, ready, go, results),
+                                 name=f'assessor-{i}', daemon=True) for i in range(sessions)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.acquire()
+    start = time.perf_counter()
+    go.set()
+    outcomes = [results.get() for _ in processes]
+    wall = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    records = [record for outcome in outcomes for record in outcome['records']]
+    peaks = [outcome['peak'] for outcome in outcomes]
+    summary = {
+        'sessions': sessions,
+        'wall_seconds': wall,
+        'errors': [outcome['error'] for outcome in outcomes if outcome['error']],
+        'interactions': len(records),
+        'throughput': len(records) / wall if wall else None,
+        'peak_mb': sum(peaks) / 2**20,
+        'per_session_mb': sum(peaks) / 2**20 / sessions,
+        'latency': {},
+    }
+    by_action = {'all': [s for action, s in records if action != 'load']}
+    for action, seconds in records:
+        by_action.setdefault(action, []).append(seconds)
+    for action, seconds in by_action.items():
+        if seconds:
+            summary['latency'][action] = {
+                'count': len(seconds),
+                **{f'p{q}': float(np.percentile(seconds, q)) for q in (50, 95, 99)},
+                'max': float(max(seconds)),
+            }
+    return summary
+
+def _ms(seconds):
+    return f"{seconds * 1000:8.0f}" if seconds is not None else '     n/a'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default='dsgapp.py', choices=['dsgapp.py', 'streamalitapp.py'])
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_SESSIONS)
+    parser.add_argument('--actions', type=int, default=20, help="interactions per assessor after loading")
+    parser.add_argument('--think', type=float, default=1.0, help="mean think time (s) between interactions")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--narrative-kb', type=float, default=2.0)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'dsg_bench'))
+    parser.add_argument('--history', default=os.path.join(ROOT, 'benchmarks', 'results', 'bench_sessions.jsonl'))
+    parser.add_argument('--level', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.level is not None:
+        print(json.dumps(run_level(args.level, args)))
+        return 0
+
+    case_file(args.data_dir, args.rows, args.seed, args.narrative_kb)
+    argv = list(sys.argv[1:] if argv is None else argv)
+    print(f"{args.app}: {args.rows:,} rows, {args.actions} interactions per assessor, {args.think:g}s mean think time")
+    print(f"{'sessions':>8}{'inter/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'load p95':>9}{'total MB':>9}{'MB/sess':>9}  errors")
+    failed = False
+    for sessions in args.sessions:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), *argv, '--level', str(sessions)],
+                             capture_output=True, text=True)
+        if out.returncode != 0:
+            print(out.stderr[-2000:])
+            return 1
+        summary = json.loads(out.stdout.strip().splitlines()[-1])
+        latency = summary['latency'].get('all', {})
+        load = summary['latency'].get('load', {})
+        print(f"{sessions:>8}{summary['throughput']:>9.2f}{_ms(latency.get('p50'))}{_ms(latency.get('p95'))}"
+              f"{_ms(latency.get('p99'))}{_ms(latency.get('max'))}{_ms(load.get('p95'))}"
+              f"{summary['peak_mb']:>9.0f}{summary['per_session_mb']:>9.1f}  {len(summary['errors']) or '-'}")
+        for error in summary['errors'][:3]:
+            print(f"    {error}")
+        failed = failed or bool(summary['errors'])
+
+        record = {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'app': args.app,
+            'rows': args.rows,
+            'actions': args.actions,
+            'think': args.think,
+            'seed': args.seed,
+            'narrative_kb': args.narrative_kb,
+            **summary,
+        }
+        os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+        with open(args.history, 'a', encoding='utf-8') as fh:
+            fh.write(json.dumps(record) + '\n')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Benchmark of the disproportionality engine at FAERS-quarter scale
+
+A FAERS quarter holds roughly 400k cases, 40k distinct drug names and 15k
+PTs with long-tailed (Zipf-like) frequencies. The (row, drug) and (row, pt)
+pairs are drawn directly, so the benchmark times the engine only.
+
+    python benchmarks/bench_signals.py --cases 400000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dsgcore.signals import contingency_counts, flag_signals, signal_scores
+
+def zipf_labels(rng, n, vocabulary, prefix):
+    """n labels drawn from a Zipf-like distribution over `vocabulary` names"""
+    weights = 1 / np.arange(1, vocabulary + 1) ** 1.1
+    codes = rng.choice(vocabulary, size=n, p=weights / weights.sum())
+    names = np.array([f'{prefix}{i}' for i in range(vocabulary)], dtype=object)
+    return names[codes]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=400_000)
+    parser.add_argument('--drugs', type=int, default=40_000)
+    parser.add_argument('--pts', type=int, default=15_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    drugs_per_case = rng.geometric(0.25, args.cases)
+    pts_per_case = rng.geometric(0.4, args.cases)
+    drug_rows = np.repeat(np.arange(args.cases), drugs_per_case)
+    event_rows = np.repeat(np.arange(args.cases), pts_per_case)
+    drugs = zipf_labels(rng, len(drug_rows), args.drugs, 'DRUG')
+    events = zipf_labels(rng, len(event_rows), args.pts, 'PT')
+    print(f"{args.cases:,} cases, {len(drug_rows):,} drug rows, {len(event_rows):,} PT rows")
+
+    start = time.perf_counter()
+    counts = contingency_counts(drug_rows, drugs, event_rows, events)
+    t_counts = time.perf_counter() - start
+    print(f"contingency counts: {len(counts):,} pairs in {t_counts:.2f}s")
+
+    start = time.perf_counter()
+    scores = signal_scores(counts)
+    t_scores = time.perf_counter() - start
+    print(f"PRR/ROR/IC/EBGM (prior fitted): {t_scores:.2f}s ({len(scores) / t_scores:,.0f} pairs/s)")
+
+    start = time.perf_counter()
+    signal_scores(counts, prior=scores.attrs['prior'])
+    print(f"PRR/ROR/IC/EBGM (known prior): {time.perf_counter() - start:.2f}s")
+
+    flags = flag_signals(scores)
+    print("signals flagged:", ', '.join(f"{k}={int(v):,}" for k, v in flags.sum().items()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark of incremental signal updates against a full rebuild
+
+A base table of --cases cases is scored once; then --batches batches of
+--batch new cases arrive (plus a few withdrawn ones, as when a newer case
+version supersedes an older one) and are folded in with IncrementalSignals.
+The final incremental counts are checked against a recount from scratch.
+
+    python benchmarks/bench_signals_incremental.py --cases 400000 --batch 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_signals import zipf_labels
+from dsgcore.signals import IncrementalSignals, contingency_counts, signal_scores
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=400_000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--batches', type=int, default=5)
+    parser.add_argument('--withdrawn', type=int, default=50)
+    parser.add_argument('--drugs', type=int, default=40_000)
+    parser.add_argument('--pts', type=int, default=15_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    total = args.cases + args.batch * args.batches
+    drug_rows = np.repeat(np.arange(total), rng.geometric(0.25, total))
+    event_rows = np.repeat(np.arange(total), rng.geometric(0.4, total))
+    drugs = zipf_labels(rng, len(drug_rows), args.drugs, 'DRUG')
+    events = zipf_labels(rng, len(event_rows), args.pts, 'PT')
+
+    def counts_for(rows):
+        d = np.isin(drug_rows, rows)
+        e = np.isin(event_rows, rows)
+        return contingency_counts(drug_rows[d], drugs[d], event_rows[e], events[e])
+
+    live = np.arange(args.cases)
+    start = time.perf_counter()
+    state = IncrementalSignals(counts_for(live))
+    t_full = time.perf_counter() - start
+    print(f"initial build of {args.cases:,} cases: {len(state.counts):,} pairs in {t_full:.2f}s")
+
+    for b in range(args.batches):
+        new = np.arange(args.cases + b * args.batch, args.cases + (b + 1) * args.batch)
+        gone = rng.choice(live, size=args.withdrawn, replace=False)
+        start = time.perf_counter()
+        added, removed = counts_for(new), counts_for(gone)
+        t_delta = time.perf_counter() - start
+        stats = state.apply(added=added, removed=removed)
+        live = np.union1d(np.setdiff1d(live, gone), new)
+        print(f"batch {b + 1}: +{len(new):,} / -{len(gone):,} cases, delta counts {t_delta:.2f}s, "
+              f"rescored {stats['rescored']:,} of {stats['pairs']:,} pairs in {stats['seconds']:.2f}s"
+              + (" (full rescore)" if stats['full_rescore'] else ""))
+
+    start = time.perf_counter()
+    rebuilt = counts_for(live)
+    signal_scores(rebuilt, prior=state.prior)
+    print(f"full rebuild for comparison: {time.perf_counter() - start:.2f}s")
+
+    a_inc = state.counts.pairs.set_index(['drug', 'pt'])['a'].sort_index()
+    a_full = rebuilt.pairs.set_index(['drug', 'pt'])['a'].sort_index()
+    print("incremental counts match rebuild:", a_inc.equals(a_full) and state.counts.n == rebuilt.n)
+
+if __name__ == '__main__':
+    main()
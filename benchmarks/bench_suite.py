@@ -0,0 +1,201 @@
+"""Scaling benchmark of the viewer pipeline on synthetic FAERS-shaped files
+
+For every size a seeded synthetic case file (dsgcore.synthetic) is written
+once to the data directory and reused by later runs. The stages are timed
+the way the apps run them:
+
+- load: read the CSV bytes and run the ingest stage (read_case_file)
+- search: the app's primaryid/caseid lookups, per search
+- process_drug_data: per-case parsing of sampled cases, and the vectorized
+  drug table of the whole frame
+- dates: format_date_std on the drug dates of sampled cases, and
+  partial_dates over every event date
+- render: the assessment app (AppTest) showing a first case (cold caches)
+  and then other cases
+- export: streaming CSV and Parquet export of the whole frame
+
+Every run is appended to a JSON-lines history, and each size is compared
+with its previous run of the same settings. 1M rows with 2 KB narratives
+need about 8 GB of memory; lower --narrative-kb on smaller machines.
+
+    python benchmarks/bench_suite.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dsgcore.dedup import latest_version_mask
+from dsgcore.export import export_chunks, iter_frame_chunks
+from dsgcore.fields import format_date_std
+from dsgcore.loaders import read_case_file
+from dsgcore.packed import PACKED_DATE_COLUMNS, explode_drug_table, process_drug_data
+from dsgcore.synthetic import synthetic_cases
+from dsgcore.timing import partial_dates
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+def case_file(data_dir, rows, seed, narrative_kb):
+    """Path of the cached synthetic file for these settings, generated on first use"""
+    path = os.path.join(data_dir, f'synthetic_{rows}_{seed}_{narrative_kb:g}kb.csv')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        start = time.perf_counter()
+        synthetic_cases(rows, seed=seed, narrative_kb=narrative_kb).to_csv(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+        print(f"  generated {path} in {time.perf_counter() - start:.1f}s")
+    return path
+
+def timed(results, stage, call, repeat=1):
+    """Run call() `repeat` times, store the mean seconds under `stage` and return the last result"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = call()
+    results[stage] = (time.perf_counter() - start) / repeat
+    return out
+
+def search(df, primaryid=None, caseid=None):
+    """The apps' ID search: string comparison over the column, latest version for a caseid"""
+    if primaryid is not None:
+        matches = df[df['primaryid'].astype(str) == str(primaryid)]
+        return matches.iloc[0] if len(matches) else None
+    matches = df[df['caseid'].astype(str) == str(caseid)]
+    return matches[latest_version_mask(matches)].iloc[0] if len(matches) else None
+
+def render_times(df, caseids, app='dsgapp.py'):
+    """Seconds of the app run showing the first case (cold) and the mean over the others (warm)"""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None, None
+    at = AppTest.from_file(os.path.join(ROOT, app), default_timeout=600)
+    at.session_state['df'] = df
+    at.run()
+    seconds = []
+    for caseid in caseids:
+        box = [ti for ti in at.text_input if 'Case ID' in ti.label][0]
+        start = time.perf_counter()
+        box.input(str(caseid)).run()
+        seconds.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    return seconds[0], float(np.mean(seconds[1:])) if len(seconds) > 1 else None
+
+def run_size(rows, args):
+    """Stage timings (seconds) for one file size"""
+    results = {}
+    path = case_file(args.data_dir, rows, args.seed, args.narrative_kb)
+    results['file_mb'] = os.path.getsize(path) / 1e6
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    df = timed(results, 'load', lambda: read_case_file(data, os.path.basename(path)))
+
+    rng = np.random.default_rng(args.seed)
+    sample = rng.choice(len(df), size=min(args.sample, len(df)), replace=False)
+    ids = df['primaryid'].to_numpy()[sample[:args.searches]]
+    caseids = df['caseid'].to_numpy()[sample[:args.searches]]
+    timed(results, 'search_primaryid', lambda: [search(df, primaryid=i) for i in ids])
+    results['search_primaryid'] /= len(ids)
+    timed(results, 'search_caseid', lambda: [search(df, caseid=c) for c in caseids])
+    results['search_caseid'] /= len(caseids)
+
+    records = [df.iloc[i] for i in sample]
+    timed(results, 'process_drug_data_per_case', lambda: [process_drug_data(r, format_dates=True) for r in records])
+    results['process_drug_data_per_case'] /= len(records)
+    timed(results, 'drug_table_all', lambda: explode_drug_table(df))
+
+    values = [v for r in records for col in PACKED_DATE_COLUMNS
+              for v in str(r.get(col, '')).split(';')]
+    timed(results, 'format_date_per_case', lambda: [format_date_std(v.strip()) for v in values])
+    results['format_date_per_case'] /= len(records)
+    timed(results, 'partial_dates_all', lambda: partial_dates(df['event_dt']))
+
+    if not args.skip_render:
+        results['render_cold'], results['render_warm'] = render_times(df, caseids[:args.renders])
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        timed(results, 'export_csv', lambda: export_chunks(iter_frame_chunks(df), os.path.join(out_dir, 'cases.csv'), 'CSV'))
+        try:
+            timed(results, 'export_parquet',
+                  lambda: export_chunks(iter_frame_chunks(df), os.path.join(out_dir, 'cases.parquet'), 'Parquet'))
+        except ImportError:
+            results['export_parquet'] = None
+    return results
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip()
+    except OSError:
+        return ''
+
+def previous_run(history, rows, narrative_kb):
+    """Stage timings of the last recorded run with the same settings"""
+    if not os.path.exists(history):
+        return None
+    last = None
+    with open(history, encoding='utf-8') as fh:
+        for line in fh:
+            record = json.loads(line)
+            if record['rows'] == rows and record['narrative_kb'] == narrative_kb:
+                last = record
+    return last
+
+def _fmt(seconds):
+    if seconds is None:
+        return 'n/a'
+    return f"{seconds * 1000:.2f} ms" if seconds < 1 else f"{seconds:.2f} s"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--narrative-kb', type=float, default=2.0)
+    parser.add_argument('--sample', type=int, default=1000, help="cases parsed one by one per size")
+    parser.add_argument('--searches', type=int, default=20)
+    parser.add_argument('--renders', type=int, default=4)
+    parser.add_argument('--skip-render', action='store_true')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'dsg_bench'))
+    parser.add_argument('--history', default=os.path.join(ROOT, 'benchmarks', 'results', 'bench_suite.jsonl'))
+    args = parser.parse_args(argv)
+
+    for rows in args.sizes:
+        print(f"{rows:,} rows")
+        results = run_size(rows, args)
+        before = previous_run(args.history, rows, args.narrative_kb)
+        for stage, seconds in results.items():
+            if stage == 'file_mb':
+                print(f"  {'file size':<28}{seconds:10.1f} MB")
+                continue
+            change = ''
+            if before and before['stages'].get(stage) and seconds is not None:
+                change = f"  ({(seconds / before['stages'][stage] - 1) * 100:+.0f}% vs {before['commit'] or 'previous'})"
+            print(f"  {stage:<28}{_fmt(seconds):>12}{change}")
+
+        record = {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'rows': rows,
+            'seed': args.seed,
+            'narrative_kb': args.narrative_kb,
+            'stages': results,
+        }
+        os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+        with open(args.history, 'a', encoding='utf-8') as fh:
+            fh.write(json.dumps(record) + '\n')
+
+if __name__ == '__main__':
+    main()
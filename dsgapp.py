@@ -1,8 +1,21 @@
 import streamlit as st
 import pandas as pd
-import io
 import datetime
 
+from dsgcore.fields import format_date_std, get_role_class, get_role_label
+from dsgcore.causality import CATEGORY_OUTCOME, NARANJO_QUESTIONS
+from dsgcore.timing import format_exposure, format_onset
+from dsgcore.dedup import latest_version_mask
+from dsgcore.loaders import UPLOAD_TYPES, read_case_files
+from dsgcore.packed import parse_separated_values, process_drug_data
+from dsgcore.profiling import checkpoint
+from dsgcore.assessments import AssessmentStore
+from dsgviews import (VIEWS, VIEW_ASSIGN, VIEW_COMPARE, VIEW_NETWORK, VIEW_OVERVIEW, VIEW_SIGNALS, get_dataset,
+                      load_uploads, render_assignment_view, render_bulk_export, render_case_browser,
+                      render_compare_view, render_merge_report, render_network_view, render_onset_distributions,
+                      render_overview, render_quality_badge, render_narratives, render_server_source,
+                      render_signal_view, render_version_history, profiled_rerun)
+
 # Page config
 st.set_page_config(
     page_title="FDA Adverse Event Case Viewer",
@@ -116,105 +129,16 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def format_date_std(date_str):
-    """Format date string to YYYY-MM-DD"""
-    if pd.isna(date_str) or date_str == '' or str(date_str).strip().upper() == 'NA':
-        return 'NA'
-    
-    # Clean up string
-    date_str = str(date_str).strip()
-    
-    try:
-        # Try parsing with pandas, which handles many formats (ISO, YYYYMMDD, etc.)
-        dt = pd.to_datetime(date_str, errors='raise')
-        return dt.strftime('%Y-%m-%d')
-    except:
-        # Return original if parsing fails
-        return date_str
-
-def parse_separated_values(value):
-    """Parse semicolon-separated values"""
-    if pd.isna(value) or value == '' or value == 'NA':
-        return []
-    return [v.strip() for v in str(value).split(';')]
-
-def get_role_label(code):
-    """Get full label for role code"""
-    labels = {
-        'PS': 'Primary Suspect',
-        'SS': 'Secondary Suspect',
-        'C': 'Concomitant',
-        'I': 'Interacting'
-    }
-    return labels.get(code, code)
-
-def get_role_class(code):
-    """Get CSS class for role code"""
-    if code == 'PS':
-        return 'ps'
-    elif code == 'SS':
-        return 'ss'
-    else:
-        return 'c'
+# Shared DataFrame per file, so the indexes built on it survive reruns
+@st.cache_resource(show_spinner="Resolving case versions and duplicates...")
+def load_uploaded_files(files):
+    """Read uploaded (name, bytes) case files, merging several, and run the ingest stage"""
+    return read_case_files(files)
 
-def process_drug_data(row):
-    """Process and structure drug data from a row"""
-    sequences = parse_separated_values(row.get('drug_seq', ''))
-    role_codes = parse_separated_values(row.get('role_cod', ''))
-    drug_names = parse_separated_values(row.get('drugname', ''))
-    product_ai = parse_separated_values(row.get('prod_ai', ''))
-    routes = parse_separated_values(row.get('route', ''))
-    dose_amts = parse_separated_values(row.get('dose_amt', ''))
-    dose_units = parse_separated_values(row.get('dose_unit', ''))
-    dose_forms = parse_separated_values(row.get('dose_form', ''))
-    dose_freqs = parse_separated_values(row.get('dose_freq', ''))
-    indications = parse_separated_values(row.get('indi_pt', ''))
-    start_dates = parse_separated_values(row.get('start_dt', ''))
-    end_dates = parse_separated_values(row.get('end_dt', ''))
-    dechals = parse_separated_values(row.get('dechal', ''))
-    rechals = parse_separated_values(row.get('rechal', ''))
-    lot_nums = parse_separated_values(row.get('lot_num', ''))
-    
-    # Additional fields
-    val_vbms = parse_separated_values(row.get('val_vbm', ''))
-    dose_vbms = parse_separated_values(row.get('dose_vbm', ''))
-    cum_dose_chrs = parse_separated_values(row.get('cum_dose_chr', ''))
-    cum_dose_units = parse_separated_values(row.get('cum_dose_unit', ''))
-    exp_dts = parse_separated_values(row.get('exp_dt', ''))
-    nda_nums = parse_separated_values(row.get('nda_num', ''))
-    durs = parse_separated_values(row.get('dur', ''))
-    dur_cods = parse_separated_values(row.get('dur_cod', ''))
-    
-    drugs = []
-    for i in range(len(sequences)):
-        drugs.append({
-            'sequence': sequences[i] if i < len(sequences) else 'NA',
-            'role_code': role_codes[i] if i < len(role_codes) else 'NA',
-            'drug_name': drug_names[i] if i < len(drug_names) else 'NA',
-            'product_ai': product_ai[i] if i < len(product_ai) else 'NA',
-            'route': routes[i] if i < len(routes) else 'NA',
-            'dose_amount': dose_amts[i] if i < len(dose_amts) else 'NA',
-            'dose_unit': dose_units[i] if i < len(dose_units) else 'NA',
-            'dose_form': dose_forms[i] if i < len(dose_forms) else 'NA',
-            'dose_frequency': dose_freqs[i] if i < len(dose_freqs) else 'NA',
-            'indication': indications[i] if i < len(indications) else 'NA',
-            # Format dates here
-            'start_date': format_date_std(start_dates[i]) if i < len(start_dates) else 'NA',
-            'end_date': format_date_std(end_dates[i]) if i < len(end_dates) else 'NA',
-            'dechallenge': dechals[i] if i < len(dechals) else 'NA',
-            'rechallenge': rechals[i] if i < len(rechals) else 'NA',
-            'lot_number': lot_nums[i] if i < len(lot_nums) else 'NA',
-            'val_vbm': val_vbms[i] if i < len(val_vbms) else 'NA',
-            'dose_vbm': dose_vbms[i] if i < len(dose_vbms) else 'NA',
-            'cum_dose_chr': cum_dose_chrs[i] if i < len(cum_dose_chrs) else 'NA',
-            'cum_dose_unit': cum_dose_units[i] if i < len(cum_dose_units) else 'NA',
-            'exp_dt': format_date_std(exp_dts[i]) if i < len(exp_dts) else 'NA',
-            'nda_num': nda_nums[i] if i < len(nda_nums) else 'NA',
-            'duration': durs[i] if i < len(durs) else 'NA',
-            'duration_code': dur_cods[i] if i < len(dur_cods) else 'NA'
-        })
-    
-    return drugs
+@st.cache_resource
+def get_assessment_store():
+    """Assessment store shared by all sessions"""
+    return AssessmentStore()
 
 def display_field(label, value, col=None):
     """Display a labeled field"""
@@ -231,26 +155,34 @@ def main():
     st.title("💊 FDA Adverse Event Case Viewer")
     st.markdown("### Professional Assessment Interface")
     
+    checkpoint('sidebar')
     # Sidebar
     with st.sidebar:
         st.header("📁 Data Source")
         
-        uploaded_file = st.file_uploader(
-            "Upload CSV/TSV file",
-            type=['csv', 'tsv', 'txt'],
-            help="Upload your adverse event data file"
+        uploaded_files = st.file_uploader(
+            "Upload case file(s)",
+            type=UPLOAD_TYPES,
+            accept_multiple_files=True,
+            help="Upload your adverse event data file; several files (e.g. FAERS quarters) are merged"
         )
         
+        render_server_source()
+        
+        st.markdown("---")
+        
+        view = st.radio("🧭 View", VIEWS)
+        
         st.markdown("---")
         
         # Instructions
         with st.expander("📖 How to Use"):
             st.markdown("""
             **Steps:**
-            1. **Upload your CSV/TSV file** above
+            1. **Upload your case file** above (CSV/TSV, also .gz/.zip/.zst, Parquet or Feather)
             2. **Enter Primary ID or Case ID** to search
             3. **Fill the Assessment** at the bottom
-            4. **Download** the result
+            4. **Submit** to save it on the server, then **Download** if needed
             
             **Search:**
             - Enter Primary ID or Case ID
@@ -275,18 +207,18 @@ def main():
             - Independent Status/Assessor section
             - Integrated Assessment Template
             - Downloadable Evaluation
+            - Saved Assessment History
             
             Created for clinical assessors.
             """)
     
+    checkpoint('load')
     # Load data from file upload
-    if uploaded_file:
+    if uploaded_files:
         try:
-            if uploaded_file.name.endswith('.tsv') or uploaded_file.name.endswith('.txt'):
-                df = pd.read_csv(uploaded_file, sep='\t')
-            else:
-                df = pd.read_csv(uploaded_file)
+            df = load_uploads(tuple((f.name, f.getvalue()) for f in uploaded_files), load_uploaded_files)
             st.session_state['df'] = df
+            st.session_state.pop('source', None)
             
             # Show dataset statistics
             col1, col2, col3, col4 = st.columns(4)
@@ -303,6 +235,7 @@ def main():
                 st.metric("Assessors", f"{assessors:,}")
             
             st.success(f"✅ Data loaded successfully!")
+            render_merge_report(df)
         except Exception as e:
             st.error(f"Error loading file: {str(e)}")
             return
@@ -312,7 +245,26 @@ def main():
         st.info("👆 Please upload a file from the sidebar to begin")
         return
     
+    checkpoint('dataset')
     df = st.session_state['df']
+    dataset = get_dataset()
+    checkpoint(view)
+    
+    if view == VIEW_COMPARE:
+        render_compare_view(dataset)
+        return
+    if view == VIEW_OVERVIEW:
+        render_overview(dataset)
+        return
+    if view == VIEW_SIGNALS:
+        render_signal_view(dataset)
+        return
+    if view == VIEW_NETWORK:
+        render_network_view(dataset)
+        return
+    if view == VIEW_ASSIGN:
+        render_assignment_view(dataset)
+        return
     
     # Search interface
     st.markdown("---")
@@ -339,14 +291,16 @@ def main():
         search_primary = st.text_input(
             "🔍 Search by Primary ID",
             placeholder="Enter Primary ID (e.g., 102854963)",
-            help="Enter the Primary ID to find a specific case"
+            help="Enter the Primary ID to find a specific case",
+            key="search_primary"
         )
     
     with col2:
         search_case = st.text_input(
             "🔍 Search by Case ID",
             placeholder="Enter Case ID (e.g., 10285496)",
-            help="Enter the Case ID to find a specific case"
+            help="Enter the Case ID to find a specific case",
+            key="search_case"
         )
     
     with col3:
@@ -354,6 +308,7 @@ def main():
         st.write("")  # Spacing
         search_button = st.button("🔎 Search", use_container_width=True)
     
+    checkpoint('filter')
     # Search logic
     row = None
     filtered_df = df.copy()
@@ -364,6 +319,10 @@ def main():
     if 'search_country' in locals() and search_country != 'All':
         filtered_df = filtered_df[filtered_df['occr_country'] == search_country]
     
+    checkpoint('bulk export')
+    render_bulk_export(filtered_df, get_assessment_store())
+    
+    checkpoint('id search')
     if search_button or search_primary or search_case:
         if search_primary:
             # Search by primary ID
@@ -383,7 +342,8 @@ def main():
             matches = filtered_df[mask]
             
             if len(matches) > 0:
-                row = matches.iloc[0]
+                # Several rows share a caseid when the file holds follow-up versions
+                row = matches[latest_version_mask(matches)].iloc[0]
                 st.success(f"✅ Found case with Case ID: {search_case}")
             else:
                 st.error(f"❌ No case found with Case ID: {search_case}")
@@ -393,11 +353,18 @@ def main():
             return
     else:
         # Show prompt to search
-        st.info("👆 Enter a Primary ID or Case ID above and click Search")
+        st.info("👆 Enter a Primary ID or Case ID above and click Search, or pick a case below")
+        checkpoint('browse')
+        render_case_browser(dataset, filtered_df)
         return
     
     st.markdown("---")
     
+    checkpoint('case header')
+    if row.get('probable_duplicates'):
+        st.warning(f"⚠️ Probable duplicate of Case ID(s): {row.get('probable_duplicates')}")
+    render_quality_badge(dataset, dataset.position(row))
+    
     # === NEW SECTION: Status & Assessor ===
     st.markdown('<div class="section-header">📌 Status & Assignment</div>', unsafe_allow_html=True)
     status_cols = st.columns(3)
@@ -457,6 +424,9 @@ def main():
     with admin_cols4[4]:
         display_field("Occurrence Country", row.get('occr_country', 'NA'))
     
+    render_version_history(dataset, row)
+    
+    checkpoint('demographics & reactions')
     # Demographics Section
     st.markdown('<div class="section-header">👤 Patient Demographics</div>', unsafe_allow_html=True)
     demo_cols = st.columns(6)
@@ -484,13 +454,17 @@ def main():
     else:
         st.info("No adverse reactions recorded")
     
+    checkpoint('drug parsing')
     # Drugs Section
-    drugs = process_drug_data(row)
+    drugs = process_drug_data(row, format_dates=True)
     case_event_date = format_date_std(row.get('event_dt', 'NA'))
     
+    checkpoint('drug cards')
     st.markdown(f'<div class="section-header">💊 Drug Information ({len(drugs)} drugs)</div>', unsafe_allow_html=True)
     
-    for drug in drugs:
+    onset = dataset.case_onset(dataset.position(row))
+    
+    for i, drug in enumerate(drugs):
         role_class = get_role_class(drug['role_code'])
         role_label = get_role_label(drug['role_code'])
         
@@ -551,6 +525,13 @@ def main():
         with drug_cols3[4]:
             display_field("Lot Number", drug['lot_number'])
         
+        timing = onset.iloc[i] if i < len(onset) else None
+        drug_cols_tto = st.columns(5)
+        with drug_cols_tto[0]:
+            display_field("Time to Onset", format_onset(timing) if timing is not None else 'NA')
+        with drug_cols_tto[1]:
+            display_field("Exposure", format_exposure(timing) if timing is not None else 'NA')
+        
         # Row 4: Challenge and Other Info
         st.markdown("**Challenge & Regulatory**")
         drug_cols4 = st.columns(4)
@@ -567,15 +548,14 @@ def main():
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown("<br>", unsafe_allow_html=True)
     
+    checkpoint('onset distributions')
+    render_onset_distributions(dataset, dataset.position(row))
+    
     # Narrative Section
-    if 'narrative' in row and pd.notna(row.get('narrative')) and str(row.get('narrative')).strip() not in ['', 'NA']:
-        st.markdown('<div class="section-header">📝 Case Narrative</div>', unsafe_allow_html=True)
-        st.markdown(f"""
-        <div style="background: white; padding: 20px; border-radius: 8px; border: 1px solid #e0e0e0; white-space: pre-wrap; font-family: monospace; font-size: 13px;">
-        {row.get('narrative', 'NA')}
-        </div>
-        """, unsafe_allow_html=True)
+    checkpoint('narratives')
+    render_narratives(dataset, row)
         
+    checkpoint('assessment form')
     # === NEW SECTION: Assessment Form ===
     st.markdown("---")
     st.markdown('<div class="section-header">⚖️ Case Assessment</div>', unsafe_allow_html=True)
@@ -583,13 +563,31 @@ def main():
     with st.container():
         st.markdown('<div class="assessment-box">', unsafe_allow_html=True)
         st.markdown("### Evaluate Case")
-        st.caption("Complete the assessment based on the ICSR template. Download the result below.")
+        st.caption("Complete the assessment based on the ICSR template. It is saved on the server and can be downloaded below.")
+        
+        store = get_assessment_store()
+        past_assessments = store.for_case(row.get('caseid', ''))
+        if len(past_assessments) > 0:
+            with st.expander(f"🗂️ Previous Assessments ({len(past_assessments)})"):
+                st.dataframe(
+                    past_assessments[['submitted_at', 'assessor', 'final_score', 'outcome', 'description']],
+                    hide_index=True,
+                    use_container_width=True
+                )
+        
+        # Proposed answers from the structured fields; widget keys are per case so they refill on case change
+        prescore = dataset.case_prescore(dataset.position(row))
+        form_key = row.get('primaryid', '')
+        if prescore['drug']:
+            st.info(f"🤖 Pre-scored from structured fields for {prescore['drug']}: "
+                    f"{prescore['final_score']} ({prescore['category']}). Review every answer before submitting.")
         
         with st.form("assessment_form"):
             # Header info (Pre-filled)
             col_a1, col_a2 = st.columns(2)
             with col_a1:
                 asm_case = st.text_input("Case Number", value=str(row.get('caseid', '')), disabled=True)
+                asm_assessor = st.text_input("Assessor", value='' if pd.isna(row.get('assessor')) else str(row.get('assessor', '')))
             with col_a2:
                 # Pre-fill PTs
                 default_pt = str(row.get('pt', '')).replace(';', ', ')
@@ -611,29 +609,37 @@ def main():
             with tab1:
                 for i in range(1, 6):
                     st.markdown(f"**Question {i}**")
+                    st.caption(NARANJO_QUESTIONS[i - 1])
                     c1, c2 = st.columns([1, 3])
                     with c1:
-                        scores[f'q{i}_score'] = st.number_input(f"Q{i} Score", min_value=-10, max_value=10, value=0, key=f"q{i}s")
+                        scores[f'q{i}_score'] = st.number_input(f"Q{i} Score", min_value=-10, max_value=10,
+                                                                value=int(prescore[f'q{i}_score']), key=f"q{i}s_{form_key}")
                     with c2:
-                        reasonings[f'q{i}_reasoning'] = st.text_input(f"Q{i} Reasoning", key=f"q{i}r")
+                        reasonings[f'q{i}_reasoning'] = st.text_input(f"Q{i} Reasoning", value=prescore[f'q{i}_reasoning'],
+                                                                      key=f"q{i}r_{form_key}")
                     st.divider()
 
             with tab2:
                 for i in range(6, 11):
                     st.markdown(f"**Question {i}**")
+                    st.caption(NARANJO_QUESTIONS[i - 1])
                     c1, c2 = st.columns([1, 3])
                     with c1:
-                        scores[f'q{i}_score'] = st.number_input(f"Q{i} Score", min_value=-10, max_value=10, value=0, key=f"q{i}s")
+                        scores[f'q{i}_score'] = st.number_input(f"Q{i} Score", min_value=-10, max_value=10,
+                                                                value=int(prescore[f'q{i}_score']), key=f"q{i}s_{form_key}")
                     with c2:
-                        reasonings[f'q{i}_reasoning'] = st.text_input(f"Q{i} Reasoning", key=f"q{i}r")
+                        reasonings[f'q{i}_reasoning'] = st.text_input(f"Q{i} Reasoning", value=prescore[f'q{i}_reasoning'],
+                                                                      key=f"q{i}r_{form_key}")
                     st.divider()
             
             st.markdown("#### Final Evaluation")
             col_f1, col_f2 = st.columns(2)
             with col_f1:
-                asm_final_score = st.number_input("Final Score", value=0)
+                asm_final_score = st.number_input("Final Score", value=int(prescore['final_score']), key=f"final_{form_key}")
             with col_f2:
-                asm_outcome = st.selectbox("Outcome", ["", "Related", "Not Related", "Indeterminate", "Unlikely"])
+                outcomes = ["", "Related", "Not Related", "Indeterminate", "Unlikely"]
+                proposed = CATEGORY_OUTCOME[prescore['category']] if prescore['drug'] else ""
+                asm_outcome = st.selectbox("Outcome", outcomes, index=outcomes.index(proposed), key=f"outcome_{form_key}")
             
             asm_desc = st.text_area("Description / Conclusion")
             
@@ -642,41 +648,50 @@ def main():
             
             submitted = st.form_submit_button("✅ Generate Assessment", use_container_width=True)
             
-            if submitted:
-                # Create dictionary for DataFrame matching template columns
-                data = {
-                    'case': [asm_case], # assuming case matches case_id in this context
-                    'case_id': [asm_case],
-                    'pt': [asm_pt],
-                    'drug_name': [asm_drug]
-                }
-                
-                # Add scores and reasonings
-                for i in range(1, 11):
-                    data[f'q{i}_score'] = [scores[f'q{i}_score']]
-                    data[f'q{i}_reasoning'] = [reasonings[f'q{i}_reasoning']]
-                
-                # Add finals
-                data['final_score'] = [asm_final_score]
-                data['outcome'] = [asm_outcome]
-                data['description'] = [asm_desc]
-                data['case_narrative'] = [asm_narrative]
-                
-                # Convert to DataFrame
-                result_df = pd.DataFrame(data)
-                
-                # Convert to CSV for download
-                csv = result_df.to_csv(index=False).encode('utf-8')
-                
-                st.success("Assessment generated! Download below.")
-                st.download_button(
-                    label="📥 Download Assessment (CSV)",
-                    data=csv,
-                    file_name=f"assessment_{asm_case}_{datetime.datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv"
-                )
-                
+        # Handled outside the form: st.download_button is not allowed inside st.form
+        if submitted:
+            # Record matching template columns
+            record = {
+                'case': asm_case, # assuming case matches case_id in this context
+                'case_id': asm_case,
+                'pt': asm_pt,
+                'drug_name': asm_drug
+            }
+            
+            # Add scores and reasonings
+            for i in range(1, 11):
+                record[f'q{i}_score'] = scores[f'q{i}_score']
+                record[f'q{i}_reasoning'] = reasonings[f'q{i}_reasoning']
+            
+            # Add finals
+            record['final_score'] = asm_final_score
+            record['outcome'] = asm_outcome
+            record['description'] = asm_desc
+            record['case_narrative'] = asm_narrative
+            
+            if not asm_assessor.strip():
+                st.error("❌ Please enter the assessor name before submitting")
+                st.stop()
+            
+            # Save on the server before offering the download
+            store.add(record, assessor=asm_assessor.strip(), primaryid=row.get('primaryid'))
+            
+            # Convert to DataFrame
+            result_df = pd.DataFrame([record])
+            
+            # Convert to CSV for download
+            csv = result_df.to_csv(index=False).encode('utf-8')
+            
+            st.success("Assessment saved! Download below.")
+            st.download_button(
+                label="📥 Download Assessment (CSV)",
+                data=csv,
+                file_name=f"assessment_{asm_case}_{datetime.datetime.now().strftime('%Y%m%d')}.csv",
+                mime="text/csv"
+            )
+            
         st.markdown('</div>', unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
+    with profiled_rerun('dsgapp'):
+        main()
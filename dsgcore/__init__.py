@@ -0,0 +1,7 @@
+"""Shared data-processing code for the DSG case viewer apps
+
+The package never imports Streamlit, so batch jobs on the server can load,
+parse and index case files directly (see dsgcore.loaders). gspread,
+google-auth and the optional format libraries are imported on first use;
+benchmarks/bench_import.py checks both.
+"""
@@ -0,0 +1,130 @@
+"""Durable local store of submitted case assessments (SQLite in WAL mode)"""
+import datetime
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+# Relative paths are taken from the app directory, not the working directory,
+# so both apps share one store wherever they are started from
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB_PATH = os.path.join(APP_DIR, os.path.expanduser(os.environ.get('DSG_ASSESSMENT_DB', 'assessments.sqlite3')))
+
+# Columns of the assessment template, in the order of the downloaded CSV
+TEMPLATE_COLUMNS = (
+    ['case', 'case_id', 'pt', 'drug_name']
+    + [f'q{i}_{part}' for i in range(1, 11) for part in ('score', 'reasoning')]
+    + ['final_score', 'outcome', 'description', 'case_narrative']
+)
+
+KEY_COLUMNS = ['caseid', 'assessor', 'submitted_at']
+
+_INTEGER_COLUMNS = {f'q{i}_score' for i in range(1, 11)} | {'final_score'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    caseid TEXT NOT NULL,
+    assessor TEXT NOT NULL,
+    submitted_at TEXT NOT NULL,
+    primaryid TEXT,
+    {columns},
+    UNIQUE (caseid, assessor, submitted_at)
+);
+CREATE INDEX IF NOT EXISTS idx_assessments_case ON assessments (caseid, submitted_at);
+CREATE INDEX IF NOT EXISTS idx_assessments_assessor ON assessments (assessor, submitted_at);
+""".format(columns=',\n    '.join(
+    f'"{col}" ' + ('INTEGER' if col in _INTEGER_COLUMNS else 'TEXT') for col in TEMPLATE_COLUMNS
+))
+
+def utc_timestamp():
+    """Current UTC time as an ISO-8601 string with microseconds"""
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='microseconds')
+
+class AssessmentStore:
+    """Transactional assessment store keyed by (caseid, assessor, submitted_at)
+
+    SQLite in WAL mode lets readers run alongside one writer, and writers
+    queue on the busy timeout instead of failing, so several assessors can
+    submit at the same time. A connection is opened per operation, which
+    keeps the store safe to share between Streamlit session threads.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        return conn
+
+    def add(self, record, assessor, primaryid=None, submitted_at=None):
+        """Save one assessment (a dict with the template columns); returns its key"""
+        caseid = str(record.get('case_id', record.get('case', '')))
+        submitted_at = submitted_at or utc_timestamp()
+        columns = KEY_COLUMNS + ['primaryid'] + TEMPLATE_COLUMNS
+        values = [caseid, str(assessor), submitted_at, None if primaryid is None else str(primaryid)]
+        values += [record.get(col) for col in TEMPLATE_COLUMNS]
+        names = ', '.join(f'"{col}"' for col in columns)
+        sql = f"INSERT INTO assessments ({names}) VALUES ({', '.join('?' * len(columns))})"
+        with closing(self._connect()) as conn:
+            # BEGIN IMMEDIATE takes the write lock up front, so a busy writer waits here
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(sql, values)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return caseid, str(assessor), submitted_at
+
+    def for_case(self, caseid):
+        """All assessments of a case, newest first (index lookup)"""
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                'SELECT * FROM assessments WHERE caseid = ? ORDER BY submitted_at DESC',
+                conn, params=[str(caseid)],
+            )
+
+    def _where(self, assessor=None, start=None, end=None):
+        """WHERE clause and parameters for an assessor / submitted_at range filter"""
+        clauses, params = [], []
+        if assessor:
+            clauses.append('assessor = ?')
+            params.append(str(assessor))
+        if start:
+            clauses.append('submitted_at >= ?')
+            params.append(str(start))
+        if end:
+            # `end` is inclusive: ISO timestamps of that day sort below the next day
+            clauses.append('submitted_at < ?')
+            params.append(str(pd.Timestamp(end) + pd.Timedelta(days=1))[:10])
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def iter_chunks(self, assessor=None, start=None, end=None, chunksize=5000):
+        """Yield assessments as DataFrames of at most `chunksize` rows, oldest first
+
+        `start` and `end` are dates (inclusive) on submitted_at.
+        """
+        where, params = self._where(assessor, start, end)
+        with closing(self._connect()) as conn:
+            yield from pd.read_sql_query(
+                f'SELECT * FROM assessments{where} ORDER BY submitted_at',
+                conn, params=params, chunksize=chunksize,
+            )
+
+    def assessors(self):
+        """Distinct assessor names"""
+        with closing(self._connect()) as conn:
+            return [r[0] for r in conn.execute('SELECT DISTINCT assessor FROM assessments ORDER BY assessor')]
+
+    def count(self):
+        """Number of stored assessments"""
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM assessments').fetchone()[0]
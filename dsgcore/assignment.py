@@ -0,0 +1,154 @@
+"""Bulk assignment of unassigned cases to a roster of assessors
+
+Every case row gets an effort estimate from its drug count, its number of
+suspect (PS/SS/I) drugs and the length of its narrative. All versions of a
+caseid form one unit of work: versions of a case someone already holds go
+to that assessor, and caseids with no assessor yet are dealt to the roster
+largest first, each to the assessor with the least work so far (the LPT
+rule). The starting load of every assessor is the effort of the open
+(not done) cases they already hold, so the roster ends up balanced on
+total open effort, not only on the new cases. Existing assignments are
+never changed. Everything but the dealing loop is vectorised; the loop
+does one heap operation per caseid.
+"""
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.sources import NA_TEXT
+
+# Effort of a case row: BASE_EFFORT plus these weights times drugs, suspect drugs and narrative KB
+BASE_EFFORT = 1.0
+EFFORT_WEIGHTS = {'drugs': 0.25, 'suspects': 1.0, 'narrative_kb': 0.5}
+
+SUSPECT_ROLES = ['PS', 'SS', 'I']
+DONE_STATUSES = {'done', 'closed', 'completed'}
+
+# date_assignement as the sheet writes it (06-01-2026)
+ASSIGNMENT_DATE_FORMAT = '%d-%m-%Y'
+
+def _blank(values):
+    """Mask of missing, whitespace-only or NA-marker ('NA', 'nan', ...) values"""
+    return values.isna().to_numpy() | values.astype(str).str.strip().isin(NA_TEXT).to_numpy()
+
+def unassigned_mask(df):
+    """Rows with no assessor"""
+    if 'assessor' not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    return _blank(df['assessor'])
+
+def case_effort(df, drug_table, weights=None):
+    """Estimated review effort of every positional row"""
+    weights = {**EFFORT_WEIGHTS, **(weights or {})}
+    rows = drug_table['row'].to_numpy()
+    drugs = np.bincount(rows, minlength=len(df))
+    suspects = np.bincount(rows[drug_table['role_code'].isin(SUSPECT_ROLES).to_numpy()], minlength=len(df))
+    narrative_kb = np.zeros(len(df))
+    if 'narrative' in df.columns:
+        narrative_kb = df['narrative'].astype('string').str.len().fillna(0).to_numpy(dtype=float) / 1024
+    return (BASE_EFFORT + weights['drugs'] * drugs + weights['suspects'] * suspects
+            + weights['narrative_kb'] * narrative_kb)
+
+def _case_keys(df):
+    """caseid of every row (primaryid where the caseid is missing), as text"""
+    keys = df['caseid'].astype('string') if 'caseid' in df.columns else pd.Series(pd.NA, index=df.index, dtype='string')
+    if 'primaryid' in df.columns:
+        keys = keys.fillna('p' + df['primaryid'].astype('string'))
+    return keys.fillna('').to_numpy()
+
+def plan_assignment(df, effort, roster, count_open=True):
+    """Assessor for every unassigned row; returns (plan, per-assessor summary)
+
+    plan has one line per newly assigned row: positional row, primaryid,
+    caseid, assessor, effort and the reason (`balanced` for caseids dealt
+    to the roster, `with case` for versions joining an assessor who
+    already holds the case).
+    """
+    roster = list(dict.fromkeys(str(name).strip() for name in roster if str(name).strip()))
+    if not roster:
+        raise ValueError('The roster has no assessors')
+    n = len(df)
+    codes, _ = pd.factorize(_case_keys(df))
+    assessor = (df['assessor'].astype('string').str.strip() if 'assessor' in df.columns
+                else pd.Series(pd.NA, index=df.index, dtype='string'))
+    assigned = ~_blank(assessor)
+    owners = assessor.to_numpy()
+
+    # Cases with an assessor on any version keep every version with that assessor
+    holder = pd.Series(owners[assigned]).groupby(codes[assigned]).last()
+    case_holder = np.full(codes.max() + 1 if n else 0, None, dtype=object)
+    case_holder[holder.index.to_numpy()] = holder.to_numpy()
+    row_holder = case_holder[codes] if n else np.array([], dtype=object)
+    joining = ~assigned & pd.notna(row_holder)
+    free = ~assigned & ~joining
+
+    loads = dict.fromkeys(roster, 0.0)
+    if count_open:
+        open_rows = assigned
+        if 'status' in df.columns:
+            open_rows = open_rows & ~df['status'].astype('string').str.strip().str.lower().isin(DONE_STATUSES).fillna(False).to_numpy()
+        open_load = pd.Series(effort[open_rows]).groupby(owners[open_rows]).sum()
+        for name in roster:
+            loads[name] += float(open_load.get(name, 0.0))
+    start_loads = dict(loads)
+    # Versions joining a case count towards their holder before the free cases are dealt
+    joined = pd.Series(effort[joining]).groupby(row_holder[joining].astype(str)).sum()
+    for name in roster:
+        loads[name] += float(joined.get(name, 0.0))
+
+    # Deal the free caseids, largest first, to the least loaded assessor
+    free_codes, free_keys = np.unique(codes[free], return_inverse=True)
+    case_effort_sum = np.bincount(free_keys, weights=effort[free], minlength=len(free_codes))
+    case_assessor = np.empty(len(free_codes), dtype=object)
+    heap = [(loads[name], i, name) for i, name in enumerate(roster)]
+    heapq.heapify(heap)
+    for case in np.argsort(-case_effort_sum, kind='stable'):
+        load, i, name = heap[0]
+        case_assessor[case] = name
+        heapq.heapreplace(heap, (load + case_effort_sum[case], i, name))
+
+    new_assessor = np.empty(n, dtype=object)
+    new_assessor[free] = case_assessor[free_keys]
+    new_assessor[joining] = row_holder[joining]
+    rows = np.flatnonzero(free | joining)
+    plan = pd.DataFrame({
+        'row': rows,
+        'primaryid': df['primaryid'].to_numpy()[rows] if 'primaryid' in df.columns else rows,
+        'caseid': df['caseid'].to_numpy()[rows] if 'caseid' in df.columns else None,
+        'assessor': new_assessor[rows],
+        'effort': effort[rows],
+        'reason': np.where(joining[rows], 'with case', 'balanced'),
+    })
+    return plan, assignment_summary(plan, start_loads)
+
+def assignment_summary(plan, start_loads):
+    """Open effort before, cases and effort added, and open effort after, per assessor"""
+    added = plan.groupby('assessor').agg(cases=('caseid', 'nunique'), rows=('row', 'size'), effort=('effort', 'sum'))
+    names = list(start_loads) + [name for name in added.index if name not in start_loads]
+    summary = pd.DataFrame({'assessor': names})
+    summary['open_effort_before'] = [start_loads.get(name, np.nan) for name in names]
+    for col in ('cases', 'rows', 'effort'):
+        summary[f'new_{col}'] = added[col].reindex(names).fillna(0).to_numpy()
+    summary['open_effort_after'] = summary['open_effort_before'].fillna(0) + summary['new_effort']
+    return summary
+
+def assignment_updates(df, plan, date_text, columns=('primaryid',)):
+    """Write-back frame of a plan: the key columns, assessor and date_assignement of every assigned row"""
+    updates = pd.DataFrame({col: df[col].to_numpy()[plan['row'].to_numpy()] for col in columns if col in df.columns})
+    updates['assessor'] = plan['assessor'].to_numpy()
+    updates['date_assignement'] = date_text
+    return updates
+
+def apply_assignment(df, plan, date_text):
+    """Copy of the case frame with the plan's assessor and date_assignement filled in"""
+    rows = plan['row'].to_numpy()
+    assessor = df['assessor'].astype('object').to_numpy().copy() if 'assessor' in df.columns else np.full(len(df), None, dtype=object)
+    dates = (df['date_assignement'].astype('object').to_numpy().copy() if 'date_assignement' in df.columns
+             else np.full(len(df), None, dtype=object))
+    assessor[rows] = plan['assessor'].to_numpy()
+    dates[rows] = date_text
+    out = df.assign(assessor=pd.Series(assessor, index=df.index, dtype=object),
+                    date_assignement=pd.Series(dates, index=df.index, dtype=object))
+    out.attrs = dict(df.attrs)
+    return out
@@ -0,0 +1,56 @@
+"""Server-side sorted, paginated browsing of the case frame
+
+The grid shows a few columns per case, two of them derived (the primary
+suspect drug and the first PT). For every column a sort permutation of all
+rows is computed once (factorised values, stable argsort, missing values
+last) and kept by the dataset, so sorting never touches the frame again.
+A page request walks the permutation, keeps the rows allowed by the
+current filters and materialises only the rows of the requested page.
+"""
+import numpy as np
+import pandas as pd
+
+from dsgcore.dedup import suspect_drug_by_row
+
+BROWSE_COLUMNS = ['primaryid', 'caseid', 'assessor', 'status', 'suspect_drug', 'first_pt', 'fda_dt']
+
+PAGE_SIZES = [25, 50, 100]
+
+def first_values(values, bounds):
+    """First value of every row of a long table, given the row bounds (None for rows without any)"""
+    starts, ends = bounds[:-1], bounds[1:]
+    has = ends > starts
+    first = np.full(len(starts), None, dtype=object)
+    first[has] = np.asarray(values, dtype=object)[starts[has]]
+    return first
+
+def browse_table(df, drug_table, reaction_table, reaction_bounds):
+    """Grid columns of every case, by positional row"""
+    columns = {}
+    for col in BROWSE_COLUMNS:
+        if col == 'suspect_drug':
+            columns[col] = suspect_drug_by_row(drug_table, len(df))
+        elif col == 'first_pt':
+            columns[col] = first_values(reaction_table.to_numpy(), reaction_bounds)
+        elif col in df.columns:
+            columns[col] = df[col].to_numpy()
+    table = pd.DataFrame(columns)
+    for col in ('suspect_drug', 'first_pt'):
+        table[col] = table[col].astype('string')
+    return table
+
+def sort_permutation(values, descending=False):
+    """Positional rows ordered by `values` (ties in row order, missing values last)"""
+    codes, _ = pd.factorize(values, sort=True)
+    missing = codes < 0
+    if descending:
+        codes = -codes
+    codes = np.where(missing, np.iinfo(codes.dtype).max, codes)
+    return np.argsort(codes, kind='stable')
+
+def page_positions(order, allowed, start, size):
+    """Positional rows of one page of `order` restricted to the `allowed` mask, and the number of allowed rows"""
+    if allowed is None:
+        return order[start:start + size], len(order)
+    selected = order[allowed[order]]
+    return selected[start:start + size], len(selected)
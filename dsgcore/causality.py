@@ -0,0 +1,155 @@
+"""Rule-based Naranjo pre-scoring of every case from its structured fields
+
+The answers that FAERS fields can support are proposed for all cases at
+once: temporal sequence from time to onset (Q2), dechallenge (Q3) and
+rechallenge (Q4) of the primary suspect drug, and other drugs as possible
+alternative causes (Q5). Questions that need the narrative or outside
+sources stay at 0 with a note saying what to check. The assessor reviews
+and overrides every proposal.
+"""
+import numpy as np
+import pandas as pd
+
+NARANJO_QUESTIONS = [
+    "Are there previous conclusive reports on this reaction?",
+    "Did the adverse event appear after the suspected drug was administered?",
+    "Did the adverse reaction improve when the drug was discontinued or a specific antagonist was administered?",
+    "Did the adverse reaction reappear when the drug was readministered?",
+    "Are there alternative causes (other than the drug) that could on their own have caused the reaction?",
+    "Did the reaction reappear when a placebo was given?",
+    "Was the drug detected in the blood (or other fluids) in concentrations known to be toxic?",
+    "Was the reaction more severe when the dose was increased, or less severe when the dose was decreased?",
+    "Did the patient have a similar reaction to the same or similar drugs in any previous exposure?",
+    "Was the adverse event confirmed by any objective evidence?",
+]
+
+# Fixed proposals for the questions structured fields cannot answer
+UNANSWERED = {
+    1: "Check the label and literature for previous conclusive reports",
+    6: "Placebo exposure is not captured in FAERS fields",
+    7: "Drug levels are not captured in FAERS fields; check the narrative",
+    9: "Previous exposure is not captured in FAERS fields; check the narrative",
+    10: "Objective evidence is not captured in FAERS fields; check the narrative",
+}
+
+SUSPECT_RANK = {'PS': 0, 'SS': 1, 'I': 2}
+
+def naranjo_category(total):
+    """Naranjo probability category of a total score"""
+    if total >= 9:
+        return 'Definite'
+    if total >= 5:
+        return 'Probable'
+    if total >= 1:
+        return 'Possible'
+    return 'Doubtful'
+
+# Outcome choices of the assessment form for each category
+CATEGORY_OUTCOME = {'Definite': 'Related', 'Probable': 'Related', 'Possible': 'Indeterminate', 'Doubtful': 'Unlikely'}
+
+def _code(series):
+    return series.astype('string').str.strip().str.upper().fillna('NA')
+
+def _span_text(low, high):
+    """'N' or 'N to M' day counts, missing where either bound is"""
+    low = pd.Series(low).round().astype('Int64').astype('string')
+    high = pd.Series(high).round().astype('Int64').astype('string')
+    return low.where(low == high, low + ' to ' + high)
+
+def case_prescores(drug_table, onset, n_rows):
+    """Proposed q1..q10 scores and reasoning plus the total for every positional row
+
+    The primary suspect drug (PS, else SS, else I; first listed) of each case
+    drives Q2-Q4. Cases without a suspect drug get zeros.
+    """
+    role = _code(drug_table['role_code'])
+    name = drug_table['drug_name'].astype('string').str.strip().str.upper().fillna('NA')
+    rank = role.map(SUSPECT_RANK)
+    suspect = rank.notna().to_numpy()
+    rows = drug_table['row'].to_numpy()
+
+    lines = pd.DataFrame({'row': rows, 'rank': rank.to_numpy(dtype=float), 'pos': drug_table['pos'].to_numpy(),
+                          'line': np.arange(len(drug_table))})[suspect]
+    chosen = lines.sort_values(['row', 'rank', 'pos']).drop_duplicates('row')
+    line = np.full(n_rows, -1)
+    line[chosen['row'].to_numpy()] = chosen['line'].to_numpy()
+    has = line >= 0
+    pick = np.where(has, line, 0)
+
+    def field(values):
+        """Value of the chosen drug line for every row"""
+        return pd.Series(np.asarray(values, dtype=object)[pick] if len(drug_table) else [np.nan] * n_rows)
+
+    drug = field(name).astype('string')
+    out = pd.DataFrame(index=pd.RangeIndex(n_rows, name='row'))
+    out['drug'] = drug.where(has, '').to_numpy()
+
+    # Q2: temporal sequence
+    tto_min = field(onset['tto_min']).astype(float).to_numpy()
+    tto_max = field(onset['tto_max']).astype(float).to_numpy()
+    after = tto_min >= 0
+    before = tto_max < 0
+    out['q2_score'] = np.select([after, before], [2, -1], 0)
+    out['q2_reasoning'] = np.select(
+        [after, before],
+        [('Event ' + _span_text(tto_min, tto_max) + ' days after start of ' + drug).to_numpy(dtype=object),
+         ('Event dated ' + _span_text(-tto_max, -tto_min) + ' days before start of ' + drug).to_numpy(dtype=object)],
+        'Start or event date missing or too imprecise to order',
+    )
+
+    # Q3/Q4: dechallenge and rechallenge codes (Y positive, N negative, U unknown, D does not apply)
+    dechal = _code(field(drug_table['dechallenge']))
+    rechal = _code(field(drug_table['rechallenge']))
+    out['q3_score'] = np.where(dechal == 'Y', 1, 0)
+    out['q3_reasoning'] = np.select(
+        [dechal == 'Y', dechal == 'N', dechal == 'D'],
+        ['Positive dechallenge reported', 'Negative dechallenge reported (reaction did not abate)',
+         'Dechallenge does not apply'],
+        'Dechallenge not reported',
+    )
+    out['q4_score'] = np.select([rechal == 'Y', rechal == 'N'], [2, -1], 0)
+    out['q4_reasoning'] = np.select(
+        [rechal == 'Y', rechal == 'N', rechal == 'D'],
+        ['Positive rechallenge reported', 'Negative rechallenge reported (no recurrence)',
+         'Rechallenge does not apply'],
+        'Rechallenge not reported',
+    )
+
+    # Q5: other suspect drugs argue for an alternative cause; concomitants only prompt a review
+    distinct = pd.DataFrame({'row': rows, 'name': name.to_numpy()})[suspect & (name != 'NA').to_numpy()]
+    n_suspects = np.bincount(distinct.drop_duplicates()['row'].to_numpy(), minlength=n_rows)
+    other_suspects = np.maximum(n_suspects - has.astype(int), 0)
+    concomitants = np.bincount(rows[(role == 'C').to_numpy()], minlength=n_rows)
+    out['q5_score'] = np.where(other_suspects > 0, -1, 0)
+    out['q5_reasoning'] = np.select(
+        [other_suspects > 0, concomitants > 0],
+        [('Other suspect drugs reported: ' + pd.Series(other_suspects).astype(str)).to_numpy(dtype=object),
+         ('No other suspect drug; concomitant drugs reported: ' + pd.Series(concomitants).astype(str)
+          + '; review them and the medical history').to_numpy(dtype=object)],
+        'No other drugs reported; review the medical history',
+    )
+
+    # Q8: dose and route are shown for the assessor; FAERS has no dose-change field
+    dose = (field(drug_table['dose_amount']).astype('string').fillna('NA') + ' '
+            + field(drug_table['dose_unit']).astype('string').fillna('')).str.strip()
+    route = field(drug_table['route']).astype('string').fillna('NA')
+    out['q8_score'] = 0
+    out['q8_reasoning'] = np.where(
+        dose.str.startswith('NA'),
+        'No dose reported',
+        ('Dose ' + dose + ', route ' + route + '; no dose-change information').to_numpy(dtype=object),
+    )
+
+    for q, note in UNANSWERED.items():
+        out[f'q{q}_score'] = 0
+        out[f'q{q}_reasoning'] = note
+
+    for q in (2, 3, 4, 5, 8):
+        out[f'q{q}_score'] = np.where(has, out[f'q{q}_score'], 0)
+        out[f'q{q}_reasoning'] = np.where(has, out[f'q{q}_reasoning'], 'No suspect drug coded')
+
+    columns = ['drug'] + [f'q{q}_{part}' for q in range(1, 11) for part in ('score', 'reasoning')]
+    out = out[columns]
+    out['final_score'] = out[[f'q{q}_score' for q in range(1, 11)]].sum(axis=1)
+    out['category'] = out['final_score'].map(naranjo_category)
+    return out
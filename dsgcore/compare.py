@@ -0,0 +1,75 @@
+"""Side-by-side alignment of a few cases (duplicate checks, causality context)
+
+Cases are taken from the dataset's structured tables, never re-parsed:
+scalar fields from the case frame, PTs from the reaction table and drugs
+from the exploded drug table. Every table has one line per field, PT or
+suspect drug, one column per case and a `differs` flag set when the cases
+do not all agree on that line.
+"""
+import pandas as pd
+
+from dsgcore.versions import DERIVED_COLUMNS
+
+COMPARE_MIN = 2
+COMPARE_MAX = 4
+
+# Scalar fields aligned in the demographics table, in display order
+DEMOGRAPHIC_COLUMNS = [
+    'caseid', 'caseversion', 'i_f_code', 'fda_dt', 'event_dt', 'rept_cod', 'mfr_sndr', 'occp_cod',
+    'reporter_country', 'occr_country', 'sex', 'age', 'age_cod', 'age_grp', 'wt', 'wt_cod', 'assessor', 'status',
+]
+
+SUSPECT_ROLES = ['PS', 'SS', 'I']
+
+def parse_primaryids(text):
+    """Distinct primaryids in a comma-, semicolon- or space-separated string, in order"""
+    ids = text.replace(',', ' ').replace(';', ' ').split()
+    return list(dict.fromkeys(ids))
+
+def _differs(table, labels):
+    """Flag lines on which the case columns do not all hold the same value"""
+    table['differs'] = table[labels].nunique(axis=1, dropna=False) > 1
+    return table
+
+def compare_fields(df, positions, labels, columns=None):
+    """Scalar fields of the cases (positional rows) side by side"""
+    columns = [c for c in (columns or DEMOGRAPHIC_COLUMNS) if c in df.columns and c not in DERIVED_COLUMNS]
+    values = df.iloc[positions][columns]
+    for col in columns:
+        # Whole numbers read as floats (dates, ages with gaps) are shown without the trailing .0
+        if values[col].dtype.kind == 'f' and (values[col].dropna() % 1 == 0).all():
+            values[col] = values[col].astype('Int64')
+    values = values.astype('string').fillna('NA')
+    table = pd.DataFrame({'field': columns})
+    for label, (_, case) in zip(labels, values.iterrows()):
+        table[label] = case.str.strip().to_numpy()
+    return _differs(table, labels)
+
+def compare_reactions(reaction_lists, labels):
+    """Union of the cases' PTs (first-seen order), with ✓ where a case reports the PT"""
+    reactions = list(dict.fromkeys(pt for pts in reaction_lists for pt in pts))
+    table = pd.DataFrame({'reaction': reactions})
+    for label, pts in zip(labels, reaction_lists):
+        table[label] = ['✓' if pt in set(pts) else '' for pt in reactions]
+    return _differs(table, labels)
+
+def _drug_summary(drugs):
+    """'role · dose · route' of every drug of one case, keyed by upper-cased drug name"""
+    summary = {}
+    for drug in drugs.to_dict('records'):
+        dose = ' '.join(v for v in (drug['dose_amount'], drug['dose_unit']) if v != 'NA')
+        parts = [drug['role_code'], dose, drug['route'] if drug['route'] != 'NA' else '']
+        text = ' · '.join(p for p in parts if p)
+        name = str(drug['drug_name']).upper()
+        summary[name] = f"{summary[name]} / {text}" if name in summary else text
+    return summary
+
+def compare_suspect_drugs(drug_slices, labels):
+    """Union of the cases' suspect (PS/SS/I) drugs aligned by name, with role, dose and route per case"""
+    summaries = [_drug_summary(drugs[drugs['role_code'].isin(SUSPECT_ROLES) & (drugs['drug_name'] != 'NA')])
+                 for drugs in drug_slices]
+    names = list(dict.fromkeys(name for summary in summaries for name in summary))
+    table = pd.DataFrame({'drug': names})
+    for label, summary in zip(labels, summaries):
+        table[label] = [summary.get(name, '') for name in names]
+    return _differs(table, labels)
@@ -0,0 +1,152 @@
+"""Precomputed case counts over the overview dimensions
+
+Every case is encoded once as one integer code per dimension (and its
+PTs as a long (case, code) list), each in the smallest integer dtype that
+holds the dimension's labels. A two-dimension pivot under any set of
+filters is then a boolean mask plus one `np.bincount` over the codes.
+"""
+import numpy as np
+import pandas as pd
+
+from dsgcore.dedup import first_suspect_drug, latest_version_mask
+from dsgcore.packed import explode_packed
+
+CUBE_DIMENSIONS = {
+    'quarter': 'FDA quarter',
+    'occr_country': 'Country',
+    'sex': 'Sex',
+    'age_grp': 'Age group',
+    'rept_cod': 'Report type',
+    'suspect_drug': 'Suspect drug',
+    'pt': 'PT',
+}
+
+UNKNOWN = 'Unknown'
+OTHER = 'Other'
+
+def fda_quarter(series):
+    """'YYYYQn' of YYYYMMDD-style dates ('Unknown' when the month is missing)"""
+    digits = series.astype('string').str.replace(r'\D', '', regex=True)
+    year = digits.str[:4]
+    month = pd.to_numeric(digits.str[4:6], errors='coerce')
+    valid = (digits.str.len() >= 6) & month.between(1, 12)
+    quarter = year + 'Q' + ((month - 1) // 3 + 1).astype('Int64').astype('string')
+    return quarter.where(valid, UNKNOWN).fillna(UNKNOWN)
+
+def code_dtype(n_labels):
+    """Smallest signed integer dtype holding codes 0..n_labels-1"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_labels <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+def _labels(values):
+    """Codes (smallest dtype that fits) and sorted labels of a string Series, missing values labelled 'Unknown'"""
+    values = values.astype('string').str.strip()
+    values = values.mask(values.isna() | values.isin(['', 'NA', 'nan']), UNKNOWN)
+    codes, labels = pd.factorize(values.to_numpy(dtype=object), sort=True)
+    return codes.astype(code_dtype(len(labels))), pd.Index(labels)
+
+class CaseCube:
+    """Dimension codes of the latest version of every case
+
+    `rows` are the positional rows of the encoded cases in the source frame.
+    Counts are cases, except along PT where a case counts once per PT.
+    """
+
+    def __init__(self, rows, codes, labels, pt_cases, pt_codes):
+        self.rows = rows
+        self.codes = codes
+        self.labels = labels
+        self.pt_cases = pt_cases
+        self.pt_codes = pt_codes
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def from_frame(cls, df, latest_only=True):
+        """Encode the cases of `df` (only latest versions by default)"""
+        rows = np.flatnonzero(latest_version_mask(df).to_numpy()) if latest_only else np.arange(len(df))
+        cases = df.iloc[rows]
+        columns = {
+            'quarter': fda_quarter(cases['fda_dt']) if 'fda_dt' in cases.columns else None,
+            'suspect_drug': first_suspect_drug(cases) if 'drug_seq' in cases.columns else None,
+        }
+        codes, labels = {}, {}
+        for dim in CUBE_DIMENSIONS:
+            if dim == 'pt':
+                continue
+            values = columns.get(dim)
+            if values is None:
+                values = cases[dim] if dim in cases.columns else pd.Series(pd.NA, index=cases.index)
+            codes[dim], labels[dim] = _labels(values)
+
+        pts = explode_packed(cases['pt']) if 'pt' in cases.columns else pd.Series([], dtype='string')
+        pt_codes, labels['pt'] = _labels(pts.str.strip())
+        pt_cases = pts.index.get_level_values('row').to_numpy() if len(pts) else np.array([], dtype=np.int64)
+        return cls(rows.astype(code_dtype(len(df))), codes, labels, pt_cases.astype(code_dtype(len(rows))), pt_codes)
+
+    def _select(self, dim, values):
+        codes = self.labels[dim].get_indexer(list(values))
+        return codes[codes >= 0]
+
+    def case_mask(self, filters=None):
+        """Boolean mask over the encoded cases matching every {dimension: [labels]} filter"""
+        mask = np.ones(len(self.rows), dtype=bool)
+        for dim, values in (filters or {}).items():
+            selected = self._select(dim, values)
+            if dim == 'pt':
+                has = np.zeros(len(self.rows), dtype=bool)
+                has[self.pt_cases[np.isin(self.pt_codes, selected)]] = True
+                mask &= has
+            else:
+                mask &= np.isin(self.codes[dim], selected)
+        return mask
+
+    def _entries(self, dims, mask):
+        """Code arrays of the counted entries along `dims` for the cases in `mask`"""
+        if 'pt' in dims:
+            keep = mask[self.pt_cases]
+            cases = self.pt_cases[keep]
+            return [self.pt_codes[keep] if dim == 'pt' else self.codes[dim][cases] for dim in dims]
+        cases = np.flatnonzero(mask)
+        return [self.codes[dim][cases] for dim in dims]
+
+    def _top(self, dim, codes, top):
+        """Remap `codes` onto the `top` most frequent labels, the rest going to one extra bucket"""
+        totals = np.bincount(codes, minlength=len(self.labels[dim]))
+        order = np.argsort(-totals, kind='stable')
+        order = order[totals[order] > 0][:top] if top else order[totals[order] > 0]
+        lookup = np.full(len(totals), len(order), dtype=np.int64)
+        lookup[order] = np.arange(len(order))
+        names = list(self.labels[dim][order])
+        if (totals > 0).sum() > len(order):
+            names.append(OTHER)
+        return lookup[codes], names
+
+    def counts(self, dim, filters=None, top=None):
+        """Counts along one dimension, largest first"""
+        [codes] = self._entries([dim], self.case_mask(filters))
+        codes, names = self._top(dim, codes, top)
+        return pd.Series(np.bincount(codes, minlength=len(names)), index=pd.Index(names, name=dim), name='cases')
+
+    def pivot(self, row_dim, col_dim, filters=None, top=20):
+        """Row x column counts over the `top` labels of each dimension (rest lumped as 'Other')"""
+        if row_dim == col_dim:
+            raise ValueError("Pivot needs two different dimensions")
+        if row_dim == 'pt' and col_dim == 'pt':
+            raise ValueError("PT cannot be crossed with itself")
+        row_codes, col_codes = self._entries([row_dim, col_dim], self.case_mask(filters))
+        row_codes, row_names = self._top(row_dim, row_codes, top)
+        col_codes, col_names = self._top(col_dim, col_codes, top)
+        grid = np.bincount(row_codes * len(col_names) + col_codes, minlength=len(row_names) * len(col_names))
+        return pd.DataFrame(
+            grid.reshape(len(row_names), len(col_names)),
+            index=pd.Index(row_names, name=row_dim),
+            columns=pd.Index(col_names, name=col_dim),
+        )
+
+    def case_rows(self, filters=None):
+        """Positional rows (in the source frame) of the cases matching the filters"""
+        return self.rows[self.case_mask(filters)]
@@ -0,0 +1,271 @@
+"""A loaded case file together with the structures derived from it"""
+import copy
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.assignment import case_effort
+from dsgcore.browse import browse_table, page_positions, sort_permutation
+from dsgcore.causality import case_prescores
+from dsgcore.cube import CaseCube
+from dsgcore.dedup import deduplicate
+from dsgcore.highlight import TermAutomaton, case_terms
+from dsgcore.merge import drop_repeated_versions
+from dsgcore.metrics import REGISTRY
+from dsgcore.packed import explode_drug_table, explode_packed
+from dsgcore.profiling import span
+from dsgcore.quality import validate_frame
+from dsgcore.signals import IncrementalSignals, batch_delta, dataset_counts
+from dsgcore.sources import type_columns
+from dsgcore.timing import onset_table
+from dsgcore.versions import build_version_index, version_timeline
+
+# Highlighter automata kept per dataset, most recently viewed cases first
+HIGHLIGHTER_CACHE_SIZE = 256
+
+def _row_bounds(rows, n_rows):
+    """Start offsets of every row in a long table sorted by row (plus the end)"""
+    return np.searchsorted(rows, np.arange(n_rows + 1))
+
+class CaseDataset:
+    """Case DataFrame plus lazily built, cached indexes
+
+    Every derived structure is computed once per dataset on first use and
+    then shared by all reruns (and sessions) holding the same object.
+    Rows are addressed by their position in `df`.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._memo = {}
+        self._highlighters = OrderedDict()
+        # Guards _memo and _highlighters: reruns insert while the metrics thread reads
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    def ingest(self):
+        """Build the indexes every session needs up front, once per loaded frame
+
+        This is the validation stage of ingest: every case is checked here,
+        not when its view first asks for its issues. The overview cube is
+        built here too, so no session pays for it on its first visit.
+        """
+        self.version_index
+        self.quality
+        self.cube
+        return self
+
+    def extend(self, batch):
+        """Dataset of this frame plus a batch of new cases or case versions (e.g. a new quarter)
+
+        A batch row whose primaryid is already in the frame replaces that
+        row, and the combined frame runs the ingest stage again. Signal
+        tables already built are carried over and updated with the batch's
+        count delta instead of being rebuilt.
+        """
+        with span('extend frame'):
+            df = type_columns(pd.concat([self.df, batch], ignore_index=True))
+            df, _ = drop_repeated_versions(df)
+            df, _ = deduplicate(df)
+        extended = CaseDataset(df)
+        with self._lock:
+            memo = list(self._memo.items())
+        for key, signals in memo:
+            if key[0] == 'signals':
+                _, drug_field, suspect_only = key
+                with span('update signals'):
+                    extended._memo[key] = copy.copy(signals)
+                    extended._memo[key].apply(*batch_delta(self.df, batch, drug_field, suspect_only))
+        return extended
+
+    def memo(self, key, build):
+        """Result of build() cached under `key`, for derived tables that take parameters"""
+        REGISTRY.cache_event(key[0], key in self._memo)
+        if key not in self._memo:
+            with span(f'build {key[0]}'):
+                value = build()
+            with self._lock:
+                self._memo.setdefault(key, value)
+        return self._memo[key]
+
+    def derived(self):
+        """Structures built so far: cached properties by name and memo entries by key (tuples)
+
+        A snapshot, so other threads (the metrics server) can walk it while
+        reruns keep adding entries.
+        """
+        # Copying the instance dict is one C call, atomic under the GIL
+        derived = {k: v for k, v in dict(vars(self)).items() if k not in ('df', '_memo', '_highlighters', '_lock')}
+        with self._lock:
+            derived.update(self._memo)
+        return derived
+
+    def position(self, row):
+        """Positional row number of a row Series taken from `df`"""
+        return self.df.index.get_loc(row.name)
+
+    @cached_property
+    def _primaryid_index(self):
+        """Index of the distinct primaryids and the positional row of the first occurrence of each"""
+        with span('build primaryid index'):
+            ids = self.df['primaryid'].astype(str).str.strip()
+            first = ~ids.duplicated().to_numpy()
+            return pd.Index(ids.to_numpy()[first]), np.flatnonzero(first)
+
+    def primaryid_positions(self, primaryids):
+        """Positional row of each primaryid (-1 when not in the frame)"""
+        if 'primaryid' not in self.df.columns:
+            return [-1] * len(primaryids)
+        index, rows = self._primaryid_index
+        found = index.get_indexer([str(p).strip() for p in primaryids])
+        return np.where(found >= 0, rows[found], -1).tolist()
+
+    @cached_property
+    def drug_table(self):
+        """Exploded drug table (one line per drug) sorted by row and position"""
+        with span('build drug_table'):
+            return explode_drug_table(self.df)
+
+    @cached_property
+    def _drug_row_bounds(self):
+        return _row_bounds(self.drug_table['row'].to_numpy(), len(self.df))
+
+    def case_drugs(self, position):
+        """Slice of the drug table belonging to one case"""
+        bounds = self._drug_row_bounds
+        return self.drug_table.iloc[bounds[position]:bounds[position + 1]]
+
+    @cached_property
+    def drug_counts(self):
+        """Number of drugs per positional row"""
+        return dict(enumerate(np.diff(self._drug_row_bounds)))
+
+    @cached_property
+    def effort(self):
+        """Estimated review effort per positional row (drugs, suspect drugs, narrative length)"""
+        drug_table = self.drug_table
+        with span('build effort'):
+            return case_effort(self.df, drug_table)
+
+    @cached_property
+    def onset(self):
+        """Time to onset and exposure of every line of the drug table"""
+        event_dates = self.df['event_dt'] if 'event_dt' in self.df.columns else pd.Series(pd.NA, index=self.df.index)
+        drug_table = self.drug_table
+        with span('build onset'):
+            return onset_table(drug_table, event_dates)
+
+    def case_onset(self, position):
+        """Slice of the onset table belonging to one case, in drug order"""
+        bounds = self._drug_row_bounds
+        return self.onset.iloc[bounds[position]:bounds[position + 1]]
+
+    @cached_property
+    def prescores(self):
+        """Proposed Naranjo scores and reasoning of every case, by positional row"""
+        drug_table, onset = self.drug_table, self.onset
+        with span('build prescores'):
+            return case_prescores(drug_table, onset, len(self.df))
+
+    def case_prescore(self, position):
+        """Proposed Naranjo scores and reasoning of one case"""
+        return self.prescores.iloc[position]
+
+    @cached_property
+    def reaction_table(self):
+        """Exploded reaction (PT) table indexed by (row, pos)"""
+        if 'pt' not in self.df.columns:
+            return pd.Series([], dtype='string', index=pd.MultiIndex.from_arrays([[], []], names=['row', 'pos']))
+        with span('build reaction_table'):
+            return explode_packed(self.df['pt'])
+
+    @cached_property
+    def _reaction_row_bounds(self):
+        return _row_bounds(self.reaction_table.index.get_level_values('row').to_numpy(), len(self.df))
+
+    def case_reactions(self, position):
+        """Reaction list of one case"""
+        bounds = self._reaction_row_bounds
+        return self.reaction_table.iloc[bounds[position]:bounds[position + 1]].tolist()
+
+    def case_highlighter(self, position):
+        """Automaton of one case's drugs, active ingredients, PTs and indications
+
+        Kept for the HIGHLIGHTER_CACHE_SIZE most recently viewed cases, so a
+        long-lived shared dataset does not keep one for every case ever viewed.
+        """
+        with self._lock:
+            automaton = self._highlighters.get(position)
+            if automaton is not None:
+                self._highlighters.move_to_end(position)
+        REGISTRY.cache_event('highlighter', automaton is not None)
+        if automaton is None:
+            with span('build highlighter'):
+                automaton = TermAutomaton(case_terms(self.case_drugs(position), self.case_reactions(position)))
+            with self._lock:
+                self._highlighters[position] = automaton
+                while len(self._highlighters) > HIGHLIGHTER_CACHE_SIZE:
+                    self._highlighters.popitem(last=False)
+        return automaton
+
+    @cached_property
+    def quality(self):
+        """Data-quality issues of all rows, sorted by positional row"""
+        with span('build quality'):
+            return validate_frame(self.df)
+
+    @cached_property
+    def _quality_row_bounds(self):
+        return _row_bounds(self.quality['row'].to_numpy(), len(self.df))
+
+    def case_issues(self, position):
+        """Data-quality issues of one case"""
+        bounds = self._quality_row_bounds
+        return self.quality.iloc[bounds[position]:bounds[position + 1]]
+
+    @cached_property
+    def version_index(self):
+        """caseid -> positional rows of all its versions, oldest first"""
+        with span('build version_index'):
+            return build_version_index(self.df)
+
+    def case_versions(self, caseid):
+        """Positional rows of all versions of a caseid, oldest first"""
+        return self.version_index.get(str(caseid), np.array([], dtype=int))
+
+    def version_timeline(self, caseid):
+        """Timeline table of all versions of a caseid"""
+        return version_timeline(self.df, self.case_versions(caseid), self.drug_counts)
+
+    @cached_property
+    def cube(self):
+        """Overview counts cube over the latest version of every case"""
+        with span('build cube'):
+            return CaseCube.from_frame(self.df)
+
+    def signals(self, drug_field='drug_name', suspect_only=False):
+        """Disproportionality scores of the latest case versions (IncrementalSignals), once per drug field and role filter"""
+        return self.memo(('signals', drug_field, suspect_only),
+                         lambda: IncrementalSignals(dataset_counts(self, drug_field, suspect_only)))
+
+    @cached_property
+    def browse_table(self):
+        """Browse-grid columns of every case (with suspect drug and first PT), by positional row"""
+        drug_table, reaction_table, bounds = self.drug_table, self.reaction_table, self._reaction_row_bounds
+        with span('build browse_table'):
+            return browse_table(self.df, drug_table, reaction_table, bounds)
+
+    def browse_order(self, column, descending=False):
+        """Positional rows sorted by a browse column (missing values last), built once per column and direction"""
+        return self.memo(('browse_order', column, descending),
+                         lambda: sort_permutation(self.browse_table[column], descending))
+
+    def browse_page(self, column, descending, allowed, start, size):
+        """Browse-grid rows of one page (positional index) and the number of rows allowed by the filters"""
+        positions, total = page_positions(self.browse_order(column, descending), allowed, start, size)
+        return self.browse_table.iloc[positions], total
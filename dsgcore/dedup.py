@@ -0,0 +1,197 @@
+"""Case-version resolution and probable-duplicate detection at ingest"""
+import numpy as np
+import pandas as pd
+
+from dsgcore.packed import explode_drug_table, explode_packed
+
+BLOCKING_KEYS = ['age', 'sex', 'event_dt', 'suspect_drug']
+
+# Weights of the pairwise similarity computed inside a block
+SIMILARITY_WEIGHTS = {
+    'pt': 0.5,
+    'drugs': 0.3,
+    'context': 0.2,
+}
+
+
+def _numeric(df, col):
+    """Column coerced to numbers, all-NaN when the column is absent"""
+    if col in df.columns:
+        return pd.to_numeric(df[col], errors='coerce')
+    return pd.Series(float('nan'), index=df.index)
+
+
+def _text(df, col):
+    """Column as stripped upper-case strings, all-NA when the column is absent"""
+    if col in df.columns:
+        return df[col].astype('string').str.strip().str.upper()
+    return pd.Series(pd.NA, index=df.index, dtype='string')
+
+
+def _version_order(df):
+    """Sortable frame used to rank the rows of the same caseid"""
+    return pd.DataFrame({
+        'caseid': df['caseid'].astype(str),
+        'version': _numeric(df, 'caseversion'),
+        'fda_dt': _numeric(df, 'fda_dt'),
+        'primaryid': _numeric(df, 'primaryid'),
+    }, index=df.index)
+
+
+def latest_version_mask(df):
+    """Boolean Series that is True for the latest version of every caseid
+
+    Rows are ranked by caseversion, then fda_dt, then primaryid (FAERS
+    primaryids are caseid followed by the version number).
+    """
+    if 'caseid' not in df.columns:
+        return pd.Series(True, index=df.index)
+    order = _version_order(df).sort_values(['caseid', 'version', 'fda_dt', 'primaryid'], na_position='first', kind='stable')
+    latest = ~order['caseid'].duplicated(keep='last')
+    return latest.reindex(df.index)
+
+
+def resolve_latest_versions(df):
+    """Keep only the latest version of every caseid"""
+    return df[latest_version_mask(df)]
+
+
+def first_suspect_drug(df):
+    """Name of the primary suspect drug of every row (SS when no PS is coded)"""
+    drugs = explode_drug_table(df, columns=['drug_seq', 'role_cod', 'drugname'])
+    return pd.Series(suspect_drug_by_row(drugs, len(df)), index=df.index)
+
+
+def suspect_drug_by_row(drugs, n_rows):
+    """Upper-cased primary suspect drug of every positional row of a drug table (SS when no PS is coded)"""
+    drugs = drugs[drugs['role_code'].isin(['PS', 'SS']) & (drugs['drug_name'] != 'NA')]
+    drugs = drugs.assign(rank=(drugs['role_code'] != 'PS').astype(int)).sort_values(['row', 'rank', 'pos'])
+    first = drugs.drop_duplicates('row').set_index('row')['drug_name'].str.upper()
+    return first.reindex(range(n_rows)).to_numpy()
+
+
+def blocking_frame(df):
+    """Normalized blocking keys of every row; rows missing any key get NaN"""
+    blocks = pd.DataFrame(index=df.index)
+    age = _numeric(df, 'age').round().astype('Int64').astype('string')
+    blocks['age'] = age + _text(df, 'age_cod').fillna('')
+    sex = _text(df, 'sex')
+    blocks['sex'] = sex.where(sex.isin(['M', 'F']))
+    event_dt = _text(df, 'event_dt').str.replace(r'\D', '', regex=True)
+    blocks['event_dt'] = event_dt.where(event_dt.str.len() >= 6)
+    blocks['suspect_drug'] = first_suspect_drug(df).astype('string') if 'drug_seq' in df.columns else pd.NA
+    # NA in any key propagates through the concatenation
+    block = blocks[BLOCKING_KEYS[0]].astype('string')
+    for key in BLOCKING_KEYS[1:]:
+        block = block + '|' + blocks[key].astype('string')
+    blocks['block'] = block
+    return blocks
+
+
+def _token_sets(series, rows):
+    """frozenset of upper-cased list items for the given positional rows of a packed column"""
+    sub = series.iloc[rows]
+    parts = explode_packed(sub).str.upper()
+    parts = parts[parts != 'NA']
+    sets = {}
+    for (row, _), token in zip(parts.index, parts.to_numpy()):
+        sets.setdefault(rows[row], set()).add(token)
+    return {row: frozenset(tokens) for row, tokens in sets.items()}
+
+
+def _jaccard(a, b):
+    """Jaccard similarity of two token sets; 0 when both are empty"""
+    if not a or not b:
+        return 0.0
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+def find_probable_duplicates(df, threshold=0.6, max_block_size=500):
+    """Pairs of different caseids that probably describe the same case
+
+    Only the latest version of each caseid takes part. Candidate pairs come
+    from a self-join on the blocking keys (age, sex, event_dt, suspect
+    drug), so the pairwise similarity is only computed inside a block.
+    Blocks larger than `max_block_size` are skipped because such keys
+    (e.g. a very common drug with a year-only event date) carry no signal.
+    """
+    columns = ['caseid_a', 'caseid_b', 'primaryid_a', 'primaryid_b', 'similarity']
+    if 'caseid' not in df.columns or len(df) == 0:
+        return pd.DataFrame(columns=columns)
+
+    latest = df[latest_version_mask(df)].reset_index(drop=True)
+    blocks = blocking_frame(latest)
+    cand = pd.DataFrame({
+        'idx': range(len(latest)),
+        'caseid': latest['caseid'].astype(str).to_numpy(),
+        'block': blocks['block'].to_numpy(),
+    }).dropna(subset=['block'])
+    sizes = cand['block'].map(cand['block'].value_counts())
+    cand = cand[(sizes > 1) & (sizes <= max_block_size)]
+    if cand.empty:
+        return pd.DataFrame(columns=columns)
+
+    pairs = cand.merge(cand, on='block', suffixes=('_a', '_b'))
+    pairs = pairs[pairs['caseid_a'] < pairs['caseid_b']]
+    if pairs.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Token sets are only built for rows that have at least one candidate pair
+    involved = np.unique(np.concatenate([pairs['idx_a'].to_numpy(), pairs['idx_b'].to_numpy()]))
+    pt_sets = _token_sets(latest['pt'], involved) if 'pt' in latest.columns else {}
+    drug_sets = _token_sets(latest['drugname'], involved) if 'drugname' in latest.columns else {}
+    context = pd.Series('', index=latest.index)
+    for col in ('occr_country', 'wt', 'reporter_country'):
+        context = context + '|' + _text(latest, col).fillna('')
+    context = context.to_numpy()
+
+    ia = pairs['idx_a'].to_numpy()
+    ib = pairs['idx_b'].to_numpy()
+    pt_sim = [_jaccard(pt_sets.get(a), pt_sets.get(b)) for a, b in zip(ia, ib)]
+    drug_sim = [_jaccard(drug_sets.get(a), drug_sets.get(b)) for a, b in zip(ia, ib)]
+    context_sim = (context[ia] == context[ib]).astype(float)
+    similarity = (
+        SIMILARITY_WEIGHTS['pt'] * np.asarray(pt_sim, dtype=float)
+        + SIMILARITY_WEIGHTS['drugs'] * np.asarray(drug_sim, dtype=float)
+        + SIMILARITY_WEIGHTS['context'] * context_sim
+    )
+
+    primaryids = latest['primaryid'].astype(str).to_numpy() if 'primaryid' in latest.columns else latest['caseid'].astype(str).to_numpy()
+    result = pd.DataFrame({
+        'caseid_a': pairs['caseid_a'].to_numpy(),
+        'caseid_b': pairs['caseid_b'].to_numpy(),
+        'primaryid_a': primaryids[ia],
+        'primaryid_b': primaryids[ib],
+        'similarity': similarity.round(3),
+    })
+    result = result[result['similarity'] >= threshold]
+    return result.sort_values('similarity', ascending=False).reset_index(drop=True)
+
+
+def deduplicate(df, threshold=0.6):
+    """Ingest stage: annotate versions and probable duplicates
+
+    Adds `is_latest_version`, `version_count` and `probable_duplicates`
+    (semicolon-packed caseids of probable duplicates) to a copy of `df`,
+    and returns it together with the duplicate pair table.
+    """
+    df = df.copy()
+    df['is_latest_version'] = latest_version_mask(df)
+    if 'caseid' in df.columns:
+        caseids = df['caseid'].astype(str)
+        df['version_count'] = caseids.map(caseids.value_counts()).to_numpy()
+    else:
+        df['version_count'] = 1
+
+    pairs = find_probable_duplicates(df, threshold=threshold)
+    if len(pairs) and 'caseid' in df.columns:
+        both = pd.concat([
+            pairs[['caseid_a', 'caseid_b']].set_axis(['caseid', 'other'], axis=1),
+            pairs[['caseid_b', 'caseid_a']].set_axis(['caseid', 'other'], axis=1),
+        ])
+        others = both.groupby('caseid')['other'].agg(lambda s: ' ; '.join(sorted(set(s))))
+        df['probable_duplicates'] = df['caseid'].astype(str).map(others).fillna('').to_numpy()
+    else:
+        df['probable_duplicates'] = ''
+    return df, pairs
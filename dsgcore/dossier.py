@@ -0,0 +1,248 @@
+"""Parallel batch generation of standalone per-case review dossiers
+
+Renders the sections of the case viewer (status, administrative,
+demographics, reactions, drug cards and narrative) to one HTML or PDF file
+per case. Workers in a process pool each load the same dataset snapshot
+file once and receive only lists of row positions.
+
+    python -m dsgcore.dossier cases.csv --out C:\\Projects\\MyProject\\output\\dossiers --assessor Lorrie
+"""
+import argparse
+import html
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.fields import format_date_std, get_role_class, get_role_label
+from dsgcore.packed import explode_drug_table, explode_packed
+
+DOSSIER_CSS = """
+body { font-family: -apple-system, 'Segoe UI', Roboto, sans-serif; color: #212529; max-width: 1100px; margin: 20px auto; }
+.section-header { background: #667eea; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white;
+    padding: 10px 16px; border-radius: 8px; margin: 18px 0 10px 0; font-size: 17px; font-weight: 600; }
+.grid { display: flex; flex-wrap: wrap; }
+.field { flex: 1 0 18%; margin: 0 12px 10px 0; }
+.field-label { font-size: 10px; font-weight: 600; color: #6c757d; text-transform: uppercase; letter-spacing: 0.5px; }
+.field-value { font-size: 13px; font-weight: 500; }
+.drug-card { border: 2px solid #e0e0e0; border-radius: 8px; padding: 12px 16px; margin: 10px 0; page-break-inside: avoid; }
+.drug-card-ps { border-color: #dc3545; } .drug-card-ss { border-color: #ffc107; } .drug-card-c { border-color: #6c757d; }
+.role-badge { display: inline-block; padding: 3px 12px; border-radius: 14px; font-weight: 600; font-size: 11px; text-transform: uppercase; }
+.badge-ps { background: #dc3545; color: white; } .badge-ss { background: #ffc107; color: #000; } .badge-c { background: #6c757d; color: white; }
+.reaction-tag { display: inline-block; background: #dc3545; color: white; padding: 4px 10px; border-radius: 12px; margin: 3px; font-size: 12px; }
+.narrative { border: 1px solid #e0e0e0; border-radius: 8px; padding: 14px; white-space: pre-wrap; font-family: monospace; font-size: 12px; }
+"""
+
+# (label, column) rows of the case-level sections, as laid out in the viewer
+STATUS_FIELDS = [[("Status", 'status'), ("Assessor", 'assessor'), ("Assignment Date", 'date_assignement')]]
+
+ADMIN_FIELDS = [
+    [("Case ID", 'caseid'), ("Primary ID", 'primaryid'), ("Case Version", 'caseversion'), ("I/F Code", 'i_f_code')],
+    [("Event Date", 'event_dt'), ("Manufacture Date", 'mfr_dt'), ("Initial FDA Date", 'init_fda_dt'), ("FDA Date", 'fda_dt')],
+    [("Report Date", 'rept_dt'), ("Report Code", 'rept_cod'), ("To Manufacturer", 'to_mfr'), ("Reporter Country", 'reporter_country')],
+    [("Manufacturer Number", 'mfr_num'), ("Manufacturer Sender", 'mfr_sndr'), ("Authorization Number", 'auth_num'),
+     ("Literature Reference", 'lit_ref'), ("Occurrence Country", 'occr_country')],
+]
+
+DEMO_FIELDS = [[("Age", ('age', 'age_cod')), ("Age Group", 'age_grp'), ("Sex", 'sex'),
+                ("Weight", ('wt', 'wt_cod')), ("E-Sub", 'e_sub'), ("Occupation Code", 'occp_cod')]]
+
+# (heading, [(label, drug table key(s))]) blocks of a drug card
+DRUG_BLOCKS = [
+    ("Basic Information", [("Product/Active Ingredient", 'product_ai'), ("Indication", 'indication'), ("Route", 'route')]),
+    ("Dosing Information", [("Dose", ('dose_amount', 'dose_unit')), ("Dose Form", 'dose_form'),
+                            ("Dose Frequency", 'dose_frequency'), ("Dose VBM", 'dose_vbm'),
+                            ("Cumulative Dose", ('cum_dose_chr', 'cum_dose_unit'))]),
+    ("Timeline", [("Start Date", 'start_date'), ("End Date", 'end_date'), ("Duration", ('duration', 'duration_code')),
+                  ("Expiration Date", 'exp_dt'), ("Lot Number", 'lot_number')]),
+    ("Challenge & Regulatory", [("Dechallenge", 'dechallenge'), ("Rechallenge", 'rechallenge'),
+                                ("NDA Number", 'nda_num'), ("Val VBM", 'val_vbm')]),
+]
+
+def _value(record, key):
+    """Display value of one key (or of a (value, unit) pair) of a record"""
+    if isinstance(key, tuple):
+        parts = [_value(record, k) for k in key]
+        parts = [p for p in parts if p not in ('', 'NA')] or ['NA']
+        return ' '.join(parts)
+    value = record.get(key, 'NA')
+    if value is None or (isinstance(value, float) and np.isnan(value)) or str(value).strip() == '':
+        return 'NA'
+    return str(value)
+
+def _field(label, value):
+    # Same rule as display_field in the viewer: labels that name a date are formatted
+    if 'Date' in label or label.endswith('dt') or label.endswith('Dt'):
+        value = format_date_std(value)
+    return (f'<div class="field"><div class="field-label">{html.escape(label)}</div>'
+            f'<div class="field-value">{html.escape(str(value))}</div></div>')
+
+def _grid(record, rows):
+    return ''.join(
+        '<div class="grid">' + ''.join(_field(label, _value(record, key)) for label, key in row) + '</div>'
+        for row in rows
+    )
+
+def render_case_html(record, drugs, reactions):
+    """Standalone HTML dossier of one case
+
+    `record` is the case row as a dict, `drugs` its slice of the exploded
+    drug table as a list of dicts and `reactions` its PT list.
+    """
+    parts = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8">',
+        f"<title>Case {html.escape(_value(record, 'caseid'))} / {html.escape(_value(record, 'primaryid'))}</title>",
+        f'<style>{DOSSIER_CSS}</style></head><body>',
+        f"<h1>💊 Case {html.escape(_value(record, 'caseid'))}</h1>",
+        '<div class="section-header">📌 Status &amp; Assignment</div>', _grid(record, STATUS_FIELDS),
+        '<div class="section-header">📋 Administrative Information</div>', _grid(record, ADMIN_FIELDS),
+        '<div class="section-header">👤 Patient Demographics</div>', _grid(record, DEMO_FIELDS),
+        '<div class="section-header">⚠️ Adverse Reactions</div>',
+    ]
+    if reactions:
+        parts.append(''.join(f'<span class="reaction-tag">{html.escape(r)}</span>' for r in reactions))
+    else:
+        parts.append('<p>No adverse reactions recorded</p>')
+
+    parts.append(f'<div class="section-header">💊 Drug Information ({len(drugs)} drugs)</div>')
+    for drug in drugs:
+        role_class = get_role_class(drug['role_code'])
+        parts.append(
+            f'<div class="drug-card drug-card-{role_class}">'
+            f"<h3>Drug #{html.escape(drug['sequence'])}: {html.escape(drug['drug_name'])} "
+            f'<span class="role-badge badge-{role_class}">{html.escape(get_role_label(drug["role_code"]))}</span></h3>'
+        )
+        for heading, fields in DRUG_BLOCKS:
+            parts.append(f'<strong>{html.escape(heading)}</strong>')
+            parts.append(_grid(drug, [fields]))
+        parts.append('</div>')
+
+    for title, col in (("📝 Case Narrative", 'narrative'), ("📋 Cleaned Case Narrative", 'narrative_clean')):
+        text = _value(record, col)
+        if text != 'NA' and not (col == 'narrative_clean' and text == _value(record, 'narrative')):
+            parts.append(f'<div class="section-header">{title}</div><div class="narrative">{html.escape(text)}</div>')
+
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+# Dataset snapshot loaded once per worker process
+_worker_df = None
+
+def _init_worker(snapshot_path):
+    global _worker_df
+    _worker_df = pd.read_pickle(snapshot_path)
+
+def _safe_name(value):
+    return ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in str(value))
+
+def _render_chunk(positions, out_dir, fmt):
+    """Render the dossiers of a chunk of positional rows; returns the number of files written"""
+    chunk = _worker_df.iloc[positions]
+    drugs = explode_drug_table(chunk)
+    drug_bounds = np.searchsorted(drugs['row'].to_numpy(), np.arange(len(chunk) + 1))
+    drug_records = drugs.drop(columns=['row', 'pos']).to_dict('records')
+    if 'pt' in chunk.columns:
+        reactions = explode_packed(chunk['pt'])
+        reaction_rows = reactions.index.get_level_values('row').to_numpy()
+        reaction_bounds = np.searchsorted(reaction_rows, np.arange(len(chunk) + 1))
+        reaction_values = reactions.tolist()
+    else:
+        reaction_bounds = np.zeros(len(chunk) + 1, dtype=int)
+        reaction_values = []
+
+    if fmt == 'pdf':
+        # Optional dependency, only needed for PDF output
+        from weasyprint import HTML
+
+    written = 0
+    for i, record in enumerate(chunk.to_dict('records')):
+        page = render_case_html(
+            record,
+            drug_records[drug_bounds[i]:drug_bounds[i + 1]],
+            reaction_values[reaction_bounds[i]:reaction_bounds[i + 1]],
+        )
+        name = f"dossier_{_safe_name(_value(record, 'caseid'))}_{_safe_name(_value(record, 'primaryid'))}"
+        if fmt == 'pdf':
+            HTML(string=page).write_pdf(os.path.join(out_dir, name + '.pdf'))
+        else:
+            with open(os.path.join(out_dir, name + '.html'), 'w', encoding='utf-8') as fh:
+                fh.write(page)
+        written += 1
+    return written
+
+def generate_dossiers(df, out_dir, fmt='html', workers=None, chunk_size=100, progress=None):
+    """Write one dossier per row of `df` into `out_dir` using a process pool
+
+    Returns a dict with the number of cases, elapsed seconds and throughput
+    in cases per second. `progress`, if given, is called with the number of
+    cases done so far after each chunk.
+    """
+    if fmt not in ('html', 'pdf'):
+        raise ValueError(f"Unsupported dossier format: {fmt}")
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    # Workers read the same snapshot file instead of receiving pickled frames per task
+    fd, snapshot = tempfile.mkstemp(suffix='.pkl')
+    os.close(fd)
+    done = 0
+    try:
+        df.reset_index(drop=True).to_pickle(snapshot)
+        chunks = [np.arange(i, min(i + chunk_size, len(df))) for i in range(0, len(df), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot,)) as pool:
+            futures = [pool.submit(_render_chunk, chunk, out_dir, fmt) for chunk in chunks]
+            for future in as_completed(futures):
+                done += future.result()
+                if progress is not None:
+                    progress(done)
+    finally:
+        os.remove(snapshot)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'cases': done,
+        'seconds': elapsed,
+        'cases_per_second': done / elapsed if elapsed > 0 else float('nan'),
+        'workers': workers,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate per-case review dossiers for a filtered cohort")
+    parser.add_argument('dataset', help="Flattened case file (CSV, TSV/TXT or Parquet)")
+    parser.add_argument('--out', required=True, help="Output directory")
+    parser.add_argument('--format', choices=['html', 'pdf'], default='html')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=100)
+    parser.add_argument('--assessor', help="Only cases of this assessor")
+    parser.add_argument('--country', help="Only cases with this occurrence country")
+    parser.add_argument('--status', help="Only cases with this status")
+    parser.add_argument('--caseids', help="Comma-separated caseids")
+    parser.add_argument('--latest-only', action='store_true', help="Only the latest version of each caseid")
+    args = parser.parse_args(argv)
+
+    if args.dataset.endswith('.parquet'):
+        df = pd.read_parquet(args.dataset)
+    elif args.dataset.endswith('.tsv') or args.dataset.endswith('.txt'):
+        df = pd.read_csv(args.dataset, sep='\t')
+    else:
+        df = pd.read_csv(args.dataset)
+
+    for col, value in (('assessor', args.assessor), ('occr_country', args.country), ('status', args.status)):
+        if value is not None:
+            df = df[df[col].astype(str) == value]
+    if args.caseids:
+        df = df[df['caseid'].astype(str).isin([c.strip() for c in args.caseids.split(',')])]
+    if args.latest_only:
+        from dsgcore.dedup import resolve_latest_versions
+        df = resolve_latest_versions(df)
+
+    stats = generate_dossiers(df, args.out, fmt=args.format, workers=args.workers, chunk_size=args.chunk_size)
+    print(f"{stats['cases']:,} dossiers in {stats['seconds']:.1f}s "
+          f"({stats['cases_per_second']:.1f} cases/s, {stats['workers']} workers) -> {args.out}")
+
+if __name__ == '__main__':
+    main()
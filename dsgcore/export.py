@@ -0,0 +1,162 @@
+"""Streaming bulk export of cases and assessments to CSV, Parquet and XLSX
+
+Chunks are written to the output file as they arrive, so the complete
+result never exists in memory. pyarrow (Parquet) and openpyxl (XLSX) are
+imported only when that format is requested.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.timing import partial_dates
+
+EXPORT_FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'XLSX': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# Excel refuses longer cell values
+XLSX_MAX_CELL = 32767
+
+def iter_frame_chunks(df, positions=None, chunksize=5000):
+    """Yield consecutive slices of `df` (optionally only the given positional rows)"""
+    if positions is None:
+        positions = np.arange(len(df))
+    for start in range(0, len(positions), chunksize):
+        yield df.iloc[positions[start:start + chunksize]]
+
+def date_range_positions(series, start=None, end=None):
+    """Positional rows whose FAERS date (YYYY, YYYYMM or YYYYMMDD) may lie in [start, end]
+
+    A partial date covers a period, so it is kept when that period overlaps
+    the range. Missing or invalid dates are left out of any bounded range.
+    """
+    periods = partial_dates(series)
+    keep = pd.Series(True, index=series.index)
+    if start is not None:
+        keep &= periods['last'] >= pd.Timestamp(start)
+    if end is not None:
+        keep &= periods['first'] <= pd.Timestamp(end)
+    return np.flatnonzero(keep.fillna(False).to_numpy(dtype=bool))
+
+def _write_csv(chunks, path):
+    rows = 0
+    header = True
+    with open(path, 'w', encoding='utf-8', newline='') as fh:
+        for chunk in chunks:
+            chunk.to_csv(fh, index=False, header=header)
+            header = False
+            rows += len(chunk)
+    return rows
+
+# Case keys read as floats when the column has a blank; exported as integers
+ID_COLUMNS = ('primaryid', 'caseid', 'caseversion')
+
+def _integral(values):
+    """Whether a float column holds whole numbers only (or nothing)"""
+    present = values.dropna()
+    return bool((present == present.round()).all())
+
+def _arrow_ready(chunk):
+    """Integer columns (and whole-number ids) as Int64, other numbers as float64, the rest as strings"""
+    out = {}
+    for col in chunk.columns:
+        values = chunk[col]
+        if pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(values):
+            out[col] = values.astype('string')
+        elif pd.api.types.is_integer_dtype(values) or (col in ID_COLUMNS and _integral(values)):
+            out[col] = values.astype('Int64')
+        else:
+            out[col] = values.astype('float64')
+    return pd.DataFrame(out)
+
+def _write_parquet(chunks, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = 0
+    writer = None
+    schema = None
+    try:
+        for chunk in chunks:
+            chunk = _arrow_ready(chunk)
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(path, schema, compression='zstd')
+            else:
+                # A column that was all-numeric (or all-integer) in the first chunk may not be later on
+                for col in chunk.columns:
+                    if pa.types.is_integer(schema.field(col).type) and chunk[col].dtype != 'Int64':
+                        chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype('Int64')
+                    elif pa.types.is_floating(schema.field(col).type) and chunk[col].dtype != 'float64':
+                        chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+                    elif pa.types.is_string(schema.field(col).type) or pa.types.is_large_string(schema.field(col).type):
+                        chunk[col] = chunk[col].astype('string')
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({}), path)
+    return rows
+
+def _xlsx_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+        return None
+    if isinstance(value, str) and len(value) > XLSX_MAX_CELL:
+        return value[:XLSX_MAX_CELL]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _write_xlsx(chunks, path):
+    from openpyxl import Workbook
+
+    # write_only streams rows to disk instead of keeping a cell tree in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('export')
+    rows = 0
+    header = None
+    for chunk in chunks:
+        if header is None:
+            header = list(chunk.columns)
+            sheet.append(header)
+        for record in chunk.itertuples(index=False, name=None):
+            sheet.append([_xlsx_value(v) for v in record])
+        rows += len(chunk)
+    workbook.save(path)
+    return rows
+
+_WRITERS = {
+    'CSV': _write_csv,
+    'Parquet': _write_parquet,
+    'XLSX': _write_xlsx,
+}
+
+def export_chunks(chunks, path, fmt='CSV'):
+    """Write an iterable of DataFrame chunks to `path` in the given format; returns the row count"""
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return _WRITERS[fmt](chunks, path)
+
+def prune_exports(directory, max_age, prefix=''):
+    """Delete files in `directory` named `prefix`... and older than `max_age` seconds; returns how many were removed"""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.startswith(prefix) and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass  # Still being written or downloaded
+    return removed
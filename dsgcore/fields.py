@@ -0,0 +1,37 @@
+"""Display helpers for case fields, shared by the apps and batch jobs"""
+import pandas as pd
+
+def format_date_std(date_str):
+    """Format date string to YYYY-MM-DD"""
+    if pd.isna(date_str) or date_str == '' or str(date_str).strip().upper() == 'NA':
+        return 'NA'
+    
+    # Clean up string
+    date_str = str(date_str).strip()
+    
+    try:
+        # Try parsing with pandas, which handles many formats (ISO, YYYYMMDD, etc.)
+        dt = pd.to_datetime(date_str, errors='raise')
+        return dt.strftime('%Y-%m-%d')
+    except (ValueError, TypeError, OverflowError):
+        # Return original if parsing fails
+        return date_str
+
+def get_role_label(code):
+    """Get full label for role code"""
+    labels = {
+        'PS': 'Primary Suspect',
+        'SS': 'Secondary Suspect',
+        'C': 'Concomitant',
+        'I': 'Interacting'
+    }
+    return labels.get(code, code)
+
+def get_role_class(code):
+    """Get CSS class for role code"""
+    if code == 'PS':
+        return 'ps'
+    elif code == 'SS':
+        return 'ss'
+    else:
+        return 'c'
@@ -0,0 +1,143 @@
+"""Highlighting of a case's drugs and reactions inside its narrative
+
+The drug names, active ingredients, PTs and indications of a case are
+compiled into one Aho-Corasick automaton (a trie whose failure links let
+the scan continue without backtracking), so every occurrence of every term
+is found in a single pass over the text however many terms there are.
+Matching is case-insensitive on whole words; overlapping matches keep the
+leftmost, then longest one.
+"""
+import html
+
+from dsgcore.fields import get_role_class
+
+# Tag kinds -> (legend label, inline style); drug colours are those of the role badges
+HIGHLIGHT_STYLES = {
+    'ps': ('Primary suspect', 'background: #dc3545; color: white;'),
+    'ss': ('Secondary suspect', 'background: #ffc107; color: #000;'),
+    'c': ('Concomitant / interacting', 'background: #6c757d; color: white;'),
+    'pt': ('Reaction (PT)', 'background: #f8d7da; color: #842029; border: 1px solid #dc3545;'),
+    'indication': ('Indication', 'background: #cfe2ff; color: #084298; border: 1px solid #0d6efd;'),
+}
+
+# When one term has several kinds (e.g. a drug given as PS and C) the first listed wins
+KIND_PRIORITY = list(HIGHLIGHT_STYLES)
+
+MIN_TERM_LENGTH = 3
+
+def _fold(text):
+    """Lower-cased text with the same length (characters that expand when lowered are kept)"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+class TermAutomaton:
+    """Aho-Corasick automaton over a {term: kind} mapping"""
+
+    def __init__(self, terms):
+        self.kinds = {}
+        for term, kind in terms.items():
+            key = _fold(str(term).strip())
+            if len(key) < MIN_TERM_LENGTH or key == 'na':
+                continue
+            if key not in self.kinds or KIND_PRIORITY.index(kind) < KIND_PRIORITY.index(self.kinds[key]):
+                self.kinds[key] = kind
+
+        # goto[state] maps a character to the next state; out[state] lists the terms ending there
+        self.goto = [{}]
+        self.out = [[]]
+        for key in self.kinds:
+            state = 0
+            for char in key:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][char] = nxt
+                    self.goto.append({})
+                    self.out.append([])
+                state = nxt
+            self.out[state].append(key)
+
+        # Failure links in breadth-first order; each state inherits the outputs of its failure state
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def matches(self, text):
+        """Non-overlapping whole-word matches as (start, end, kind), in text order"""
+        if not self.kinds:
+            return []
+        folded = _fold(text)
+        goto, fail, out = self.goto, self.fail, self.out
+        found = []
+        state = 0
+        for end, char in enumerate(folded, start=1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for key in out[state]:
+                start = end - len(key)
+                if (start == 0 or not folded[start - 1].isalnum()) and (end == len(folded) or not folded[end].isalnum()):
+                    found.append((start, end, self.kinds[key]))
+
+        # Leftmost, then longest, match wins an overlap
+        found.sort(key=lambda m: (m[0], m[0] - m[1]))
+        kept = []
+        for match in found:
+            if not kept or match[0] >= kept[-1][1]:
+                kept.append(match)
+        return kept
+
+    def highlight(self, text):
+        """HTML-escaped text with every match wrapped in a coloured tag"""
+        parts = []
+        last = 0
+        for start, end, kind in self.matches(text):
+            parts.append(html.escape(text[last:start]))
+            parts.append(f'<mark title="{HIGHLIGHT_STYLES[kind][0]}" style="{HIGHLIGHT_STYLES[kind][1]} '
+                         f'padding: 0 3px; border-radius: 4px;">{html.escape(text[start:end])}</mark>')
+            last = end
+        parts.append(html.escape(text[last:]))
+        return ''.join(parts)
+
+def case_terms(drugs, reactions):
+    """{term: kind} of one case from its drug table slice and reaction list
+
+    Drug names and active ingredients take the class of their role badge,
+    indications and PTs their own kinds.
+    """
+    terms = {}
+
+    def add(term, kind):
+        term = str(term).strip()
+        current = terms.get(term)
+        if current is None or KIND_PRIORITY.index(kind) < KIND_PRIORITY.index(current):
+            terms[term] = kind
+
+    for record in drugs[['drug_name', 'product_ai', 'role_code', 'indication']].itertuples(index=False):
+        kind = get_role_class(record.role_code)
+        add(record.drug_name, kind)
+        add(record.product_ai, kind)
+        add(record.indication, 'indication')
+    for pt in reactions:
+        add(pt, 'pt')
+    return terms
+
+def legend_html(kinds):
+    """Legend badges of the given tag kinds"""
+    return ' '.join(
+        f'<span style="{HIGHLIGHT_STYLES[kind][1]} padding: 2px 8px; border-radius: 10px; font-size: 11px;">'
+        f'{HIGHLIGHT_STYLES[kind][0]}</span>'
+        for kind in KIND_PRIORITY if kind in kinds
+    )
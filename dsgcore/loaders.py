@@ -0,0 +1,79 @@
+"""Loaders that turn case files and Google Sheets into deduplicated case frames
+
+Nothing here imports Streamlit, and gspread/google-auth are imported only
+when a sheet is opened, so batch jobs that read files never need them.
+Every loader reads through a dsgcore.sources DataSource and runs the
+ingest stage (version resolution and probable duplicates) before
+returning the frame.
+"""
+from io import StringIO
+
+import pandas as pd
+
+from dsgcore.dedup import deduplicate
+from dsgcore.sources import ArrowFileSource, GoogleSheetSource, MergedSource, file_source, source_for_path
+from dsgcore.writeback import ASSESSMENT_SHEET_TITLE, SheetWriteBack
+
+SHEET_READ_SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets.readonly",
+    "https://www.googleapis.com/auth/drive.readonly"
+]
+SHEET_WRITE_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+SAMPLE_CSV = """date_assignement,assessor,status,primaryid,caseid,drug_seq,role_cod,drugname,prod_ai,val_vbm,route,dose_vbm,cum_dose_chr,cum_dose_unit,dechal,rechal,lot_num,exp_dt,nda_num,dose_amt,dose_unit,dose_form,dose_freq,start_dt,end_dt,dur,dur_cod,caseversion,i_f_code,event_dt,mfr_dt,init_fda_dt,fda_dt,rept_cod,auth_num,mfr_num,mfr_sndr,lit_ref,age,age_cod,age_grp,sex,e_sub,wt,wt_cod,rept_dt,to_mfr,occp_cod,reporter_country,occr_country,pt,indi_pt
+06-01-2026,Lorrie,,102854963,10285496,1 ; 4 ; 2 ; 5 ; 7 ; 3 ; 6,PS ; SS ; SS ; SS ; C ; SS ; C,ERIVEDGE ; ERIVEDGE ; ERIVEDGE ; ERIVEDGE ; DILTIAZEM ; ERIVEDGE ; LISINOPRIL,ERIVEDGE ; ERIVEDGE ; ERIVEDGE ; ERIVEDGE ; DILTIAZEM ; ERIVEDGE ; LISINOPRIL,1 ; 1 ; 1 ; 1 ; 1 ; 1 ; 1,Other ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,Y ; Y ; Y ; Y ; NA ; Y ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,50242-0140-01 ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,15000 ; NA ; NA ; NA ; NA ; NA ; NA,MG ; NA ; NA ; NA ; NA ; NA ; NA,Capsule ; NA ; NA ; NA ; NA ; NA ; NA,QD ; NA ; NA ; NA ; NA ; NA ; NA,2008 ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,3,F,20080101,20250116,20140709,20250128,EXP,,US-ROCHE-1428166,ROCHE,,58,YR,A,M,Y,,,20250128,,CN,US,US,Mood swings ; Upper limb fracture ; Alopecia ; Basal cell carcinoma ; Arthropathy ; Vitamin D deficiency ; Impaired healing ; Fall ; Gastrointestinal disorder ; Weight decreased,Basal cell carcinoma ; Basal cell carcinoma ; Basal cell naevus syndrome ; Basal cell carcinoma ; Basal cell carcinoma ; Basal cell carcinoma ; Hypertension ; Hypertension"""
+
+# Columns the apps read; columnar uploads are projected to these
+CASE_COLUMNS = SAMPLE_CSV.splitlines()[0].split(',') + ['narrative', 'narrative_clean']
+
+# Extensions accepted by the apps' uploaders
+UPLOAD_TYPES = ['csv', 'tsv', 'txt', 'gz', 'zip', 'zst', 'parquet', 'feather', 'arrow']
+
+def upload_source(file_bytes, file_name):
+    """DataSource of an uploaded file: CSV/TSV (all columns), optionally .gz/.zip/.zst, or Parquet/Feather projected to CASE_COLUMNS"""
+    source = file_source(file_bytes, file_name)
+    if isinstance(source, ArrowFileSource):
+        source.columns = CASE_COLUMNS
+    return source
+
+def read_case_file(file_bytes, file_name):
+    """Read an uploaded case file and run the ingest stage"""
+    return upload_source(file_bytes, file_name).read()
+
+def read_case_files(files, workers=None):
+    """Case frame of several uploaded (name, bytes) files, merged as in dsgcore.merge"""
+    if len(files) == 1:
+        return read_case_file(files[0][1], files[0][0])
+    return MergedSource([upload_source(data, name) for name, data in files], workers).read()
+
+def load_case_file(path):
+    """Case frame of a case file (CSV/TSV, Parquet/Feather, SQLite) or directory of them on disk"""
+    return source_for_path(path).read()
+
+def load_sample_data():
+    """Case frame of the built-in one-case sample"""
+    df, _ = deduplicate(pd.read_csv(StringIO(SAMPLE_CSV)))
+    return df
+
+def _gspread():
+    import gspread
+    return gspread
+
+def open_sheet(sheet_url, service_account_info, scopes=SHEET_READ_SCOPES):
+    """gspread Spreadsheet opened with a service-account key (dict)"""
+    from google.oauth2.service_account import Credentials
+    credentials = Credentials.from_service_account_info(service_account_info, scopes=scopes)
+    return _gspread().authorize(credentials).open_by_url(sheet_url)
+
+def load_google_sheet(sheet_url, service_account_info):
+    """Case frame of the first worksheet of a Google Sheet"""
+    return GoogleSheetSource(sheet_url, service_account_info).read()
+
+def open_sheet_writer(sheet_url, service_account_info):
+    """SheetWriteBack for the first worksheet, with assessments appended to their own worksheet"""
+    sheet = open_sheet(sheet_url, service_account_info, scopes=SHEET_WRITE_SCOPES)
+    try:
+        assessment_sheet = sheet.worksheet(ASSESSMENT_SHEET_TITLE)
+    except _gspread().WorksheetNotFound:
+        assessment_sheet = sheet.add_worksheet(ASSESSMENT_SHEET_TITLE, rows=1000, cols=40)
+    return SheetWriteBack(sheet.get_worksheet(0), assessment_sheet=assessment_sheet)
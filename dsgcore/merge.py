@@ -0,0 +1,85 @@
+"""Merge of several case extracts (e.g. FAERS quarters) into one case frame
+
+Every file is parsed on its own in a process pool (spawned, not forked, so
+it is safe under the threaded Streamlit server and on Windows); one file or
+one worker parses in-process. The frames are then aligned on one schema:
+column names are trimmed and lower-cased, columns missing from a file are
+added as missing values, and dtypes are reconciled with type_columns. A
+primaryid repeated across files (the same case version in two extracts)
+keeps the row of the later file, while other versions of a caseid are kept
+for the version history; the ingest stage then marks the latest version of
+every caseid on the combined frame, from which one index is built.
+
+The report gives the parse time of each file, their sum (what a serial
+parse costs) and the wall time of the parallel parse.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from dsgcore.profiling import span
+from dsgcore.sources import type_columns
+
+SOURCE_COLUMN = 'source_file'
+
+def _parse(source, columns):
+    """Raw frame of one source and its parse time (runs in a worker process)"""
+    start = time.perf_counter()
+    df = source.read_raw(columns)
+    return df, time.perf_counter() - start
+
+def parse_sources(sources, columns=None, workers=None):
+    """[(frame, seconds)] of every source, parsed by up to `workers` processes"""
+    workers = min(len(sources), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [_parse(source, columns) for source in sources]
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(_parse, sources, [columns] * len(sources)))
+
+def align_frames(frames, labels):
+    """One frame on the union schema (first-seen column order), rows tagged with their source label"""
+    renamed = []
+    for df, label in zip(frames, labels):
+        df = df.rename(columns=lambda c: str(c).strip().lower())
+        df = df.loc[:, ~df.columns.duplicated()]
+        df[SOURCE_COLUMN] = label
+        renamed.append(df)
+    columns = list(dict.fromkeys(c for df in renamed for c in df.columns))
+    merged = pd.concat([df.reindex(columns=columns) for df in renamed], ignore_index=True)
+    return type_columns(merged)
+
+def drop_repeated_versions(df):
+    """Drop rows whose primaryid appears again in a later source; returns (frame, rows dropped)"""
+    if 'primaryid' not in df.columns:
+        return df, 0
+    keep = ~df['primaryid'].astype(str).duplicated(keep='last').to_numpy()
+    keep = keep | df['primaryid'].isna().to_numpy()
+    return df[keep].reset_index(drop=True), int((~keep).sum())
+
+def merge_sources(sources, columns=None, workers=None):
+    """Raw merged frame of several sources and the merge report"""
+    start = time.perf_counter()
+    with span('parse files'):
+        parsed = parse_sources(sources, columns, workers)
+    parse_wall = time.perf_counter() - start
+    with span('align schemas'):
+        df = align_frames([frame for frame, _ in parsed], [source.label for source in sources])
+        df, repeated = drop_repeated_versions(df)
+    seconds = [s for _, s in parsed]
+    report = {
+        'files': [{'file': source.label, 'rows': len(frame), 'columns': frame.shape[1], 'seconds': s}
+                  for source, (frame, s) in zip(sources, parsed)],
+        'rows': len(df),
+        'repeated_rows_dropped': repeated,
+        'workers': min(len(sources), workers or os.cpu_count() or 1),
+        # Sum of the per-file parse times in the workers, not a timed serial run
+        # (benchmarks/bench_merge.py times that); overlap is their ratio to the wall time
+        'summed_file_seconds': sum(seconds),
+        'parallel_parse_seconds': parse_wall,
+        'overlap': sum(seconds) / parse_wall if parse_wall else None,
+        'seconds': time.perf_counter() - start,
+    }
+    return df, report
@@ -0,0 +1,241 @@
+"""Process-wide metrics of the viewer, served as Prometheus text or JSON
+
+The registry counts cache hits and misses, keeps one latency histogram
+per rerun stage (fed with finished RerunProfiles), remembers the last
+rerun of every session and holds weak references to the loaded datasets,
+whose sizes are measured when scraped. serve_metrics() exposes it on a
+local port from a daemon thread:
+
+    curl http://127.0.0.1:9464/metrics        # Prometheus text format
+    curl http://127.0.0.1:9464/metrics.json
+"""
+import json
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.profiling import rss_bytes
+
+# Upper bounds (s) of the latency histogram buckets
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# Sessions without a rerun for this long (s) no longer count as active
+SESSION_TIMEOUT = 900
+
+def nbytes(value):
+    """Approximate memory of a frame, series, array or container of them"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes(v) for v in value)
+    return 0
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[np.searchsorted(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf"""
+        return list(zip(self.buckets + [float('inf')], np.cumsum(self.counts).tolist()))
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None when empty)"""
+        if not self.count:
+            return None
+        for bound, seen in self.cumulative():
+            if seen >= q * self.count:
+                return bound
+
+class MetricsRegistry:
+    """Thread-safe counters, histograms and session/dataset bookkeeping"""
+
+    def __init__(self, session_timeout=SESSION_TIMEOUT):
+        self.session_timeout = session_timeout
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._stages = {}
+        self._sessions = {}
+        self._datasets = weakref.WeakValueDictionary()
+        self._dataset_bytes = {}
+        self._size_lock = threading.Lock()
+
+    def cache_event(self, cache, hit):
+        with self._lock:
+            counts = self._cache.setdefault(cache, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def observe_profile(self, profile):
+        """Add a finished RerunProfile: its total and every top-level stage"""
+        with self._lock:
+            self._stages.setdefault('rerun', Histogram()).observe(profile.seconds)
+            for span in profile.spans:
+                if span['depth'] == 0:
+                    self._stages.setdefault(span['name'], Histogram()).observe(span['seconds'])
+
+    def touch_session(self, session_id, app='', dataset=None, state_items=0):
+        """Record a rerun of a session and the dataset it holds"""
+        if dataset is not None:
+            self.track_dataset(dataset)
+        with self._lock:
+            self._sessions[session_id] = {
+                'app': app,
+                'last_seen': time.time(),
+                'dataset': id(dataset) if dataset is not None else None,
+                'state_items': state_items,
+            }
+
+    def track_dataset(self, dataset):
+        with self._lock:
+            self._datasets[id(dataset)] = dataset
+
+    def _dataset_sizes(self):
+        """Rows, frame bytes and derived-index bytes of every live dataset"""
+        sizes = {}
+        with self._lock:
+            datasets = list(self._datasets.items())
+        for key, dataset in datasets:
+            if key not in self._dataset_bytes:
+                self._dataset_bytes[key] = nbytes(dataset.df)
+            derived = dataset.derived()
+            names = [k for k in derived if isinstance(k, str)]
+            sizes[key] = {
+                'rows': len(dataset.df),
+                'frame_bytes': self._dataset_bytes[key],
+                'index_bytes': nbytes(derived),
+                'indexes': (sorted(k for k in names if not k.startswith('_'))
+                            + sorted(str(k[0]) for k in derived if isinstance(k, tuple))),
+            }
+        for key in set(self._dataset_bytes) - set(sizes):
+            del self._dataset_bytes[key]
+        return sizes
+
+    def snapshot(self):
+        """All metrics as one JSON-ready dict"""
+        now = time.time()
+        # Frame sizes are measured outside the main lock, so reruns never wait on a scrape
+        with self._size_lock:
+            datasets = self._dataset_sizes()
+        with self._lock:
+            active = {s: dict(info) for s, info in self._sessions.items() if now - info['last_seen'] <= self.session_timeout}
+            for session_id in set(self._sessions) - set(active):
+                del self._sessions[session_id]
+            cache = {name: {'hits': h, 'misses': m, 'hit_rate': h / (h + m) if h + m else None}
+                     for name, (h, m) in self._cache.items()}
+            stages = {name: {
+                'count': hist.count,
+                'sum': hist.sum,
+                'p50': hist.quantile(0.5),
+                'p95': hist.quantile(0.95),
+                'p99': hist.quantile(0.99),
+                'buckets': [[bound if bound != float('inf') else '+Inf', seen] for bound, seen in hist.cumulative()],
+            } for name, hist in self._stages.items()}
+        sessions = {
+            s: {**info, 'idle_seconds': now - info['last_seen'],
+                'dataset_bytes': datasets.get(info['dataset'], {}).get('frame_bytes', 0)}
+            for s, info in active.items()
+        }
+        return {
+            'uptime_seconds': now - self.started,
+            'process_resident_bytes': rss_bytes(),
+            'active_sessions': len(active),
+            'sessions': sessions,
+            'datasets': {str(k): v for k, v in datasets.items()},
+            'cache': cache,
+            'stages': stages,
+        }
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        metric('dsg_uptime_seconds', 'gauge', 'Seconds since the metrics registry started',
+               [({}, round(snap['uptime_seconds'], 3))])
+        if snap['process_resident_bytes'] is not None:
+            metric('dsg_process_resident_bytes', 'gauge', 'Resident memory of the app process',
+                   [({}, snap['process_resident_bytes'])])
+        metric('dsg_active_sessions', 'gauge', f'Sessions with a rerun in the last {self.session_timeout} s',
+               [({}, snap['active_sessions'])])
+        metric('dsg_session_dataset_bytes', 'gauge', 'Memory of the case frame held by each active session',
+               [({'session': s, 'app': info['app']}, info['dataset_bytes']) for s, info in snap['sessions'].items()])
+        metric('dsg_session_idle_seconds', 'gauge', 'Seconds since the last rerun of each active session',
+               [({'session': s, 'app': info['app']}, round(info['idle_seconds'], 3)) for s, info in snap['sessions'].items()])
+        metric('dsg_datasets_loaded', 'gauge', 'Case datasets alive in the process', [({}, len(snap['datasets']))])
+        metric('dsg_dataset_rows', 'gauge', 'Rows of each loaded dataset',
+               [({'dataset': k}, v['rows']) for k, v in snap['datasets'].items()])
+        metric('dsg_dataset_frame_bytes', 'gauge', 'Memory of the case frame of each loaded dataset',
+               [({'dataset': k}, v['frame_bytes']) for k, v in snap['datasets'].items()])
+        metric('dsg_dataset_index_bytes', 'gauge', 'Memory of the derived tables built on each dataset',
+               [({'dataset': k}, v['index_bytes']) for k, v in snap['datasets'].items()])
+        metric('dsg_cache_requests_total', 'counter', 'Cache lookups by cache and result',
+               [({'cache': name, 'result': result}, c[key]) for name, c in snap['cache'].items()
+                for result, key in (('hit', 'hits'), ('miss', 'misses'))])
+        lines.append('# HELP dsg_stage_seconds Rerun latency per stage (stage="rerun" is the whole run)')
+        lines.append('# TYPE dsg_stage_seconds histogram')
+        for name, hist in snap['stages'].items():
+            for bound, seen in hist['buckets']:
+                lines.append(f'dsg_stage_seconds_bucket{{stage="{_escape(name)}",le="{bound}"}} {seen}')
+            lines.append(f'dsg_stage_seconds_sum{{stage="{_escape(name)}"}} {hist["sum"]:.6f}')
+            lines.append(f'dsg_stage_seconds_count{{stage="{_escape(name)}"}} {hist["count"]}')
+        return '\n'.join(lines) + '\n'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+REGISTRY = MetricsRegistry()
+
+def serve_metrics(registry=REGISTRY, port=9464, host='127.0.0.1'):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread; returns the server"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if path == '/metrics':
+                body, kind = registry.prometheus(), 'text/plain; version=0.0.4; charset=utf-8'
+            elif path == '/metrics.json':
+                body, kind = json.dumps(registry.snapshot(), default=str), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', kind)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='dsg-metrics', daemon=True).start()
+    return server
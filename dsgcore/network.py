@@ -0,0 +1,208 @@
+"""Drug co-reporting network from the sparse case x drug incidence matrix
+
+With D the binary case x drug matrix and E the case x PT matrix, D.T @ D
+counts the cases co-reporting every drug pair, and for a set of pairs the
+elementwise product of their two drug columns gives a case x pair matrix
+P whose product P.T @ E counts every (drug pair, PT) triplet. Only
+non-zero cells are ever stored, so tens of thousands of drug names stay
+cheap. scipy is needed and imported on first use.
+"""
+import json
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.dedup import latest_version_mask
+from dsgcore.signals import _sparse, case_drug_pairs, case_event_pairs
+
+NETWORK_FORMATS = {
+    'GraphML': ('.graphml', 'application/graphml+xml'),
+    'JSON': ('.json', 'application/json'),
+    'CSV': ('.csv', 'text/csv'),
+}
+
+def _incidence(rows, codes, shape):
+    """Binary sparse matrix with ones at (rows, codes)"""
+    sparse = _sparse()
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, codes)), shape=shape)
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+def _lookup(matrix, rows, cols):
+    """Values of a sparse matrix at (rows, cols) as a flat array"""
+    if len(rows) == 0:
+        return np.zeros(0, dtype=matrix.dtype)
+    return np.asarray(matrix[rows, cols]).ravel()
+
+class DrugNetwork:
+    """Incidence matrices of one case set, with drug-pair and triplet counts on demand
+
+    `drugs` is the case x drug matrix, `interacting` the same restricted to
+    drugs coded I (interacting), `events` the case x PT matrix.
+    """
+
+    def __init__(self, drugs, interacting, drug_labels, events, event_labels):
+        self.drugs = drugs
+        self.interacting = interacting
+        self.drug_labels = drug_labels
+        self.events = events
+        self.event_labels = event_labels
+        self.drug_totals = np.asarray(drugs.sum(axis=0)).ravel()
+        self.event_totals = np.asarray(events.sum(axis=0)).ravel()
+        self.n = int((np.asarray(drugs.sum(axis=1)).ravel() > 0).sum())
+        self._drug_events = None
+
+    @classmethod
+    def from_drug_table(cls, drug_table, reaction_table, n_rows, drug_field='drug_name', suspect_only=False, rows=None):
+        """Build the matrices from the exploded drug and reaction tables"""
+        drug_rows, drugs = case_drug_pairs(drug_table, drug_field, suspect_only, rows)
+        i_rows, i_drugs = case_drug_pairs(drug_table[drug_table['role_code'] == 'I'], drug_field, False, rows)
+        event_rows, events = case_event_pairs(reaction_table, rows)
+        drug_codes, drug_labels = pd.factorize(drugs, sort=True)
+        event_codes, event_labels = pd.factorize(events, sort=True)
+        drug_labels, event_labels = pd.Index(drug_labels), pd.Index(event_labels)
+        i_codes = drug_labels.get_indexer(i_drugs)
+        known = i_codes >= 0
+        shape = (n_rows, len(drug_labels))
+        return cls(
+            _incidence(drug_rows, drug_codes, shape),
+            _incidence(i_rows[known], i_codes[known], shape),
+            drug_labels,
+            _incidence(event_rows, event_codes, (n_rows, len(event_labels))),
+            event_labels,
+        )
+
+    @classmethod
+    def from_dataset(cls, dataset, drug_field='drug_name', suspect_only=False, latest_only=True):
+        """Network of a CaseDataset (latest case versions only by default)"""
+        rows = np.flatnonzero(latest_version_mask(dataset.df).to_numpy()) if latest_only else None
+        return cls.from_drug_table(dataset.drug_table, dataset.reaction_table, len(dataset.df),
+                                   drug_field, suspect_only, rows)
+
+    def pairs(self, min_count=2):
+        """Drug pairs co-reported in at least `min_count` cases, most frequent first
+
+        `ratio` is observed over expected co-reporting (n_a x n_b / n) and
+        `n_interacting` the cases where at least one of the two is coded I.
+        """
+        co = self.drugs.T.tocsr() @ self.drugs
+        upper = _sparse().triu(co, k=1).tocoo()
+        keep = upper.data >= min_count
+        a, b, n_ab = upper.row[keep], upper.col[keep], upper.data[keep].astype(np.int64)
+
+        # Cases with a coded I and b present, plus the reverse, minus cases with both coded I
+        ia = self.interacting.T.tocsr() @ self.drugs
+        ii = self.interacting.T.tocsr() @ self.interacting
+        ia.sum_duplicates()
+        ii.sum_duplicates()
+        n_interacting = (_lookup(ia, a, b) + _lookup(ia, b, a) - _lookup(ii, a, b)).astype(np.int64)
+
+        n_a, n_b = self.drug_totals[a], self.drug_totals[b]
+        table = pd.DataFrame({
+            'drug_a': self.drug_labels[a],
+            'drug_b': self.drug_labels[b],
+            'n_cases': n_ab,
+            'n_interacting': n_interacting,
+            'n_a': n_a,
+            'n_b': n_b,
+            'ratio': n_ab * self.n / (n_a.astype(float) * n_b),
+            'jaccard': n_ab / (n_a + n_b - n_ab).astype(float),
+        })
+        return table.sort_values(['n_cases', 'ratio'], ascending=False, ignore_index=True)
+
+    def _codes(self, labels):
+        codes = self.drug_labels.get_indexer(labels)
+        if (codes < 0).any():
+            raise KeyError(f"Unknown drugs: {list(pd.Index(labels)[codes < 0][:5])}")
+        return codes
+
+    def triplets(self, pairs, min_count=1):
+        """(drug pair, PT) case counts for the given pairs (a frame with drug_a, drug_b)
+
+        `pair_rate` is the share of the pair's cases reporting the PT; `rate_a`
+        and `rate_b` are the same share among all cases with each drug, so a
+        `ratio_vs_single` above 1 marks PTs reported more often with the pair
+        than with either drug.
+        """
+        a = self._codes(pairs['drug_a'])
+        b = self._codes(pairs['drug_b'])
+        columns = self.drugs.tocsc()
+        both = columns[:, a].multiply(columns[:, b]).tocsr()
+        counts = (both.T.tocsr() @ self.events).tocoo()
+        keep = counts.data >= min_count
+        pair, pt, n = counts.row[keep], counts.col[keep], counts.data[keep].astype(np.int64)
+
+        if self._drug_events is None:
+            self._drug_events = (self.drugs.T.tocsr() @ self.events).tocsr()
+            # Canonical (sorted) rows make the element lookups below binary searches
+            self._drug_events.sum_duplicates()
+        single = self._drug_events
+        pair_n = np.asarray(both.sum(axis=0)).ravel()[pair]
+        rate_a = _lookup(single, a[pair], pt) / self.drug_totals[a[pair]]
+        rate_b = _lookup(single, b[pair], pt) / self.drug_totals[b[pair]]
+        table = pd.DataFrame({
+            'drug_a': self.drug_labels[a[pair]],
+            'drug_b': self.drug_labels[b[pair]],
+            'pt': self.event_labels[pt],
+            'n_cases': n,
+            'pair_cases': pair_n,
+            'pair_rate': n / pair_n,
+            'rate_a': rate_a,
+            'rate_b': rate_b,
+        })
+        table['ratio_vs_single'] = table['pair_rate'] / np.maximum(rate_a, rate_b)
+        return table.sort_values(['n_cases', 'ratio_vs_single'], ascending=False, ignore_index=True)
+
+def _nodes(pairs):
+    """Node table (drug, n_cases) of the drugs in a pairs table"""
+    nodes = pd.concat([
+        pairs[['drug_a', 'n_a']].set_axis(['drug', 'n_cases'], axis=1),
+        pairs[['drug_b', 'n_b']].set_axis(['drug', 'n_cases'], axis=1),
+    ])
+    return nodes.drop_duplicates('drug').sort_values('drug', ignore_index=True)
+
+def _write_graphml(pairs, path):
+    edge_keys = ['n_cases', 'n_interacting', 'ratio', 'jaccard']
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        fh.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+        fh.write('  <key id="cases" for="node" attr.name="n_cases" attr.type="long"/>\n')
+        for key in edge_keys:
+            kind = 'long' if key.startswith('n_') else 'double'
+            fh.write(f'  <key id="{key}" for="edge" attr.name="{key}" attr.type="{kind}"/>\n')
+        fh.write('  <graph edgedefault="undirected">\n')
+        for drug, n in _nodes(pairs).itertuples(index=False, name=None):
+            fh.write(f'    <node id={quoteattr(str(drug))}><data key="cases">{n}</data></node>\n')
+        for record in pairs[['drug_a', 'drug_b'] + edge_keys].itertuples(index=False, name=None):
+            data = ''.join(f'<data key="{k}">{v}</data>' for k, v in zip(edge_keys, record[2:]))
+            fh.write(f'    <edge source={quoteattr(str(record[0]))} target={quoteattr(str(record[1]))}>{data}</edge>\n')
+        fh.write('  </graph>\n</graphml>\n')
+
+def _write_json(pairs, path):
+    graph = {
+        'nodes': [{'id': d, 'n_cases': int(n)} for d, n in _nodes(pairs).itertuples(index=False, name=None)],
+        'links': [
+            {'source': a, 'target': b, 'n_cases': int(n), 'n_interacting': int(i), 'ratio': float(r)}
+            for a, b, n, i, r in pairs[['drug_a', 'drug_b', 'n_cases', 'n_interacting', 'ratio']].itertuples(index=False, name=None)
+        ],
+    }
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(graph, fh)
+
+def _write_csv(pairs, path):
+    pairs.to_csv(path, index=False)
+
+_WRITERS = {
+    'GraphML': _write_graphml,
+    'JSON': _write_json,
+    'CSV': _write_csv,
+}
+
+def export_network(pairs, path, fmt='GraphML'):
+    """Write a pairs table as a network file (GraphML, node-link JSON or CSV edge list)"""
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unsupported network format: {fmt}")
+    _WRITERS[fmt](pairs, path)
+    return len(pairs)
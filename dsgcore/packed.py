@@ -0,0 +1,107 @@
+"""Parsing of the semicolon-packed multi-value columns, per row and vectorized"""
+import pandas as pd
+
+from dsgcore.fields import format_date_std
+
+# Packed source column -> key used in the per-drug records (same keys as process_drug_data)
+DRUG_FIELDS = {
+    'drug_seq': 'sequence',
+    'role_cod': 'role_code',
+    'drugname': 'drug_name',
+    'prod_ai': 'product_ai',
+    'route': 'route',
+    'dose_amt': 'dose_amount',
+    'dose_unit': 'dose_unit',
+    'dose_form': 'dose_form',
+    'dose_freq': 'dose_frequency',
+    'indi_pt': 'indication',
+    'start_dt': 'start_date',
+    'end_dt': 'end_date',
+    'dechal': 'dechallenge',
+    'rechal': 'rechallenge',
+    'lot_num': 'lot_number',
+    'val_vbm': 'val_vbm',
+    'dose_vbm': 'dose_vbm',
+    'cum_dose_chr': 'cum_dose_chr',
+    'cum_dose_unit': 'cum_dose_unit',
+    'exp_dt': 'exp_dt',
+    'nda_num': 'nda_num',
+    'dur': 'duration',
+    'dur_cod': 'duration_code',
+}
+
+# Packed date columns, formatted YYYY-MM-DD by process_drug_data(format_dates=True)
+PACKED_DATE_COLUMNS = ['start_dt', 'end_dt', 'exp_dt']
+
+
+def parse_separated_values(value):
+    """Parse semicolon-separated values"""
+    if pd.isna(value) or value == '' or value == 'NA':
+        return []
+    return [v.strip() for v in str(value).split(';')]
+
+
+def process_drug_data(row, format_dates=False):
+    """Process and structure drug data from a row
+
+    One record per drug_seq entry; shorter lists are padded with 'NA'.
+    """
+    values = {col: parse_separated_values(row.get(col, '')) for col in DRUG_FIELDS}
+    drugs = []
+    for i in range(len(values['drug_seq'])):
+        drug = {}
+        for col, key in DRUG_FIELDS.items():
+            if i >= len(values[col]):
+                drug[key] = 'NA'
+            elif format_dates and col in PACKED_DATE_COLUMNS:
+                drug[key] = format_date_std(values[col][i])
+            else:
+                drug[key] = values[col][i]
+        drugs.append(drug)
+    return drugs
+
+
+def explode_packed(series):
+    """Split a packed column into a long Series indexed by (row, pos)
+
+    `row` is the positional row number in the source frame and `pos` the
+    position inside the semicolon list. Missing, empty and 'NA' cells give
+    no entries, matching parse_separated_values.
+    """
+    values = pd.Series(series.to_numpy(), dtype='object')
+    values = values.where(values.notna(), None).astype('string')
+    values = values[values.notna() & (values != '') & (values != 'NA')]
+    parts = values.str.split(';').explode().str.strip()
+    pos = parts.groupby(level=0).cumcount().to_numpy()
+    parts.index = pd.MultiIndex.from_arrays([parts.index.to_numpy(), pos], names=['row', 'pos'])
+    return parts
+
+
+def explode_drug_table(df, columns=None):
+    """Build the long drug table (one row per drug) for a whole frame
+
+    The drug count of a case is the length of its drug_seq list, and shorter
+    lists are padded with 'NA' exactly like process_drug_data does. Pass
+    `columns` to restrict the packed columns that are exploded.
+    """
+    fields = DRUG_FIELDS if columns is None else {c: DRUG_FIELDS[c] for c in columns}
+    if 'drug_seq' in df.columns:
+        base = explode_packed(df['drug_seq'])
+    else:
+        base = pd.Series([], dtype='string', index=pd.MultiIndex.from_arrays([[], []], names=['row', 'pos']))
+
+    out = pd.DataFrame(index=base.index)
+    for col, key in fields.items():
+        if col == 'drug_seq':
+            out[key] = base
+        elif col in df.columns:
+            out[key] = explode_packed(df[col]).reindex(base.index).fillna('NA')
+        else:
+            out[key] = 'NA'
+    out = out.reset_index()
+
+    rows = out['row'].to_numpy()
+    for id_col in ('primaryid', 'caseid'):
+        if id_col in df.columns:
+            out.insert(2, id_col, df[id_col].astype(str).to_numpy()[rows])
+    return out
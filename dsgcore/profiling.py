@@ -0,0 +1,146 @@
+"""Lightweight timing spans and memory snapshots of app reruns
+
+A RerunProfile records the spans of one script run: their name, start and
+duration relative to the run, nesting depth and the process RSS when they
+ended. The profile of the running rerun lives in a context variable, so
+core functions open spans without it being passed around. With no active
+profile span() hands back a shared no-op context manager and checkpoint()
+returns at once, so instrumented code costs one lookup when profiling is
+off. Finished profiles can be appended to a size-rotated JSON-lines log.
+"""
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+_current = contextvars.ContextVar('dsg_rerun_profile', default=None)
+_NOOP = nullcontext()
+
+def rss_bytes():
+    """Resident set size of this process, or None when it cannot be read"""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+def _mb(value):
+    return None if value is None else round(value / 2**20, 1)
+
+class RerunProfile:
+    """Spans of one rerun, as dicts with name, start, seconds, depth and rss_mb
+
+    Spans opened with span() nest; checkpoint() closes the current top-level
+    stage and opens the next, for long linear scripts.
+    """
+
+    def __init__(self, label=''):
+        self.label = label
+        self.started = datetime.datetime.now()
+        self.spans = []
+        self.seconds = None
+        self.rss_start_mb = _mb(rss_bytes())
+        self.rss_end_mb = None
+        self._t0 = time.perf_counter()
+        self._depth = 0
+        self._stage = None
+
+    def _record(self, name, start, depth):
+        end = time.perf_counter()
+        self.spans.append({
+            'name': name,
+            'start': start - self._t0,
+            'seconds': end - start,
+            'depth': depth,
+            'rss_mb': _mb(rss_bytes()),
+        })
+
+    @contextmanager
+    def span(self, name):
+        depth = self._depth + (1 if self._stage else 0)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self._record(name, start, depth)
+
+    def checkpoint(self, name):
+        """End the current stage (if any) and start the stage `name`"""
+        if self._stage:
+            self._record(*self._stage, 0)
+        self._stage = (name, time.perf_counter())
+
+    def finish(self):
+        if self._stage:
+            self._record(*self._stage, 0)
+            self._stage = None
+        self.seconds = time.perf_counter() - self._t0
+        self.rss_end_mb = _mb(rss_bytes())
+        self.spans.sort(key=lambda s: s['start'])
+        return self
+
+    def to_record(self):
+        return {
+            'label': self.label,
+            'started': self.started.isoformat(timespec='milliseconds'),
+            'seconds': self.seconds,
+            'rss_start_mb': self.rss_start_mb,
+            'rss_end_mb': self.rss_end_mb,
+            'spans': self.spans,
+        }
+
+@contextmanager
+def profiled(label=''):
+    """Make a new RerunProfile the active one for the duration of the block"""
+    profile = RerunProfile(label)
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+        profile.finish()
+
+def active_profile():
+    return _current.get()
+
+def span(name):
+    """Context manager timing a block in the active profile (no-op without one)"""
+    profile = _current.get()
+    if profile is None:
+        return _NOOP
+    return profile.span(name)
+
+def checkpoint(name):
+    """Start the next top-level stage of the active profile (no-op without one)"""
+    profile = _current.get()
+    if profile is not None:
+        profile.checkpoint(name)
+
+def profile_logger(path, max_bytes=5_000_000, backups=3):
+    """Logger writing one JSON line per message to a size-rotated file"""
+    logger = logging.getLogger(f'{__name__}.{os.path.abspath(path)}')
+    if not logger.handlers:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+def log_profile(logger, profile):
+    """Append a finished profile to a profile_logger as one JSON line"""
+    logger.info(json.dumps(profile.to_record()))
@@ -0,0 +1,136 @@
+"""Data-quality checks of a case frame, run column-wise over all rows at once
+
+- Packed drug columns must hold one entry per drug (the drug_seq length);
+  process_drug_data pads shorter lists with 'NA', so misalignment would
+  otherwise go unnoticed. An empty or 'NA' cell means "not reported".
+- Dates must be YYYY, YYYYMM or YYYYMMDD calendar dates.
+- primaryid and caseid must be numeric, primaryid must be caseid followed
+  by caseversion, and primaryid must be unique.
+
+Issues come back as a long table with one line per (row, column, check).
+"""
+import numpy as np
+import pandas as pd
+
+from dsgcore.packed import DRUG_FIELDS, PACKED_DATE_COLUMNS, explode_packed
+from dsgcore.timing import partial_dates
+
+DATE_COLUMNS = ['event_dt', 'mfr_dt', 'init_fda_dt', 'fda_dt', 'rept_dt']
+ISSUE_COLUMNS = ['row', 'column', 'check', 'detail']
+
+def list_lengths(series):
+    """Number of entries of every packed cell (0 for missing, empty or 'NA')"""
+    values = series.astype('string').str.strip()
+    empty = values.isna() | (values == '') | (values == 'NA')
+    # Separator count as a length difference: plain (non-regex) string kernels only
+    separators = values.str.len() - values.str.replace(';', '', regex=False).str.len()
+    return (separators + 1).where(~empty, 0).astype(np.int64).to_numpy()
+
+def _issues(rows, column, check, detail):
+    return pd.DataFrame({'row': rows, 'column': column, 'check': check, 'detail': detail})
+
+def _text(series):
+    """Cells as strings; integral floats (ids read next to missing values) lose their '.0'"""
+    if pd.api.types.is_float_dtype(series):
+        integral = series.where(series == series.round())
+        return integral.astype('Int64').astype('string')
+    return series.astype('string').str.strip()
+
+def check_list_lengths(df):
+    """Packed drug columns whose entry count differs from the drug_seq count"""
+    if 'drug_seq' not in df.columns:
+        return []
+    n_drugs = list_lengths(df['drug_seq'])
+    found = []
+    for col in DRUG_FIELDS:
+        if col == 'drug_seq' or col not in df.columns:
+            continue
+        lengths = list_lengths(df[col])
+        bad = np.flatnonzero((lengths > 0) & (lengths != n_drugs))
+        if len(bad):
+            detail = (pd.Series(lengths[bad]).astype(str) + ' entries for '
+                      + pd.Series(n_drugs[bad]).astype(str) + ' drugs')
+            found.append(_issues(bad, col, 'list length', detail.to_numpy()))
+    return found
+
+def _invalid_dates(values):
+    """Mask of non-empty values that are not YYYY, YYYYMM or YYYYMMDD calendar dates"""
+    text = _text(values)
+    filled = (values.notna() & (text != '') & (text != 'NA')).fillna(True).to_numpy(dtype=bool)
+    # partial_dates reads the digits of any text, so the exact form is checked first
+    exact = text.str.fullmatch(r'\d{4}(?:\d{2}){0,2}').fillna(False).to_numpy(dtype=bool)
+    return filled & ~(exact & partial_dates(text)['precision'].notna().to_numpy())
+
+def check_dates(df):
+    """Date cells (and entries of packed date lists) that are not valid dates"""
+    found = []
+    for col in DATE_COLUMNS:
+        if col not in df.columns:
+            continue
+        bad = np.flatnonzero(_invalid_dates(df[col]))
+        if len(bad):
+            found.append(_issues(bad, col, 'invalid date', ('Invalid date ' + _text(df[col].iloc[bad])).to_numpy()))
+    for col in PACKED_DATE_COLUMNS:
+        if col not in df.columns:
+            continue
+        # Date lists repeat a lot ('NA ; NA', the same start date), so only distinct cells are split
+        codes, cells = pd.factorize(df[col].to_numpy(dtype=object))
+        entries = explode_packed(pd.Series(cells, dtype=object))
+        entries = entries[_invalid_dates(entries)]
+        if len(entries):
+            position = pd.Series(entries.index.get_level_values('pos') + 1).astype(str)
+            bad = pd.DataFrame({
+                'cell': entries.index.get_level_values('row'),
+                'detail': ('Invalid date ' + entries.reset_index(drop=True) + ' (drug ' + position + ')').to_numpy(),
+            })
+            hits = pd.DataFrame({'row': np.arange(len(codes)), 'cell': codes}).merge(bad, on='cell')
+            found.append(_issues(hits['row'].to_numpy(), col, 'invalid date', hits['detail'].to_numpy()))
+    return found
+
+def check_ids(df):
+    """Missing, non-numeric, inconsistent and duplicate case identifiers"""
+    found = []
+    ids = {col: _text(df[col]) for col in ('primaryid', 'caseid', 'caseversion') if col in df.columns}
+    for col in ('primaryid', 'caseid'):
+        if col not in ids:
+            continue
+        values = ids[col]
+        missing = (values.isna() | (values == '') | (values == 'NA')).to_numpy()
+        numeric = values.str.fullmatch(r'\d+').fillna(False).to_numpy(dtype=bool)
+        if missing.any():
+            found.append(_issues(np.flatnonzero(missing), col, 'missing id', f'No {col}'))
+        bad = np.flatnonzero(~missing & ~numeric)
+        if len(bad):
+            found.append(_issues(bad, col, 'id format', (f'Non-numeric {col} ' + values.iloc[bad]).to_numpy()))
+
+    if {'primaryid', 'caseid', 'caseversion'} <= ids.keys():
+        expected = ids['caseid'] + ids['caseversion']
+        comparable = (ids['primaryid'].notna() & expected.notna()).to_numpy()
+        bad = np.flatnonzero(comparable & (ids['primaryid'] != expected).fillna(False).to_numpy(dtype=bool))
+        if len(bad):
+            detail = ('primaryid ' + ids['primaryid'].iloc[bad] + ' is not caseid ' + ids['caseid'].iloc[bad]
+                      + ' + caseversion ' + ids['caseversion'].iloc[bad])
+            found.append(_issues(bad, 'primaryid', 'id consistency', detail.to_numpy()))
+
+    if 'primaryid' in ids:
+        values = ids['primaryid']
+        dup = np.flatnonzero((values.duplicated(keep=False) & values.notna()).to_numpy())
+        if len(dup):
+            found.append(_issues(dup, 'primaryid', 'duplicate id', ('primaryid ' + values.iloc[dup] + ' appears more than once').to_numpy()))
+    return found
+
+def validate_frame(df):
+    """All data-quality issues of a frame, sorted by positional row"""
+    found = check_list_lengths(df) + check_dates(df) + check_ids(df)
+    if not found:
+        return pd.DataFrame({col: pd.Series(dtype=np.int64 if col == 'row' else object) for col in ISSUE_COLUMNS})
+    issues = pd.concat(found, ignore_index=True)
+    issues['row'] = issues['row'].astype(np.int64)
+    return issues.sort_values('row', kind='stable', ignore_index=True)
+
+def issue_summary(issues):
+    """Number of issues and affected rows per (check, column)"""
+    return (issues.groupby(['check', 'column'])
+            .agg(issues=('row', 'size'), rows=('row', 'nunique'))
+            .reset_index()
+            .sort_values('issues', ascending=False, ignore_index=True))
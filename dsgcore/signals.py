@@ -0,0 +1,417 @@
+"""Disproportionality signal detection (PRR, ROR, IC, EBGM) on drug-event counts
+
+Counts come from the case x drug and case x PT incidence matrices: their
+sparse product gives the number of cases reporting every drug-PT pair,
+and all statistics are then computed column-wise with numpy over the
+pairs. scipy is needed and imported on first use.
+
+Count tables are additive, so `IncrementalSignals` folds in new case
+batches (and removes superseded versions) and rescores only the pairs
+the batch touched. CaseDataset.extend() updates the signal tables of a
+loaded dataset this way when files are added to it.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.dedup import latest_version_mask
+from dsgcore.packed import explode_drug_table, explode_packed
+
+Z95 = 1.959964
+
+# DuMouchel (1999) starting values for the two-gamma mixture prior of the MGPS model
+DEFAULT_PRIOR = {'alpha1': 0.2, 'beta1': 0.1, 'alpha2': 2.0, 'beta2': 4.0, 'p': 1 / 3}
+
+SIGNAL_COLUMNS = [
+    'drug', 'pt', 'a', 'expected', 'n_drug', 'n_event',
+    'prr', 'prr_lower', 'prr_upper', 'chi2',
+    'ror', 'ror_lower', 'ror_upper',
+    'ic', 'ic025', 'ic975',
+    'ebgm', 'eb05',
+]
+
+def _sparse():
+    try:
+        import scipy.sparse as sparse
+    except ImportError as e:
+        raise ImportError("Signal detection needs scipy (pip install scipy)") from e
+    return sparse
+
+class ContingencyCounts:
+    """Drug-by-PT case counts plus the marginals needed for 2x2 tables
+
+    `pairs` has columns drug, pt, a (cases reporting both); `drug_totals`
+    and `event_totals` are cases per drug and per PT; `n` is the number of
+    cases in the table (cases with at least one drug and one PT).
+
+    Counts are additive over disjoint sets of cases, so tables merge with
+    `+` (a new batch of cases) and `-` (cases withdrawn, e.g. superseded
+    versions); cells and marginals that drop to zero are removed.
+    """
+
+    def __init__(self, pairs, drug_totals, event_totals, n):
+        self.pairs = pairs
+        self.drug_totals = drug_totals
+        self.event_totals = event_totals
+        self.n = n
+
+    def __len__(self):
+        return len(self.pairs)
+
+    @classmethod
+    def empty(cls):
+        """Table of zero cases"""
+        pairs = pd.DataFrame({
+            'drug': pd.Series(dtype=object),
+            'pt': pd.Series(dtype=object),
+            'a': pd.Series(dtype=np.int64),
+        })
+        return cls(pairs, pd.Series(dtype=np.int64), pd.Series(dtype=np.int64), 0)
+
+    def merge(self, other, sign=1):
+        """New table with the counts of `other` added (sign=1) or removed (sign=-1)"""
+        left = self.pairs.set_index(['drug', 'pt'])['a']
+        right = other.pairs.set_index(['drug', 'pt'])['a']
+        a = left.add(sign * right, fill_value=0).astype(np.int64)
+        if (a < 0).any():
+            raise ValueError("Removing counts that were never added")
+        a = a[a > 0]
+        drug_totals = self.drug_totals.add(sign * other.drug_totals, fill_value=0).astype(np.int64)
+        event_totals = self.event_totals.add(sign * other.event_totals, fill_value=0).astype(np.int64)
+        return ContingencyCounts(
+            a.rename_axis(['drug', 'pt']).reset_index(name='a'),
+            drug_totals[drug_totals > 0],
+            event_totals[event_totals > 0],
+            self.n + sign * other.n,
+        )
+
+    def __add__(self, other):
+        return self.merge(other, 1)
+
+    def __sub__(self, other):
+        return self.merge(other, -1)
+
+def incidence_matrix(rows, items):
+    """Binary sparse case x item matrix plus the item labels (duplicates collapse to 1)"""
+    sparse = _sparse()
+    codes, labels = pd.factorize(items, sort=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(codes), dtype=np.int32), (rows, codes)),
+        shape=(int(rows.max()) + 1 if len(rows) else 0, len(labels)),
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix, labels
+
+def case_drug_pairs(drug_table, drug_field='drug_name', suspect_only=False, rows=None):
+    """(row, drug) pairs from the exploded drug table, normalized to upper case"""
+    drugs = drug_table
+    if suspect_only:
+        drugs = drugs[drugs['role_code'].isin(['PS', 'SS', 'I'])]
+    if rows is not None:
+        drugs = drugs[np.isin(drugs['row'].to_numpy(), rows)]
+    names = drugs[drug_field].astype('string').str.strip().str.upper()
+    keep = names.notna() & (names != 'NA') & (names != '')
+    return drugs['row'].to_numpy()[keep.to_numpy()], names[keep].to_numpy(dtype=object)
+
+def case_event_pairs(reaction_table, rows=None):
+    """(row, pt) pairs from the exploded reaction table"""
+    case_rows = reaction_table.index.get_level_values('row').to_numpy()
+    pts = reaction_table.astype('string').str.strip()
+    keep = (pts.notna() & (pts != 'NA') & (pts != '')).to_numpy()
+    if rows is not None:
+        keep &= np.isin(case_rows, rows)
+    return case_rows[keep], pts.to_numpy(dtype=object)[keep]
+
+def contingency_counts(drug_rows, drugs, event_rows, events):
+    """Sparse drug-by-PT case counts from (row, drug) and (row, pt) pairs"""
+    drug_rows = np.asarray(drug_rows)
+    event_rows = np.asarray(event_rows)
+    if len(drug_rows) == 0 or len(event_rows) == 0:
+        return ContingencyCounts.empty()
+    n_rows = int(max(drug_rows.max(initial=-1), event_rows.max(initial=-1))) + 1
+    # Only cases with both a drug and a PT can enter a 2x2 table
+    in_both = np.zeros(n_rows, dtype=bool)
+    in_both[np.intersect1d(drug_rows, event_rows)] = True
+    drug_keep = in_both[drug_rows]
+    event_keep = in_both[event_rows]
+
+    drug_matrix, drug_labels = incidence_matrix(drug_rows[drug_keep], np.asarray(drugs)[drug_keep])
+    event_matrix, event_labels = incidence_matrix(event_rows[event_keep], np.asarray(events)[event_keep])
+    height = max(drug_matrix.shape[0], event_matrix.shape[0])
+    drug_matrix.resize((height, drug_matrix.shape[1]))
+    event_matrix.resize((height, event_matrix.shape[1]))
+
+    counts = (drug_matrix.T.tocsr() @ event_matrix).tocoo()
+    pairs = pd.DataFrame({
+        'drug': drug_labels[counts.row],
+        'pt': event_labels[counts.col],
+        'a': counts.data.astype(np.int64),
+    })
+    drug_totals = pd.Series(np.asarray(drug_matrix.sum(axis=0)).ravel(), index=drug_labels, dtype=np.int64)
+    event_totals = pd.Series(np.asarray(event_matrix.sum(axis=0)).ravel(), index=event_labels, dtype=np.int64)
+    return ContingencyCounts(pairs, drug_totals, event_totals, int(in_both.sum()))
+
+def dataset_counts(dataset, drug_field='drug_name', suspect_only=False, latest_only=True):
+    """ContingencyCounts of a CaseDataset (latest case versions only by default)"""
+    rows = None
+    if latest_only and 'is_latest_version' in dataset.df.columns:
+        rows = np.flatnonzero(dataset.df['is_latest_version'].to_numpy(dtype=bool))
+    drug_rows, drugs = case_drug_pairs(dataset.drug_table, drug_field, suspect_only, rows)
+    event_rows, events = case_event_pairs(dataset.reaction_table, rows)
+    return contingency_counts(drug_rows, drugs, event_rows, events)
+
+def frame_counts(df, drug_field='drug_name', suspect_only=False):
+    """ContingencyCounts of every row of a case frame (e.g. a new batch of cases)"""
+    drug_rows, drugs = case_drug_pairs(explode_drug_table(df), drug_field, suspect_only)
+    reactions = explode_packed(df['pt'] if 'pt' in df.columns else pd.Series(pd.NA, index=df.index))
+    event_rows, events = case_event_pairs(reactions)
+    return contingency_counts(drug_rows, drugs, event_rows, events)
+
+def _nb_log_pmf(n, alpha, beta, expected):
+    """log P(n) under the negative binomial of a gamma(alpha, beta) rate times `expected`"""
+    from scipy.special import gammaln, xlog1py
+
+    prob = beta / (beta + expected)
+    return (gammaln(alpha + n) - gammaln(alpha) - gammaln(n + 1)
+            + alpha * np.log(prob) + xlog1py(n, -prob))
+
+def fit_mgps_prior(a, expected, start=None):
+    """Maximum-likelihood two-gamma mixture prior for EBGM (zero-truncated counts)
+
+    Pairs are first collapsed to distinct (a, expected) cells, with expected
+    rounded to 1% on the log scale, so each likelihood evaluation runs over
+    a few thousand weighted cells instead of every pair.
+    """
+    from scipy.optimize import minimize
+
+    cells = pd.DataFrame({'a': a, 'log_e': np.round(np.log(expected), 2)})
+    cells = cells.groupby(['a', 'log_e']).size().reset_index(name='weight')
+    cell_a = cells['a'].to_numpy(dtype=float)
+    cell_e = np.exp(cells['log_e'].to_numpy())
+    weight = cells['weight'].to_numpy(dtype=float)
+
+    start = start or DEFAULT_PRIOR
+    x0 = np.log([start['alpha1'], start['beta1'], start['alpha2'], start['beta2']]
+                + [start['p'] / (1 - start['p'])])
+
+    def negloglik(x):
+        alpha1, beta1, alpha2, beta2 = np.exp(np.clip(x[:4], -10, 10))
+        p = 1 / (1 + np.exp(-x[4]))
+        l1 = _nb_log_pmf(cell_a, alpha1, beta1, cell_e) - np.log1p(-np.exp(_nb_log_pmf(0, alpha1, beta1, cell_e)))
+        l2 = _nb_log_pmf(cell_a, alpha2, beta2, cell_e) - np.log1p(-np.exp(_nb_log_pmf(0, alpha2, beta2, cell_e)))
+        loglik = np.logaddexp(np.log(p) + l1, np.log1p(-p) + l2)
+        return -(weight * loglik).sum() if np.isfinite(loglik).all() else np.inf
+
+    result = minimize(negloglik, x0, method='Nelder-Mead', options={'maxiter': 2000, 'xatol': 1e-4, 'fatol': 1e-3})
+    alpha1, beta1, alpha2, beta2 = np.exp(np.clip(result.x[:4], -10, 10))
+    return {'alpha1': alpha1, 'beta1': beta1, 'alpha2': alpha2, 'beta2': beta2, 'p': 1 / (1 + np.exp(-result.x[4]))}
+
+def ebgm(a, expected, prior):
+    """EBGM and EB05 (5th percentile of the posterior) for every pair"""
+    from scipy.special import digamma, gammainc, gammaincinv
+
+    l1 = np.log(prior['p']) + _nb_log_pmf(a, prior['alpha1'], prior['beta1'], expected)
+    l2 = np.log1p(-prior['p']) + _nb_log_pmf(a, prior['alpha2'], prior['beta2'], expected)
+    q = np.exp(l1 - np.logaddexp(l1, l2))
+    shape1, rate1 = prior['alpha1'] + a, prior['beta1'] + expected
+    shape2, rate2 = prior['alpha2'] + a, prior['beta2'] + expected
+    eb_log = q * (digamma(shape1) - np.log(rate1)) + (1 - q) * (digamma(shape2) - np.log(rate2))
+
+    # EB05: the mixture quantile lies between the two component quantiles, so
+    # bisect (vectorized, log scale) only where those differ
+    quant1 = gammaincinv(shape1, 0.05) / rate1
+    quant2 = gammaincinv(shape2, 0.05) / rate2
+    lo = np.log(np.minimum(quant1, quant2))
+    hi = np.log(np.maximum(quant1, quant2))
+    # Where one component carries (almost) all posterior weight its quantile is the answer
+    lo = np.where(q > 1 - 1e-6, np.log(quant1), np.where(q < 1e-6, np.log(quant2), lo))
+    hi = np.where(q > 1 - 1e-6, np.log(quant1), np.where(q < 1e-6, np.log(quant2), hi))
+    active = np.flatnonzero(hi - lo > 1e-3)
+    for _ in range(30):
+        if len(active) == 0:
+            break
+        mid = (lo[active] + hi[active]) / 2
+        lam = np.exp(mid)
+        cdf = (q[active] * gammainc(shape1[active], rate1[active] * lam)
+               + (1 - q[active]) * gammainc(shape2[active], rate2[active] * lam))
+        below = cdf < 0.05
+        lo[active] = np.where(below, mid, lo[active])
+        hi[active] = np.where(below, hi[active], mid)
+        active = active[hi[active] - lo[active] > 1e-3]
+    return np.exp(eb_log), np.exp((lo + hi) / 2)
+
+def signal_scores(counts, prior=None, min_count=1, pairs=None):
+    """PRR, ROR (with 95% CIs), IC (with 95% credibility bounds) and EBGM per pair
+
+    `prior` is the MGPS mixture prior; when None it is fitted to the data.
+    Pairs with fewer than `min_count` cases are dropped before scoring.
+    `pairs` restricts scoring to a subset of `counts.pairs`.
+    """
+    pairs = counts.pairs if pairs is None else pairs
+    pairs = pairs[pairs['a'] >= min_count]
+    a = pairs['a'].to_numpy(dtype=float)
+    n_drug = counts.drug_totals.reindex(pairs['drug']).to_numpy(dtype=float)
+    n_event = counts.event_totals.reindex(pairs['pt']).to_numpy(dtype=float)
+    n = float(counts.n)
+    b = n_drug - a
+    c = n_event - a
+    d = n - a - b - c
+    expected = n_drug * n_event / n
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Infinite / undefined values stay as inf / NaN in the table
+        prr = (a / (a + b)) / (c / (c + d))
+        prr_se = np.sqrt(1 / a - 1 / (a + b) + 1 / c - 1 / (c + d))
+        chi2 = n * (np.abs(a * d - b * c) - n / 2) ** 2 / ((a + b) * (c + d) * (a + c) * (b + d))
+
+        # Haldane correction for tables with an empty cell
+        zero = (b == 0) | (c == 0) | (d == 0)
+        ha, hb, hc, hd = (np.where(zero, x + 0.5, x) for x in (a, b, c, d))
+        ror = (ha * hd) / (hb * hc)
+        ror_se = np.sqrt(1 / ha + 1 / hb + 1 / hc + 1 / hd)
+
+        prr_lower = np.exp(np.log(prr) - Z95 * prr_se)
+        prr_upper = np.exp(np.log(prr) + Z95 * prr_se)
+        ror_lower = np.exp(np.log(ror) - Z95 * ror_se)
+        ror_upper = np.exp(np.log(ror) + Z95 * ror_se)
+
+    # Shrunk IC with the Norén et al. (2013) closed-form credibility bounds
+    ic = np.log2((a + 0.5) / (expected + 0.5))
+    ic025 = ic - 3.3 * (a + 0.5) ** -0.5 - 2 * (a + 0.5) ** -1.5
+    ic975 = ic + 2.4 * (a + 0.5) ** -0.5 - 0.5 * (a + 0.5) ** -1.5
+
+    if prior is None:
+        prior = fit_mgps_prior(a, expected) if len(a) >= 50 else DEFAULT_PRIOR
+    eb, eb05 = ebgm(a, expected, prior) if len(a) else (np.array([]), np.array([]))
+
+    result = pd.DataFrame({
+        'drug': pairs['drug'].to_numpy(),
+        'pt': pairs['pt'].to_numpy(),
+        'a': pairs['a'].to_numpy(),
+        'expected': expected,
+        'n_drug': n_drug.astype(np.int64),
+        'n_event': n_event.astype(np.int64),
+        'prr': prr,
+        'prr_lower': prr_lower,
+        'prr_upper': prr_upper,
+        'chi2': chi2,
+        'ror': ror,
+        'ror_lower': ror_lower,
+        'ror_upper': ror_upper,
+        'ic': ic,
+        'ic025': ic025,
+        'ic975': ic975,
+        'ebgm': eb,
+        'eb05': eb05,
+    })
+    result.attrs['prior'] = prior
+    return result
+
+def flag_signals(scores):
+    """Boolean signal flags by the usual thresholds of each method"""
+    return pd.DataFrame({
+        # Evans et al. (2001)
+        'prr_signal': (scores['prr'] >= 2) & (scores['chi2'] >= 4) & (scores['a'] >= 3),
+        'ror_signal': (scores['ror_lower'] > 1) & (scores['a'] >= 3),
+        'ic_signal': scores['ic025'] > 0,
+        'ebgm_signal': scores['eb05'] >= 2,
+    }, index=scores.index)
+
+def batch_delta(current_df, batch_df, drug_field='drug_name', suspect_only=False):
+    """(added, removed) counts for merging a batch of cases into the current case set
+
+    Only latest versions count. A batch row enters the table if it is the
+    latest version of its caseid across both frames; the current version it
+    supersedes leaves the table.
+    """
+    current = current_df[latest_version_mask(current_df)]
+    batch = batch_df[latest_version_mask(batch_df)]
+    batch_ids = set(batch['caseid'].astype(str))
+    current = current[current['caseid'].astype(str).isin(batch_ids)]
+    both = pd.concat([current, batch], ignore_index=True)
+    winners = latest_version_mask(both).to_numpy()
+    from_batch = np.arange(len(both)) >= len(current)
+    added = both[winners & from_batch]
+    removed = both[~winners & ~from_batch]
+    return frame_counts(added, drug_field, suspect_only), frame_counts(removed, drug_field, suspect_only)
+
+def _drifted(current, reference, tolerance):
+    """Labels whose total moved by more than `tolerance` (relative) from the reference"""
+    labels = current.index.union(reference.index)
+    now = current.reindex(labels, fill_value=0).to_numpy()
+    then = reference.reindex(labels, fill_value=0).to_numpy()
+    return labels[np.abs(now - then) > tolerance * np.maximum(then, 1)]
+
+def _rebase(reference, current, labels):
+    """Reference totals with `labels` moved to their current value"""
+    reference = reference.drop(labels, errors='ignore')
+    return pd.concat([reference, current.reindex(labels).dropna().astype(np.int64)])
+
+class IncrementalSignals:
+    """Signal table kept up to date as batches of cases arrive or are withdrawn
+
+    Applying a delta merges its count tables into the running counts and
+    rescores only what it moved: pairs whose own count changed, and all
+    pairs of a drug or PT whose total has drifted by more than
+    `rescore_tolerance` since that drug or PT was last scored. Every other
+    statistic is therefore within about that tolerance of an exact rebuild.
+    Once the case total n drifts as far, everything is rescored and the
+    EBGM prior refitted. `last_update` holds the statistics of the latest
+    apply().
+    """
+
+    def __init__(self, counts, prior=None, rescore_tolerance=0.01):
+        self.counts = counts
+        self.rescore_tolerance = rescore_tolerance
+        self.last_update = None
+        self._rescore_all(prior)
+
+    def _rescore_all(self, prior=None):
+        self.scores = signal_scores(self.counts, prior=prior)
+        self.prior = self.scores.attrs['prior']
+        self._scored_n = self.counts.n
+        self._scored_drugs = self.counts.drug_totals.copy()
+        self._scored_events = self.counts.event_totals.copy()
+
+    def apply(self, added=None, removed=None):
+        """Merge count deltas and rescore what they moved; returns update statistics"""
+        start = time.perf_counter()
+        deltas = [d for d in (added, removed) if d is not None]
+        if not deltas:
+            return {'pairs': len(self.counts), 'rescored': 0, 'full_rescore': False, 'seconds': 0.0}
+        counts = self.counts
+        if added is not None:
+            counts = counts + added
+        if removed is not None:
+            counts = counts - removed
+        self.counts = counts
+
+        full = abs(counts.n - self._scored_n) > self.rescore_tolerance * max(self._scored_n, 1)
+        if full:
+            self._rescore_all()
+            rescored = len(self.scores)
+        else:
+            drugs = _drifted(counts.drug_totals, self._scored_drugs, self.rescore_tolerance)
+            events = _drifted(counts.event_totals, self._scored_events, self.rescore_tolerance)
+            changed = pd.MultiIndex.from_frame(pd.concat([d.pairs[['drug', 'pt']] for d in deltas]))
+
+            def moved(table):
+                keys = pd.MultiIndex.from_frame(table[['drug', 'pt']])
+                return (table['drug'].isin(drugs) | table['pt'].isin(events) | keys.isin(changed)).to_numpy()
+
+            fresh = signal_scores(counts, prior=self.prior, pairs=counts.pairs[moved(counts.pairs)])
+            self.scores = pd.concat([self.scores[~moved(self.scores)], fresh], ignore_index=True)
+            self.scores.attrs['prior'] = self.prior
+            self._scored_drugs = _rebase(self._scored_drugs, counts.drug_totals, drugs)
+            self._scored_events = _rebase(self._scored_events, counts.event_totals, events)
+            rescored = len(fresh)
+
+        self.last_update = {
+            'pairs': len(counts),
+            'rescored': rescored,
+            'full_rescore': full,
+            'seconds': time.perf_counter() - start,
+        }
+        return self.last_update
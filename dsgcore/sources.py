@@ -0,0 +1,485 @@
+"""Data sources the case frame can be read from, behind one chunked reader
+
+Every backend (CSV/TSV bytes or files, plain or gzip/zip/zstd compressed,
+Google Sheets, SQLite, Parquet and Feather/Arrow files, or a server
+directory of such files) is a DataSource with the same two readers:
+iter_chunks() yields frames of at most chunk_rows rows, and read() returns
+the whole deduplicated case frame. Both read only the requested columns
+the source has: compressed text is decompressed as a stream into the CSV
+parser and columnar files read just the projected columns. Both give
+columns the dtypes read_csv would (numbers where every value is numeric,
+text otherwise, blanks and NA markers as missing), so the frame indexes
+and caches the same way wherever it came from. cache_key() identifies the
+data for the apps' caches. gspread, google-auth and pyarrow are imported
+only when their source is read.
+
+Sources that can store edits (CSV/TSV files, SQLite tables, Google Sheets
+and directories of those) implement write_fields(), which sets columns of
+the rows matched on a key column in one pass over the source.
+"""
+import glob
+import hashlib
+import os
+import zipfile
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.dedup import deduplicate
+from dsgcore.profiling import span
+from dsgcore.writeback import sheet_key
+
+CHUNK_ROWS = 100_000
+
+CSV_EXTENSIONS = ('.csv', '.tsv', '.txt')
+ARROW_EXTENSIONS = ('.parquet', '.feather', '.arrow')
+SQLITE_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+SOURCE_EXTENSIONS = CSV_EXTENSIONS + ARROW_EXTENSIONS + SQLITE_EXTENSIONS
+
+# Cell texts read_csv reads as missing (its default na_values)
+NA_TEXT = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+           '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+# Compressed CSV/TSV: suffix -> pandas compression (zip archives are opened here)
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd', '.zip': 'zip'}
+FILE_EXTENSIONS = SOURCE_EXTENSIONS + tuple(COMPRESSIONS)
+
+def type_columns(df, na_text=False):
+    """Give object columns the dtypes read_csv would: numeric when every value is, else text
+
+    With `na_text` (sources whose text did not go through read_csv), text
+    columns are checked too and read_csv's missing-value markers ('', 'NA',
+    'NULL', ...) count as missing. Missing cells stay missing in text
+    columns rather than becoming the string 'nan'.
+    """
+    for col in df.columns:
+        values = df[col]
+        if values.dtype != object and not (na_text and pd.api.types.is_string_dtype(values.dtype)):
+            continue
+        values = values.mask(values.isin(NA_TEXT))
+        numeric = pd.to_numeric(values, errors='coerce')
+        if numeric.notna().sum() == values.notna().sum():
+            df[col] = numeric
+        else:
+            df[col] = values.where(values.isna(), values.astype('str'))
+    return df
+
+def _split_compression(name):
+    """(name without its compression suffix, pandas compression or None)"""
+    lower = name.lower()
+    for suffix, compression in COMPRESSIONS.items():
+        if lower.endswith(suffix):
+            return name[:-len(suffix)], compression
+    return name, None
+
+def _present(columns, available):
+    """The requested columns the source has, in the order it stores them (None: all)"""
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return [c for c in available if c in wanted]
+
+def _apply_updates(table, updates, key_column):
+    """Set the columns of `updates` on the rows of a text table whose key matches; returns rows written"""
+    keys = pd.Index([sheet_key(k) for k in updates[key_column]])
+    found = keys.get_indexer([sheet_key(k) for k in table[key_column]])
+    rows = np.flatnonzero(found >= 0)
+    for col in updates.columns.drop(key_column):
+        if col not in table.columns:
+            table[col] = ''
+        values = updates[col].astype('object').where(updates[col].notna(), '').astype(str).to_numpy()
+        column = table[col].to_numpy(dtype=object).copy()
+        column[rows] = values[found[rows]]
+        table[col] = column
+    return len(rows)
+
+def _file_key(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+class DataSource:
+    """Where case rows come from; subclasses implement _chunks and cache_key
+
+    read_raw() concatenates the chunks, and is overridden by backends with
+    a faster whole-file reader.
+    """
+    kind = 'source'
+    na_text = False
+
+    @property
+    def label(self):
+        return self.kind
+
+    def cache_key(self):
+        raise NotImplementedError
+
+    def _chunks(self, chunk_rows, columns):
+        raise NotImplementedError
+
+    def iter_chunks(self, chunk_rows=CHUNK_ROWS, columns=None):
+        """Typed frames of at most chunk_rows rows (only those of `columns` the source has)"""
+        for chunk in self._chunks(chunk_rows, columns):
+            yield type_columns(chunk, self.na_text)
+
+    def read_raw(self, columns=None):
+        """All rows as one typed frame, without the ingest stage"""
+        chunks = list(self.iter_chunks(columns=columns))
+        if not chunks:
+            return pd.DataFrame(columns=columns)
+        return type_columns(pd.concat(chunks, ignore_index=True), self.na_text)
+
+    def read(self, columns=None):
+        """Case frame of the source with versions and probable duplicates resolved"""
+        with span(f'read_{self.kind}'):
+            df = self.read_raw(columns)
+        with span('deduplicate'):
+            df, _ = deduplicate(df)
+        return df
+
+    def writable(self):
+        """Whether write_fields() can store edits in this source"""
+        return False
+
+    def write_fields(self, updates, key_column='primaryid'):
+        """Set the other columns of `updates` on the rows whose key_column matches; returns rows written"""
+        raise NotImplementedError(f'{self.label} is read-only')
+
+class CsvSource(DataSource):
+    """CSV/TSV bytes (an upload) or file path; tab-separated for .tsv and .txt
+
+    .gz and .zst files are decompressed as a stream by the parser; for .zip
+    archives the first CSV/TSV member is streamed (its name sets the
+    separator). zstd needs the zstandard package. Compression only makes
+    the upload smaller: the parser still reads all the text, plus the
+    decompression. Only the projected columns (`columns`, unless a read
+    names others) are parsed into the frame.
+    """
+    kind = 'csv'
+
+    def __init__(self, data, name=None, columns=None):
+        self.data = data
+        self.name = name or os.path.basename(data)
+        self.columns = columns
+        inner, self.compression = _split_compression(self.name)
+        self.sep = '\t' if inner.lower().endswith(('.tsv', '.txt')) else ','
+
+    @property
+    def label(self):
+        return self.name
+
+    def cache_key(self):
+        if isinstance(self.data, bytes):
+            return (self.kind, self.name, hashlib.md5(self.data).hexdigest())
+        return (self.kind,) + _file_key(self.data)
+
+    def _handle(self):
+        return BytesIO(self.data) if isinstance(self.data, bytes) else self.data
+
+    def _reader_args(self, columns):
+        """Stream and read_csv arguments, unpacking zip archives to their first CSV/TSV member"""
+        handle, sep, compression = self._handle(), self.sep, self.compression
+        if compression == 'zip':
+            archive = zipfile.ZipFile(handle)
+            members = [m for m in archive.namelist() if m.lower().endswith(CSV_EXTENSIONS)]
+            if not members:
+                raise ValueError(f'{self.name} has no CSV/TSV file')
+            handle = archive.open(members[0])
+            sep = '\t' if members[0].lower().endswith(('.tsv', '.txt')) else ','
+            compression = None
+        columns = self.columns if columns is None else columns
+        wanted = None if columns is None else set(columns)
+        usecols = None if wanted is None else (lambda col: col in wanted)
+        return handle, dict(sep=sep, compression=compression, usecols=usecols)
+
+    def _chunks(self, chunk_rows, columns):
+        handle, kwargs = self._reader_args(columns)
+        with pd.read_csv(handle, chunksize=chunk_rows, **kwargs) as reader:
+            yield from reader
+
+    def read_raw(self, columns=None):
+        handle, kwargs = self._reader_args(columns)
+        df = pd.read_csv(handle, **kwargs)
+        # read_csv already typed columns holding only text; only mixed ones (typed apart per block) are retyped
+        mixed = [col for col in df.columns
+                 if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) != 'string']
+        if mixed:
+            df[mixed] = type_columns(df[mixed].copy())
+        return df
+
+    def writable(self):
+        return not isinstance(self.data, bytes) and self.compression != 'zip'
+
+    def write_fields(self, updates, key_column='primaryid'):
+        """Rewrite the file with the updated cells (read and written as text, so other cells keep their form)"""
+        if not self.writable():
+            return super().write_fields(updates, key_column)
+        with span('write_csv'):
+            table = pd.read_csv(self.data, sep=self.sep, compression=self.compression, dtype=str, keep_default_na=False)
+            written = _apply_updates(table, updates, key_column)
+            temp = f'{self.data}.tmp'
+            table.to_csv(temp, sep=self.sep, compression=self.compression, index=False)
+            os.replace(temp, self.data)
+        return written
+
+class ArrowFileSource(DataSource):
+    """Parquet or Feather/Arrow IPC bytes (an upload) or file path
+
+    Only the projected columns (`columns`, unless a read names others) are
+    read: Parquet by row group, Feather from a memory map (or the uploaded
+    buffer) without copying the other columns.
+    """
+    kind = 'arrow'
+    na_text = True
+
+    def __init__(self, data, name=None, columns=None):
+        self.data = data
+        self.name = name or os.path.basename(data)
+        self.parquet = self.name.lower().endswith('.parquet')
+        self.columns = columns
+
+    @property
+    def label(self):
+        return self.name
+
+    def cache_key(self):
+        if isinstance(self.data, bytes):
+            return (self.kind, self.name, hashlib.md5(self.data).hexdigest())
+        return (self.kind,) + _file_key(self.data)
+
+    def _table(self, columns):
+        """pyarrow Table of the projected columns (self.columns when none are given)"""
+        import pyarrow as pa
+        columns = self.columns if columns is None else columns
+        if self.parquet:
+            import pyarrow.parquet as pq
+            parquet = pq.ParquetFile(BytesIO(self.data) if isinstance(self.data, bytes) else self.data)
+            return parquet.read(columns=_present(columns, parquet.schema_arrow.names), use_pandas_metadata=True)
+        stream = pa.BufferReader(self.data) if isinstance(self.data, bytes) else pa.memory_map(self.data)
+        table = pa.ipc.open_file(stream).read_all()
+        return table if columns is None else table.select(_present(columns, table.schema.names))
+
+    def _chunks(self, chunk_rows, columns):
+        for batch in self._table(columns).to_batches(max_chunksize=chunk_rows):
+            yield batch.to_pandas()
+
+    def read_raw(self, columns=None):
+        return type_columns(self._table(columns).to_pandas(), self.na_text)
+
+class SQLiteSource(DataSource):
+    """Table of a local SQLite file (the first table when none is named)"""
+    kind = 'sqlite'
+    na_text = True
+
+    def __init__(self, path, table=None):
+        self.path = path
+        self.table = table
+
+    @property
+    def label(self):
+        name = os.path.basename(self.path)
+        return f'{name}:{self.table}' if self.table else name
+
+    def cache_key(self):
+        return (self.kind, self.table) + _file_key(self.path)
+
+    def _connect(self, mode='ro'):
+        import sqlite3
+        return sqlite3.connect(f'file:{os.path.abspath(self.path)}?mode={mode}', uri=True)
+
+    def _table_name(self, conn, types=('table', 'view')):
+        """The named table, or the first table or view of the file
+
+        Not stored on the source, so its label (and the rows a merge tags
+        with it) stays the same before and after a read, in any process.
+        """
+        listing = conn.execute(
+            "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view') ORDER BY rowid").fetchall()
+        table = self.table or (listing[0][0] if listing else None)
+        tables = [name for name, kind in listing if kind in types]
+        if table not in tables:
+            raise ValueError(f"{self.path} has no table {table!r} (tables: {', '.join(tables) or 'none'})")
+        return table
+
+    def _chunks(self, chunk_rows, columns):
+        from contextlib import closing
+        with closing(self._connect()) as conn:
+            table = self._table_name(conn)
+            if columns is not None:
+                available = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+                columns = _present(columns, available)
+            selected = ', '.join('"' + c.replace('"', '""') + '"' for c in columns) if columns is not None else '*'
+            query = f'SELECT {selected} FROM "{table}"'
+            yield from pd.read_sql_query(query, conn, chunksize=chunk_rows)
+
+    def writable(self):
+        return True
+
+    def write_fields(self, updates, key_column='primaryid'):
+        """Update the table from a temporary table of the edits in one UPDATE ... FROM (adding missing columns)"""
+        from contextlib import closing
+        quote = lambda name: '"' + str(name).replace('"', '""') + '"'
+        columns = [c for c in updates.columns if c != key_column]
+        keys = [sheet_key(k) for k in updates[key_column]]
+        values = [updates[c].astype('object').where(updates[c].notna(), None).tolist() for c in columns]
+        with span('write_sqlite'), closing(self._connect('rw')) as conn, conn:
+            table = self._table_name(conn, types=('table',))
+            available = [row[1] for row in conn.execute(f'PRAGMA table_info({quote(table)})')]
+            for col in columns:
+                if col not in available:
+                    conn.execute(f'ALTER TABLE {quote(table)} ADD COLUMN {quote(col)} TEXT')
+            conn.execute(f"CREATE TEMP TABLE dsg_updates (dsg_key TEXT PRIMARY KEY, "
+                         f"{', '.join(quote(c) for c in columns)})")
+            conn.executemany(f"INSERT OR REPLACE INTO dsg_updates VALUES ({', '.join('?' * (len(columns) + 1))})",
+                             zip(keys, *values))
+            cursor = conn.execute(
+                f"UPDATE {quote(table)} SET {', '.join(f'{quote(c)} = u.{quote(c)}' for c in columns)} "
+                f"FROM dsg_updates AS u WHERE TRIM(CAST({quote(table)}.{quote(key_column)} AS TEXT)) = u.dsg_key")
+            conn.execute('DROP TABLE dsg_updates')
+            return cursor.rowcount
+
+class GoogleSheetSource(DataSource):
+    """First worksheet of a Google Sheet, opened with a service-account key (dict)
+
+    `writer` is the SheetWriteBack the app already keeps for the sheet;
+    write_fields() writes through it so queued edits and bulk writes go
+    through one writer. Without one, a writer is opened for the write.
+    """
+    kind = 'sheet'
+    na_text = True
+
+    def __init__(self, sheet_url, service_account_info, writer=None):
+        self.sheet_url = sheet_url
+        self.service_account_info = service_account_info
+        self.writer = writer
+
+    @property
+    def label(self):
+        return self.sheet_url
+
+    def cache_key(self):
+        return (self.kind, self.sheet_url)
+
+    def _chunks(self, chunk_rows, columns):
+        from dsgcore.loaders import open_sheet
+        records = open_sheet(self.sheet_url, self.service_account_info).get_worksheet(0).get_all_records()
+        df = pd.DataFrame(records)
+        if columns is not None:
+            df = df[_present(columns, df.columns)]
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows].reset_index(drop=True)
+
+    def writable(self):
+        return True
+
+    def _writer(self, key_column):
+        if self.writer is not None and self.writer.key_column == key_column:
+            return self.writer
+        from dsgcore.loaders import SHEET_WRITE_SCOPES, open_sheet
+        from dsgcore.writeback import SheetWriteBack
+        worksheet = open_sheet(self.sheet_url, self.service_account_info, scopes=SHEET_WRITE_SCOPES).get_worksheet(0)
+        return SheetWriteBack(worksheet, key_column, start=False)
+
+    def write_fields(self, updates, key_column='primaryid'):
+        """Send every edited cell in one batch_update (see SheetWriteBack); cells of unknown rows are dropped"""
+        writer = self._writer(key_column)
+        columns = [c for c in updates.columns if c != key_column]
+        keys = updates[key_column].tolist()
+        cells = {}
+        for col in columns:
+            values = updates[col].astype('object').where(updates[col].notna(), None).tolist()
+            cells.update(((key, col), value) for key, value in zip(keys, values))
+        with span('write_sheet'):
+            written = writer.write(cells)
+        return len({key for key, _ in written})
+
+class MergedSource(DataSource):
+    """Several sources read as one frame (see dsgcore.merge), in the order given
+
+    read() parses the sources in parallel and leaves the merge report in
+    the frame's attrs['merge'].
+    """
+    kind = 'merged'
+
+    def __init__(self, sources, workers=None):
+        self._sources = list(sources)
+        self.workers = workers
+
+    @property
+    def label(self):
+        return f'{len(self.sources())} files'
+
+    def sources(self):
+        return self._sources
+
+    def cache_key(self):
+        return (self.kind,) + tuple(source.cache_key() for source in self.sources())
+
+    def _chunks(self, chunk_rows, columns):
+        for source in self.sources():
+            for chunk in source.iter_chunks(chunk_rows, columns):
+                yield chunk.assign(source_file=source.label)
+
+    def read_raw(self, columns=None):
+        from dsgcore.merge import merge_sources
+        sources = self.sources()
+        if not sources:
+            raise ValueError(f'No case files in {self.label}')
+        df, report = merge_sources(sources, columns, self.workers)
+        df.attrs['merge'] = report
+        return df
+
+    def writable(self):
+        sources = self.sources()
+        return bool(sources) and all(source.writable() for source in sources)
+
+    def write_fields(self, updates, key_column='primaryid'):
+        """Write every edit to the file its row came from (by the source_file column of the merged frame)"""
+        from dsgcore.merge import SOURCE_COLUMN
+        if SOURCE_COLUMN not in updates.columns:
+            raise ValueError(f'Edits of merged files need the {SOURCE_COLUMN} of every row')
+        by_label = {source.label: source for source in self.sources()}
+        written = 0
+        for label, part in updates.groupby(SOURCE_COLUMN, sort=False):
+            if label not in by_label:
+                raise ValueError(f'{label} is no longer in {self.label}')
+            written += by_label[label].write_fields(part.drop(columns=SOURCE_COLUMN), key_column)
+        return written
+
+class ServerDirectorySource(MergedSource):
+    """Every case file (CSV/TSV, compressed or not, Parquet/Feather, SQLite) in a server directory, in name order"""
+    kind = 'directory'
+
+    def __init__(self, directory, pattern='*', workers=None):
+        self.directory = directory
+        self.pattern = pattern
+        self.workers = workers
+
+    @property
+    def label(self):
+        return self.directory
+
+    def files(self):
+        paths = glob.glob(os.path.join(self.directory, self.pattern))
+        return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(FILE_EXTENSIONS))
+
+    def sources(self):
+        return [source_for_path(path) for path in self.files()]
+
+def file_source(data, name, table=None):
+    """DataSource of file bytes or a path, chosen by the extension of `name`"""
+    inner, compression = _split_compression(name.lower())
+    if compression == 'zip' or inner.endswith(CSV_EXTENSIONS):
+        return CsvSource(data, name)
+    if compression is None and inner.endswith(ARROW_EXTENSIONS):
+        return ArrowFileSource(data, name)
+    if compression is None and inner.endswith(SQLITE_EXTENSIONS) and not isinstance(data, bytes):
+        return SQLiteSource(data, table)
+    raise ValueError(f"Unsupported case file {os.path.basename(name)} "
+                     f"(expected CSV/TSV, optionally .gz/.zip/.zst, Parquet or Feather)")
+
+def source_for_path(path, table=None):
+    """DataSource of a file or directory on the server, chosen by extension"""
+    if os.path.isdir(path):
+        return ServerDirectorySource(path)
+    return file_source(path, os.path.basename(path), table)
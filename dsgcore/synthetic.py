@@ -0,0 +1,242 @@
+"""Seeded generator of synthetic FAERS-shaped flattened case files
+
+Cases are drawn column-wise with numpy, then every case is repeated for
+its follow-up versions. The shape follows the real extracts: a long-tailed
+number of drugs per case (the first one PS, the rest mostly C with some SS
+and I), Zipf-distributed drug names and PTs, dates reported to the day,
+month or year, multi-KB narratives naming the case's drugs and reactions,
+follow-up versions of the same caseid and a share of probable duplicates
+(the same case re-reported under another caseid). The same seed always
+gives the same frame.
+
+    python -m dsgcore.synthetic --rows 100000 --out cases.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.loaders import CASE_COLUMNS
+
+ROLE_MIX = {'SS': 0.2, 'C': 0.74, 'I': 0.06}
+PRECISION_MIX = {8: 0.7, 6: 0.15, 4: 0.08, 0: 0.07}
+
+ROUTES = ['ORAL', 'INTRAVENOUS', 'SUBCUTANEOUS', 'INTRAMUSCULAR', 'TOPICAL', 'UNKNOWN', 'NA']
+DOSE_UNITS = ['MG', 'MG', 'MG', 'UG', 'G', 'ML', 'IU']
+DOSE_FORMS = ['TABLET', 'CAPSULE', 'INJECTION', 'SOLUTION', 'CREAM', 'NA']
+DOSE_FREQS = ['QD', 'BID', 'TID', 'QW', 'Q2W', 'PRN', 'NA']
+CHALLENGE_CODES = ['Y', 'N', 'U', 'D', 'NA']
+DURATION_CODES = ['DAY', 'WK', 'MON', 'YR']
+COUNTRIES = ['US', 'US', 'US', 'GB', 'DE', 'FR', 'JP', 'CA', 'IT', 'ES', 'BR', 'CN']
+SENDERS = ['ROCHE', 'PFIZER', 'NOVARTIS', 'SANOFI', 'MERCK', 'GSK', 'ASTRAZENECA', 'BAYER', 'FDA-CTU']
+OCCUPATIONS = ['MD', 'HP', 'CN', 'PH', 'LW']
+ASSESSORS = ['Lorrie', 'Nicole', 'Daizy', 'Maurizio']
+
+SYLLABLES = ['ze', 'lo', 'vir', 'pra', 'tan', 'mab', 'cin', 'dol', 'rex', 'sta', 'fen', 'lin',
+             'tor', 'va', 'qui', 'nel', 'xa', 'par', 'mo', 'ti', 'don', 'zol', 'ser', 'ib']
+PT_WORDS = ['Acute', 'Chronic', 'Hepatic', 'Renal', 'Cardiac', 'Skin', 'Pulmonary', 'Gastrointestinal',
+            'Neutrophil', 'Platelet', 'Blood', 'Muscle', 'Joint', 'Visual', 'Cerebral', 'Vascular']
+PT_NOUNS = ['failure', 'injury', 'disorder', 'pain', 'rash', 'haemorrhage', 'oedema', 'infection',
+            'count decreased', 'count increased', 'toxicity', 'fracture', 'impairment', 'syndrome']
+NARRATIVE_SENTENCES = [
+    "The patient's medical history was not reported.",
+    "Laboratory values obtained at the time of the event were within normal limits except as noted.",
+    "The reporter considered the event to be serious due to hospitalization.",
+    "Concomitant medications were continued without change.",
+    "No further information regarding the outcome is expected.",
+    "The event was treated with supportive care and the patient was discharged in stable condition.",
+    "Causality was assessed by the reporter as possibly related to the suspect product.",
+    "The batch record was reviewed and no deviations were identified.",
+    "The patient had no known drug allergies at baseline.",
+    "A follow-up attempt was made to obtain additional details from the reporting physician.",
+    "Relevant tests included a complete blood count, liver panel and renal function tests.",
+    "The company considered the case medically confirmed based on the reporter's occupation.",
+]
+ADMIN_TRAILER = (" [Case reference redacted] This case was received via the manufacturer's regulatory "
+                 "reporting channel; additional information may be provided in subsequent follow-up versions.")
+
+def _zipf_codes(rng, n, vocabulary, a=1.1):
+    """n codes in [0, vocabulary) with Zipf-like (long-tailed) frequencies"""
+    weights = 1 / np.arange(1, vocabulary + 1) ** a
+    return rng.choice(vocabulary, size=n, p=weights / weights.sum())
+
+def _drug_names(rng, n):
+    """n distinct upper-case brand-like names built from syllables"""
+    names = set()
+    while len(names) < n:
+        parts = rng.choice(SYLLABLES, size=(n, 3))
+        names.update(''.join(p).upper() for p in parts)
+    return np.array(sorted(names)[:n], dtype=object)
+
+def _pt_names(n):
+    """n distinct PT-like terms ('Renal failure', 'Renal failure 2', ...)"""
+    base = [f'{w} {noun}' for w in PT_WORDS for noun in PT_NOUNS]
+    return np.array([base[i % len(base)] + ('' if i < len(base) else f' {i // len(base) + 1}') for i in range(n)],
+                    dtype=object)
+
+def _pack(values, counts, sep=' ; '):
+    """Join consecutive values into one `sep`-separated cell per case (`counts` values each, all >= 1)"""
+    separators = np.full(len(values), sep, dtype=object)
+    separators[np.cumsum(counts) - 1] = '\0'
+    parts = np.empty(2 * len(values), dtype=object)
+    parts[0::2] = values
+    parts[1::2] = separators
+    return np.array(''.join(parts).split('\0')[:-1], dtype=object)
+
+def _dates(rng, days, precision_mix=PRECISION_MIX):
+    """YYYYMMDD strings of day offsets from 2000-01-01, truncated to month/year (or 'NA') per the mix"""
+    text = (np.datetime64('2000-01-01') + days.astype('timedelta64[D]')).astype(str)
+    text = np.char.replace(text, '-', '')
+    lengths = rng.choice(list(precision_mix), size=len(days), p=list(precision_mix.values()))
+    out = np.where(lengths == 8, text, np.where(lengths == 6, np.char.ljust(text, 8).astype('<U6'), text.astype('<U4')))
+    return np.where(lengths == 0, 'NA', out).astype(object)
+
+def _choice(rng, options, n):
+    return np.asarray(options, dtype=object)[rng.integers(0, len(options), n)]
+
+def synthetic_cases(n_rows, seed=0, drugs=5000, pts=3000, version_rate=0.15, duplicate_rate=0.01,
+                    narrative_kb=2.0):
+    """Flattened case frame of `n_rows` rows (case versions included), deterministic for a seed
+
+    `version_rate` is the share of cases with follow-up versions,
+    `duplicate_rate` the share re-reported under a second caseid and
+    `narrative_kb` the mean narrative size.
+    """
+    rng = np.random.default_rng(seed)
+    extra_versions = np.where(rng.random(n_rows) < version_rate, rng.geometric(0.6, n_rows), 0)
+    n_versions = 1 + extra_versions
+    n_cases = int(np.searchsorted(np.cumsum(n_versions), n_rows)) + 1
+    n_versions = n_versions[:n_cases]
+    n_versions[-1] -= int(n_versions.sum()) - n_rows
+
+    # Probable duplicates copy the content of an earlier case
+    source = np.arange(n_cases)
+    duplicated = np.flatnonzero(rng.random(n_cases) < duplicate_rate)
+    duplicated = duplicated[duplicated > 0]
+    source[duplicated] = rng.integers(0, duplicated)
+
+    # Drug lines: long-tailed count per case, first drug PS
+    drug_counts = np.minimum(rng.geometric(0.35, n_cases) + rng.zipf(2.0, n_cases) - 1, 80)
+    line_case = np.repeat(np.arange(n_cases), drug_counts)
+    first_line = np.cumsum(drug_counts) - drug_counts
+    n_lines = len(line_case)
+    roles = rng.choice(list(ROLE_MIX), size=n_lines, p=list(ROLE_MIX.values())).astype(object)
+    roles[first_line] = 'PS'
+    drug_vocabulary = _drug_names(rng, drugs)
+    ingredient_vocabulary = _drug_names(rng, max(drugs // 3, 1))
+    drug_codes = _zipf_codes(rng, n_lines, drugs)
+    drug_names = drug_vocabulary[drug_codes]
+    ingredients = ingredient_vocabulary[drug_codes % len(ingredient_vocabulary)]
+
+    # Reactions and indications
+    pt_vocabulary = _pt_names(pts)
+    pt_counts = np.minimum(rng.geometric(0.35, n_cases), 30)
+    pt_names = pt_vocabulary[_zipf_codes(rng, int(pt_counts.sum()), pts)]
+    indications = pt_vocabulary[_zipf_codes(rng, n_lines, pts, a=1.3)]
+
+    # Dates: event in 2004-2025, drug start 0-2 years before it, end 1 month to 3 years after start
+    event_day = rng.integers(365 * 4, 365 * 25, n_cases)
+    start_day = event_day[line_case] - np.minimum(rng.geometric(1 / 120, n_lines), 730)
+    end_day = start_day + rng.integers(30, 1100, n_lines)
+    fda_day = event_day + rng.integers(10, 400, n_cases)
+
+    packed = {
+        'drug_seq': _pack((np.arange(n_lines) - np.repeat(first_line, drug_counts) + 1).astype(str).astype(object), drug_counts),
+        'role_cod': _pack(roles, drug_counts),
+        'drugname': _pack(drug_names, drug_counts),
+        'prod_ai': _pack(ingredients, drug_counts),
+        'val_vbm': _pack(_choice(rng, ['1', '1', '2'], n_lines), drug_counts),
+        'route': _pack(_choice(rng, ROUTES, n_lines), drug_counts),
+        'dose_vbm': _pack(_choice(rng, ['NA', 'NA', '10 MG, QD', 'UNK'], n_lines), drug_counts),
+        'cum_dose_chr': _pack(np.full(n_lines, 'NA', dtype=object), drug_counts),
+        'cum_dose_unit': _pack(np.full(n_lines, 'NA', dtype=object), drug_counts),
+        'dechal': _pack(_choice(rng, CHALLENGE_CODES, n_lines), drug_counts),
+        'rechal': _pack(_choice(rng, CHALLENGE_CODES, n_lines), drug_counts),
+        'lot_num': _pack(np.where(rng.random(n_lines) < 0.1, rng.integers(10000, 99999, n_lines).astype(str), 'NA').astype(object), drug_counts),
+        'exp_dt': _pack(_dates(rng, end_day + 365, {8: 0.05, 6: 0.05, 0: 0.9}), drug_counts),
+        'nda_num': _pack(np.where(rng.random(n_lines) < 0.5, rng.integers(10000, 220000, n_lines).astype(str), 'NA').astype(object), drug_counts),
+        'dose_amt': _pack(_choice(rng, ['1', '5', '10', '20', '50', '100', '250', '500', 'NA'], n_lines), drug_counts),
+        'dose_unit': _pack(_choice(rng, DOSE_UNITS, n_lines), drug_counts),
+        'dose_form': _pack(_choice(rng, DOSE_FORMS, n_lines), drug_counts),
+        'dose_freq': _pack(_choice(rng, DOSE_FREQS, n_lines), drug_counts),
+        'start_dt': _pack(_dates(rng, start_day), drug_counts),
+        'end_dt': _pack(_dates(rng, end_day, {8: 0.3, 6: 0.1, 4: 0.05, 0: 0.55}), drug_counts),
+        'dur': _pack(np.where(rng.random(n_lines) < 0.2, rng.integers(1, 60, n_lines).astype(str), 'NA').astype(object), drug_counts),
+        'dur_cod': _pack(_choice(rng, DURATION_CODES, n_lines), drug_counts),
+        'pt': _pack(pt_names, pt_counts),
+        'indi_pt': _pack(indications, drug_counts),
+    }
+
+    age = rng.integers(0, 96, n_cases)
+    sex = _choice(rng, ['F', 'F', 'F', 'M', 'M', 'UNK'], n_cases)
+    cases = pd.DataFrame({
+        **{col: values[source] for col, values in packed.items()},
+        'event_dt': _dates(rng, event_day)[source],
+        'age': np.where(rng.random(n_cases) < 0.85, age.astype(str), '').astype(object)[source],
+        'age_cod': 'YR',
+        'age_grp': np.select([age < 2, age < 12, age < 18, age < 65], ['I', 'C', 'T', 'A'], 'E').astype(object)[source],
+        'sex': sex[source],
+        'wt': np.where(rng.random(n_cases) < 0.4, rng.integers(3, 140, n_cases).astype(str), '').astype(object)[source],
+        'wt_cod': 'KG',
+        'occr_country': _choice(rng, COUNTRIES, n_cases)[source],
+        'reporter_country': _choice(rng, COUNTRIES, n_cases),
+        'rept_cod': rng.choice(['EXP', 'PER', 'DIR'], size=n_cases, p=[0.8, 0.15, 0.05]).astype(object),
+        'mfr_sndr': _choice(rng, SENDERS, n_cases),
+        'occp_cod': _choice(rng, OCCUPATIONS, n_cases),
+        'e_sub': 'Y',
+    })
+    cases['mfr_num'] = cases['reporter_country'] + '-' + cases['mfr_sndr'] + '-' + rng.integers(10**6, 10**7, n_cases).astype(str)
+
+    # Narrative: a case-specific opening naming the PS drug, indication and PTs, then filler paragraphs
+    ps_drug = drug_names[first_line][source]
+    ps_indication = indications[first_line][source]
+    opening = ('A ' + np.where(cases['age'] == '', 'patient', cases['age'] + '-year-old patient').astype(object)
+               + ' (' + cases['sex'].to_numpy() + ') received ' + ps_drug + ' for ' + ps_indication
+               + ' and experienced ' + cases['pt'].str.replace(' ; ', ', ', regex=False).to_numpy(dtype=object) + '. ')
+    paragraphs = np.array([' '.join(rng.choice(NARRATIVE_SENTENCES, size=len(NARRATIVE_SENTENCES)))
+                           for _ in range(256)], dtype=object)
+    target = rng.exponential(narrative_kb * 1024, n_cases)
+    n_paragraphs = np.maximum(np.round(target / np.mean([len(p) for p in paragraphs])).astype(int), 1)
+    picks = rng.integers(0, len(paragraphs), int(n_paragraphs.sum()))
+    cases['narrative_clean'] = opening + _pack(paragraphs[picks], n_paragraphs, sep='\n\n')
+    cases['narrative'] = cases['narrative_clean'] + ADMIN_TRAILER
+
+    # Case versions: repeat every case, later versions reported later with i_f_code F
+    rows = cases.loc[np.repeat(np.arange(n_cases), n_versions)].reset_index(drop=True)
+    version = (np.arange(n_rows) - np.repeat(np.cumsum(n_versions) - n_versions, n_versions) + 1)
+    caseid = 10_000_000 + np.repeat(np.arange(n_cases), n_versions)
+    row_fda_day = np.repeat(fda_day, n_versions) + (version - 1) * rng.integers(20, 200, n_rows)
+    fda_dt = _dates(rng, row_fda_day, {8: 1.0})
+    rows['caseid'] = caseid
+    rows['caseversion'] = version
+    rows['primaryid'] = (caseid.astype(str).astype(object) + version.astype(str).astype(object)).astype(np.int64)
+    rows['i_f_code'] = np.where(version == 1, 'I', 'F')
+    rows['fda_dt'] = fda_dt
+    rows['rept_dt'] = fda_dt
+    rows['init_fda_dt'] = _dates(rng, np.repeat(fda_day, n_versions), {8: 1.0})
+    rows['mfr_dt'] = _dates(rng, row_fda_day - rng.integers(0, 15, n_rows), {8: 1.0})
+
+    # Workload columns: about a third of the cases already assigned, some of them done
+    assigned = rng.random(n_rows) < 0.3
+    rows['assessor'] = np.where(assigned, _choice(rng, ASSESSORS, n_rows), '')
+    rows['date_assignement'] = np.where(assigned, '06-01-2026', '')
+    rows['status'] = np.where(assigned & (rng.random(n_rows) < 0.4), 'Done', '')
+    for col in ('auth_num', 'lit_ref', 'to_mfr'):
+        rows[col] = ''
+    return rows[CASE_COLUMNS]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic FAERS-shaped case file")
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--narrative-kb', type=float, default=2.0, help="Mean narrative size (KB)")
+    parser.add_argument('--out', required=True, help="Output CSV (tab-separated for .tsv/.txt)")
+    args = parser.parse_args(argv)
+
+    df = synthetic_cases(args.rows, seed=args.seed, narrative_kb=args.narrative_kb)
+    sep = '\t' if args.out.endswith(('.tsv', '.txt')) else ','
+    df.to_csv(args.out, sep=sep, index=False)
+    print(f"{len(df):,} rows ({df['caseid'].nunique():,} cases) written to {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Time-to-onset and exposure duration of every drug, computed column-wise
+
+FAERS dates are YYYYMMDD, YYYYMM or YYYY. A partial date is read as the
+interval it covers, so time to onset (event_dt - start_dt) is an interval
+too: exact for two full dates, a range otherwise. Exposure is dur/dur_cod
+converted to days, falling back to end_dt - start_dt for full dates.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+PRECISIONS = ['day', 'month', 'year']
+
+DURATION_DAYS = {
+    'YR': 365.25,
+    'MON': 30.4375,
+    'WK': 7.0,
+    'DAY': 1.0,
+    'HR': 1 / 24,
+    'MIN': 1 / 1440,
+    'SEC': 1 / 86400,
+}
+
+# Upper edges (days) of the onset bins shown in distributions
+ONSET_BINS = [0, 1, 7, 30, 90, 180, 365, np.inf]
+ONSET_BIN_LABELS = ['<0 (before start)', '0–1 d', '1–7 d', '7–30 d', '30–90 d', '90–180 d', '180–365 d', '>1 y']
+
+def _parse_dates(digits):
+    """first/last day and precision code (0 day, 1 month, 2 year, -1 invalid) of digit strings"""
+    length = np.array([len(d) for d in digits])
+    padded = np.array([(d + '0101')[:8] if len(d) >= 4 else '00000000' for d in digits])
+    value = padded.astype(np.int64) if len(padded) else np.zeros(0, dtype=np.int64)
+    year, month, day = value // 10000, value // 100 % 100, value % 100
+    month = np.where(length >= 6, month, 1)
+    day = np.where(length >= 8, day, 1)
+    precision = np.select([length >= 8, length >= 6, length >= 4], [0, 1, 2], -1)
+
+    month_start = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    first = month_start.astype('datetime64[D]') + (day - 1)
+    month_end = (month_start + 1).astype('datetime64[D]') - 1
+    year_end = ((year - 1970 + 1).astype('datetime64[Y]')).astype('datetime64[D]') - 1
+    valid = (precision >= 0) & (year >= 1900) & (month >= 1) & (month <= 12) & (day >= 1) & (first <= month_end)
+    last = np.select([precision == 1, precision == 2], [month_end, year_end], first)
+    precision = np.where(valid, precision, -1)
+    first = np.where(valid, first, np.datetime64('NaT'))
+    last = np.where(valid, last, np.datetime64('NaT'))
+    return first, last, precision
+
+def partial_dates(series):
+    """First day, last day and precision of the period each FAERS date covers"""
+    # Dates repeat a lot, so only the distinct strings are parsed
+    codes, uniques = pd.factorize(series.astype('string'))
+    # A date column with blanks reads as floats, so '20250128.0' loses its '.0' first
+    first, last, precision = _parse_dates([re.sub(r'\D', '', re.sub(r'\.0+$', '', u)) for u in uniques])
+    # Missing values get code -1, which picks the trailing NaT
+    first = np.append(first, np.datetime64('NaT'))[codes]
+    last = np.append(last, np.datetime64('NaT'))[codes]
+    precision = np.append(precision, -1)[codes]
+    return pd.DataFrame({
+        'first': pd.to_datetime(first),
+        'last': pd.to_datetime(last),
+        'precision': pd.Categorical.from_codes(precision, categories=PRECISIONS, ordered=True),
+    }, index=series.index)
+
+def _days(delta):
+    return delta.dt.days.to_numpy(dtype=float)
+
+def _duration_days(amounts, units):
+    """dur x dur_cod in days; only the distinct values of each column are converted"""
+    amount_codes, amount_values = pd.factorize(amounts.astype('string'))
+    unit_codes, unit_values = pd.factorize(units.astype('string'))
+    # Missing values get code -1, which picks the trailing NaN
+    amount = np.append(pd.to_numeric(amount_values, errors='coerce').astype(float), np.nan)
+    factor = np.append([DURATION_DAYS.get(u.strip().upper(), np.nan) for u in unit_values], np.nan)
+    return amount[amount_codes] * factor[unit_codes]
+
+def onset_table(drug_table, event_dates):
+    """Time to onset and exposure (days) of every line of the exploded drug table
+
+    `event_dates` is the event_dt column of the case frame, looked up by the
+    drug table's positional `row`. Returns a frame on the drug table's index.
+    """
+    rows = drug_table['row'].to_numpy()
+    event = partial_dates(event_dates).iloc[rows].reset_index(drop=True)
+    start = partial_dates(drug_table['start_date'].reset_index(drop=True))
+    end = partial_dates(drug_table['end_date'].reset_index(drop=True))
+
+    tto_min = _days(event['first'] - start['last'])
+    tto_max = _days(event['last'] - start['first'])
+    # The coarser of the two precisions (categories are ordered day < month < year)
+    codes = np.maximum(event['precision'].cat.codes.to_numpy(), start['precision'].cat.codes.to_numpy())
+    known = (event['precision'].cat.codes.to_numpy() >= 0) & (start['precision'].cat.codes.to_numpy() >= 0)
+    tto_precision = pd.Categorical.from_codes(np.where(known, codes, -1), categories=PRECISIONS, ordered=True)
+
+    from_dur = _duration_days(drug_table['duration'], drug_table['duration_code'])
+    full_dates = ((start['precision'] == 'day') & (end['precision'] == 'day')).to_numpy()
+    from_dates = np.where(full_dates, _days(end['first'] - start['first']) + 1, np.nan)
+    exposure = np.where(np.isnan(from_dur), from_dates, from_dur)
+    source = np.select([~np.isnan(from_dur), ~np.isnan(from_dates)], ['dur', 'dates'], '')
+
+    return pd.DataFrame({
+        'tto_days': (tto_min + tto_max) / 2,
+        'tto_min': tto_min,
+        'tto_max': tto_max,
+        'tto_precision': tto_precision,
+        'exposure_days': exposure,
+        'exposure_source': np.where(source == '', None, source),
+    }, index=drug_table.index)
+
+def format_onset(record):
+    """Display text of one onset_table record"""
+    if np.isnan(record['tto_min']):
+        return 'NA'
+    if record['tto_precision'] == 'day':
+        return f"{record['tto_min']:.0f} days"
+    return f"{record['tto_min']:.0f} to {record['tto_max']:.0f} days ({record['tto_precision']} precision)"
+
+def format_exposure(record):
+    """Display text of the exposure duration of one onset_table record"""
+    days = record['exposure_days']
+    if np.isnan(days):
+        return 'NA'
+    text = f"{days:.0f} days" if days >= 1 else f"{days * 24:.1f} hours"
+    return text + (' (from dates)' if record['exposure_source'] == 'dates' else '')
+
+def onset_distribution(drug_table, onset, drug_field='drug_name', suspect_only=True, rows=None):
+    """Per-drug time-to-onset summary: counts per onset bin and quantiles of the midpoint
+
+    Only onsets known at least to the month are used. `rows` restricts the
+    summary to the given positional case rows (e.g. latest versions).
+    """
+    keep = onset['tto_precision'].isin(['day', 'month']).to_numpy()
+    if suspect_only:
+        keep = keep & drug_table['role_code'].isin(['PS', 'SS', 'I']).to_numpy()
+    if rows is not None:
+        keep = keep & np.isin(drug_table['row'].to_numpy(), rows)
+    drugs = drug_table[drug_field].astype('string').str.strip().str.upper()[keep]
+    days = onset['tto_days'][keep]
+    frame = pd.DataFrame({'drug': drugs.to_numpy(), 'tto_days': days.to_numpy()})
+    frame = frame[frame['drug'].notna() & (frame['drug'] != 'NA')]
+    frame['bin'] = pd.cut(frame['tto_days'], [-np.inf] + ONSET_BINS, labels=ONSET_BIN_LABELS, right=False)
+
+    grouped = frame.groupby('drug', sort=False)['tto_days']
+    summary = pd.DataFrame({
+        'n': grouped.size(),
+        'median': grouped.median(),
+        'q1': grouped.quantile(0.25),
+        'q3': grouped.quantile(0.75),
+    })
+    bins = frame.groupby(['drug', 'bin'], observed=False).size().unstack('bin', fill_value=0)
+    return summary.join(bins).sort_values('n', ascending=False).rename_axis('drug').reset_index()
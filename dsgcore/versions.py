@@ -0,0 +1,86 @@
+"""Caseid-to-versions index and field-level diffs between case versions"""
+import numpy as np
+import pandas as pd
+
+from dsgcore.dedup import _version_order
+from dsgcore.packed import DRUG_FIELDS
+
+# Columns added by the ingest stage, never part of a diff
+DERIVED_COLUMNS = {'is_latest_version', 'version_count', 'probable_duplicates'}
+
+# Packed non-drug columns, compared as lists rather than as plain values
+LIST_COLUMNS = {'pt'}
+
+DRUG_DIFF_FIELDS = [key for key in DRUG_FIELDS.values() if key != 'sequence']
+
+def build_version_index(df):
+    """Map every caseid to the positional rows of its versions, oldest first"""
+    if 'caseid' not in df.columns or len(df) == 0:
+        return {}
+    order = _version_order(df).reset_index(drop=True)
+    order = order.sort_values(['caseid', 'version', 'fda_dt', 'primaryid'], na_position='first', kind='stable')
+    caseids = order['caseid'].to_numpy()
+    boundaries = np.flatnonzero(caseids[1:] != caseids[:-1]) + 1
+    groups = np.split(order.index.to_numpy(), boundaries)
+    return dict(zip(caseids[np.r_[0, boundaries]], groups))
+
+def version_timeline(df, rows, drug_counts=None):
+    """One line per version of a case, oldest first"""
+    versions = df.iloc[rows]
+    timeline = pd.DataFrame({'row': rows})
+    for col in ('caseversion', 'primaryid', 'i_f_code', 'fda_dt', 'rept_dt', 'rept_cod'):
+        timeline[col] = versions[col].astype(str).to_numpy() if col in versions.columns else 'NA'
+    if drug_counts is not None:
+        timeline['drugs'] = [int(drug_counts.get(row, 0)) for row in rows]
+    if 'pt' in versions.columns:
+        timeline['reactions'] = versions['pt'].astype('string').str.count(';').add(1).fillna(0).astype(int).to_numpy()
+    return timeline
+
+def diff_case_fields(df, row_a, row_b):
+    """Scalar fields whose value differs between two versions (positional rows)"""
+    skip = set(DRUG_FIELDS) | DERIVED_COLUMNS | LIST_COLUMNS
+    columns = [c for c in df.columns if c not in skip]
+    before = df.iloc[row_a][columns].astype('string').fillna('NA').str.strip()
+    after = df.iloc[row_b][columns].astype('string').fillna('NA').str.strip()
+    changed = before != after
+    return pd.DataFrame({
+        'field': np.asarray(columns)[changed.to_numpy()],
+        'before': before[changed].to_numpy(),
+        'after': after[changed].to_numpy(),
+    })
+
+def diff_lists(items_a, items_b):
+    """Added and removed entries between two lists of values"""
+    set_a = set(items_a)
+    set_b = set(items_b)
+    return {
+        'added': [item for item in items_b if item not in set_a],
+        'removed': [item for item in items_a if item not in set_b],
+    }
+
+def diff_drug_tables(drugs_a, drugs_b):
+    """Drug-level diff of two slices of the exploded drug table
+
+    Drugs are matched on their drug_seq, which FAERS keeps stable across
+    follow-up versions. Returns one line per added, removed or changed drug
+    with the changed fields spelled out.
+    """
+    merged = drugs_a[['sequence'] + DRUG_DIFF_FIELDS].merge(
+        drugs_b[['sequence'] + DRUG_DIFF_FIELDS],
+        on='sequence', how='outer', suffixes=('_a', '_b'), indicator=True,
+    )
+    lines = []
+    for record in merged.to_dict('records'):
+        if record['_merge'] == 'left_only':
+            lines.append({'sequence': record['sequence'], 'drug_name': record['drug_name_a'], 'change': 'removed', 'details': ''})
+        elif record['_merge'] == 'right_only':
+            lines.append({'sequence': record['sequence'], 'drug_name': record['drug_name_b'], 'change': 'added', 'details': ''})
+        else:
+            details = [
+                f"{field}: {record[field + '_a']} → {record[field + '_b']}"
+                for field in DRUG_DIFF_FIELDS
+                if record[field + '_a'] != record[field + '_b']
+            ]
+            if details:
+                lines.append({'sequence': record['sequence'], 'drug_name': record['drug_name_b'], 'change': 'changed', 'details': '; '.join(details)})
+    return pd.DataFrame(lines, columns=['sequence', 'drug_name', 'change', 'details'])
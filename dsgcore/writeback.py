@@ -0,0 +1,304 @@
+"""Batched, asynchronous write-back of case edits to the source worksheet"""
+import logging
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+ASSESSMENT_SHEET_TITLE = 'assessments'
+
+def column_letter(index):
+    """1-based column number to its A1 letters (1 -> A, 27 -> AA)"""
+    letters = ''
+    while index > 0:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+def a1(row, col):
+    """A1 address of a 1-based (row, col) cell"""
+    return f'{column_letter(col)}{row}'
+
+def sheet_key(value):
+    """Case key as the sheet shows it: integral floats (ids read next to blanks) lose their '.0'"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    text = str(value).strip()
+    return text.split('.')[0] if re.fullmatch(r'\d+\.0+', text) else text
+
+class SheetLayoutError(ValueError):
+    """The worksheet lacks the key column, so no edit can be placed; retrying cannot help"""
+
+class SheetWriteBack:
+    """Queue of cell edits flushed to a worksheet by a background worker
+
+    Edits are keyed by (case key, column) so repeated edits of the same cell
+    collapse into the latest value. Every flush sends all pending cells in
+    a single `batch_update` call and all pending assessment rows in a single
+    `append_rows` call, retrying with exponential backoff. Callers never
+    wait on the API: `set_fields` and `add_assessment` only touch memory.
+
+    `worksheet` is a gspread Worksheet (or FakeWorksheet); `assessment_sheet`
+    is optional and receives one appended row per submitted assessment.
+    """
+
+    def __init__(self, worksheet, key_column='primaryid', assessment_sheet=None,
+                 flush_interval=2.0, max_retries=5, backoff=1.0, start=True):
+        self.worksheet = worksheet
+        self.key_column = key_column
+        self.assessment_sheet = assessment_sheet
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._pending_cells = {}
+        self._pending_rows = []
+        # Guards the sheet layout, read by write() callers and the worker alike
+        self._layout_lock = threading.Lock()
+        self._header = None
+        self._row_of_key = None
+        self._missing = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.flushed_cells = 0
+        self.flushed_rows = 0
+        self.last_flush = None
+        self.last_error = None
+        self._worker = None
+        if start:
+            self.start()
+
+    def start(self):
+        """Start the background worker thread"""
+        if self._worker is None or not self._worker.is_alive():
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name='sheet-writeback', daemon=True)
+            self._worker.start()
+
+    def stop(self, flush=True):
+        """Stop the worker, flushing what is still queued first"""
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join()
+        if flush:
+            self.flush()
+
+    def set_fields(self, key, **fields):
+        """Queue new values for the columns of the case row identified by `key`"""
+        with self._lock:
+            for column, value in fields.items():
+                self._pending_cells[(sheet_key(key), column)] = '' if value is None else str(value)
+
+    def write(self, cells):
+        """Write {(key, column): value} now, in one batch_update, superseding queued edits of those cells
+
+        Returns the (key, column) cells written; cells of rows or columns
+        the sheet does not have are left out.
+        """
+        cells = {(sheet_key(key), column): '' if value is None else str(value) for (key, column), value in cells.items()}
+        with self._lock:
+            for cell in cells:
+                self._pending_cells.pop(cell, None)
+        data, unknown = self._ranges(cells)
+        if data:
+            self._with_retry(self.worksheet.batch_update, data)
+            self.flushed_cells += len(data)
+        return [cell for cell in cells if cell not in unknown]
+
+    def add_assessment(self, record):
+        """Queue one assessment record (dict) to be appended to the assessment sheet"""
+        if self.assessment_sheet is None:
+            return
+        with self._lock:
+            self._pending_rows.append(dict(record))
+
+    def pending(self):
+        """Number of queued cells and assessment rows"""
+        with self._lock:
+            return len(self._pending_cells) + len(self._pending_rows)
+
+    def request_flush(self):
+        """Ask the worker to flush now instead of at the next interval"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except SheetLayoutError:
+                pass  # flush() dropped the edits and logged why
+            except Exception:
+                # flush() already re-queued the batch and recorded the error
+                logger.exception('Sheet write-back failed; edits stay queued')
+
+    def reload_layout(self):
+        """Forget the sheet layout, so the next write reads it again (e.g. after rows were added)"""
+        with self._layout_lock:
+            self._header = None
+            self._missing = set()
+
+    def _load_layout(self):
+        """Read the header row and the key column; called with the layout lock held"""
+        header = {name: i + 1 for i, name in enumerate(self.worksheet.row_values(1))}
+        if self.key_column not in header:
+            raise SheetLayoutError(f"The worksheet has no {self.key_column!r} column to match edits on")
+        keys = self.worksheet.col_values(header[self.key_column])
+        self._row_of_key = {sheet_key(k): i + 1 for i, k in enumerate(keys) if i > 0}
+        self._header = header
+        self._missing = set()
+
+    def _ranges(self, cells):
+        """batch_update payload for {(key, column): value}; unknown cells are returned apart
+
+        The layout is read once and again for a cell it does not place; a
+        cell still missing after that read is remembered, so it does not
+        trigger another read until reload_layout().
+        """
+        with self._layout_lock:
+            if self._header is None or any(
+                (key not in self._row_of_key or column not in self._header) and (key, column) not in self._missing
+                for key, column in cells
+            ):
+                self._load_layout()
+            data = []
+            unknown = {}
+            for (key, column), value in cells.items():
+                row = self._row_of_key.get(key)
+                col = self._header.get(column)
+                if row is None or col is None:
+                    unknown[(key, column)] = value
+                    self._missing.add((key, column))
+                else:
+                    data.append({'range': a1(row, col), 'values': [[value]]})
+            return data, unknown
+
+    def _with_retry(self, call, *args):
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                return call(*args)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning('Sheet write-back attempt %d failed: %s', attempt + 1, e)
+                time.sleep(delay + random.uniform(0, delay / 2))
+                delay *= 2
+
+    def flush(self):
+        """Send everything queued so far; failed batches are put back in the queue
+
+        Cell edits are dropped instead when the sheet has no key column
+        (SheetLayoutError), since retrying them would fail forever.
+        """
+        with self._lock:
+            cells, self._pending_cells = self._pending_cells, {}
+            rows, self._pending_rows = self._pending_rows, []
+        if not cells and not rows:
+            return
+        try:
+            if cells:
+                data, unknown = self._ranges(cells)
+                if unknown:
+                    logger.warning('Dropping %d edits for rows or columns missing from the sheet', len(unknown))
+                if data:
+                    self._with_retry(self.worksheet.batch_update, data)
+                    self.flushed_cells += len(data)
+                cells = {}
+            if rows:
+                header = self._assessment_header(rows)
+                values = [[str(r.get(col, '')) for col in header] for r in rows]
+                self._with_retry(self.assessment_sheet.append_rows, values)
+                self.flushed_rows += len(values)
+                rows = []
+            self.last_flush = time.time()
+            self.last_error = None
+        except SheetLayoutError as e:
+            # Not retried: the batch is dropped and the error reported once
+            self.last_error = str(e)
+            logger.error('Dropping %d queued edits: %s', len(cells), e)
+            with self._lock:
+                self._pending_rows = rows + self._pending_rows
+            raise
+        except Exception as e:
+            self.last_error = str(e)
+            with self._lock:
+                # Newer edits of the same cell win over the failed batch
+                cells.update(self._pending_cells)
+                self._pending_cells = cells
+                self._pending_rows = rows + self._pending_rows
+            raise
+
+    def _assessment_header(self, rows):
+        """Header of the assessment sheet, written on first use"""
+        header = self.assessment_sheet.row_values(1)
+        if not header:
+            header = list(rows[0].keys())
+            self._with_retry(self.assessment_sheet.append_rows, [header])
+        return header
+
+class FakeWorksheet:
+    """In-memory stand-in for a gspread Worksheet, for tests and load runs
+
+    Implements the calls used by the app and SheetWriteBack and counts API
+    calls. `fail_next` makes the next N write calls raise, to exercise retry.
+    """
+
+    def __init__(self, rows=None, title='Sheet1'):
+        self.title = title
+        self.rows = [list(r) for r in rows] if rows else []
+        self.calls = 0
+        self.fail_next = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dataframe(cls, df, title='Sheet1'):
+        """Worksheet holding a DataFrame with its header row"""
+        values = df.astype(str).values.tolist()
+        return cls([list(map(str, df.columns))] + values, title=title)
+
+    def _check(self):
+        self.calls += 1
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise ConnectionError('simulated API failure')
+
+    def row_values(self, row):
+        self.calls += 1
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def col_values(self, col):
+        self.calls += 1
+        return [r[col - 1] if col <= len(r) else '' for r in self.rows]
+
+    def get_all_records(self):
+        self.calls += 1
+        header = self.rows[0] if self.rows else []
+        return [dict(zip(header, r)) for r in self.rows[1:]]
+
+    def batch_update(self, data):
+        with self._lock:
+            self._check()
+            for item in data:
+                col_letters, row = re.match(r'([A-Z]+)(\d+)$', item['range']).groups()
+                col = 0
+                for ch in col_letters:
+                    col = col * 26 + ord(ch) - ord('A') + 1
+                row = int(row)
+                while len(self.rows) < row:
+                    self.rows.append([])
+                target = self.rows[row - 1]
+                while len(target) < col:
+                    target.append('')
+                target[col - 1] = item['values'][0][0]
+
+    def append_rows(self, values):
+        with self._lock:
+            self._check()
+            self.rows.extend(list(r) for r in values)
@@ -0,0 +1,773 @@
+import datetime
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+import numpy as np
+import pandas as pd
+
+from dsgcore.assignment import (ASSIGNMENT_DATE_FORMAT, apply_assignment, assignment_updates, plan_assignment,
+                                unassigned_mask)
+from dsgcore.browse import BROWSE_COLUMNS, PAGE_SIZES
+from dsgcore.compare import (COMPARE_MAX, COMPARE_MIN, compare_fields, compare_reactions, compare_suspect_drugs,
+                             parse_primaryids)
+from dsgcore.cube import CUBE_DIMENSIONS, OTHER
+from dsgcore.dataset import CaseDataset
+from dsgcore.dedup import latest_version_mask
+from dsgcore.fields import format_date_std
+from dsgcore.timing import ONSET_BIN_LABELS, onset_distribution
+from dsgcore.signals import flag_signals
+from dsgcore.quality import issue_summary
+from dsgcore.highlight import legend_html
+from dsgcore.network import NETWORK_FORMATS, DrugNetwork, export_network
+from dsgcore.export import EXPORT_FORMATS, date_range_positions, export_chunks, iter_frame_chunks, prune_exports
+from dsgcore.versions import diff_case_fields, diff_drug_tables, diff_lists
+from dsgcore.profiling import log_profile, profile_logger, profiled
+from dsgcore.merge import SOURCE_COLUMN
+from dsgcore.metrics import REGISTRY, serve_metrics
+from dsgcore.sources import ServerDirectorySource, source_for_path
+
+VIEW_CASES = "🔍 Case Viewer"
+VIEW_OVERVIEW = "📊 Overview"
+VIEW_SIGNALS = "📈 Signal Detection"
+VIEW_NETWORK = "🕸️ Drug Network"
+VIEW_COMPARE = "🆚 Compare Cases"
+VIEW_ASSIGN = "🗂️ Assign Cases"
+VIEWS = [VIEW_CASES, VIEW_COMPARE, VIEW_OVERVIEW, VIEW_SIGNALS, VIEW_NETWORK, VIEW_ASSIGN]
+
+# Every profiled rerun is also appended here when set (JSON lines, rotated at 5 MB)
+PROFILE_LOG = os.environ.get('DSG_PROFILE_LOG', '')
+PROFILE_HISTORY = 50
+
+# Directory of case files on the server offered in the sidebar when set
+DATA_DIR = os.environ.get('DSG_DATA_DIR', '')
+
+# Local metrics endpoint (/metrics, /metrics.json) of this process when set
+METRICS_PORT = int(os.environ.get('DSG_METRICS_PORT', '0') or 0)
+METRICS_HOST = os.environ.get('DSG_METRICS_HOST', '127.0.0.1')
+
+# Frames whose CaseDataset is kept; older ones are rebuilt if a session still holds them
+DATASET_CACHE_ENTRIES = int(os.environ.get('DSG_DATASET_CACHE', '8') or 8)
+
+# One CaseDataset per loaded frame, shared by every session holding it
+@st.cache_resource(max_entries=DATASET_CACHE_ENTRIES, show_spinner="Indexing cases...")
+def shared_dataset(frame_id, _df):
+    """CaseDataset of a frame, keyed by id(frame), with its ingest-stage indexes built"""
+    dataset = CaseDataset(_df)
+    dataset.ingest()
+    return dataset
+
+def get_dataset():
+    """Shared CaseDataset wrapping the DataFrame currently held in the session"""
+    df = st.session_state['df']
+    dataset = st.session_state.get('dataset')
+    REGISTRY.cache_event('dataset', dataset is not None and dataset.df is df)
+    if dataset is None or dataset.df is not df:
+        # A cached entry keeps its frame alive, so its id cannot belong to another frame
+        dataset = shared_dataset(id(df), df)
+        st.session_state['dataset'] = dataset
+    return dataset
+
+def load_uploads(files, load_files):
+    """Case frame of the uploaded (name, bytes) files, read with `load_files` when the upload changes
+
+    Files added to an upload already loaded in the session are read on
+    their own and folded into its dataset (CaseDataset.extend), so the
+    signal tables computed so far are updated rather than rebuilt.
+    """
+    upload = st.session_state.get('upload')
+    if upload is not None and upload['files'] == files:
+        return upload['df']
+    if upload is not None and len(files) > len(upload['files']) and files[:len(upload['files'])] == upload['files']:
+        base = upload['df']
+        dataset = st.session_state.get('dataset')
+        if dataset is None or dataset.df is not base:
+            dataset = shared_dataset(id(base), base)
+        added = files[len(upload['files']):]
+        with st.spinner(f"Adding {', '.join(name for name, _ in added)}..."):
+            batch = load_files(added)
+            if SOURCE_COLUMN in base.columns and SOURCE_COLUMN not in batch.columns:
+                batch = batch.assign(**{SOURCE_COLUMN: added[0][0]})
+            dataset = dataset.extend(batch)
+        st.session_state['dataset'] = dataset
+        df = dataset.df
+    else:
+        df = load_files(files)
+    st.session_state['upload'] = {'files': files, 'df': df}
+    return df
+
+# Shared frame per source, so the indexes built on it survive reruns
+@st.cache_resource(show_spinner="Reading cases and resolving versions and duplicates...")
+def load_source(cache_key, _source):
+    """Deduplicated case frame of a DataSource, keyed by its cache_key()"""
+    return _source.read()
+
+def render_server_source():
+    """Sidebar picker of the case files in DSG_DATA_DIR (one file or all of them)"""
+    if not DATA_DIR or not os.path.isdir(DATA_DIR):
+        return
+    directory = ServerDirectorySource(DATA_DIR)
+    files = directory.files()
+    st.subheader("🗄️ Server Files")
+    if not files:
+        st.caption(f"No case files in {DATA_DIR}")
+        return
+    choice = st.selectbox("Case file", ['All files'] + [os.path.basename(f) for f in files], key='server_file')
+    if st.button("📂 Load from Server", use_container_width=True, key='server_load'):
+        source = directory if choice == 'All files' else source_for_path(os.path.join(DATA_DIR, choice))
+        try:
+            df = load_source(source.cache_key(), source)
+        except (OSError, ValueError, ImportError) as exc:
+            st.error(f"Error loading {choice}: {exc}")
+            return
+        st.session_state['df'] = df
+        st.session_state['data_source'] = 'server'
+        st.session_state['source'] = source
+        st.success(f"✅ Loaded {len(df):,} cases from {source.label}")
+        render_merge_report(df)
+
+def render_merge_report(df):
+    """Files merged into the case frame, with the parse wall time against the summed per-file time"""
+    report = df.attrs.get('merge')
+    if not report:
+        return
+    dropped = report['repeated_rows_dropped']
+    overlap = f", {report['overlap']:.1f}× overlap" if report['overlap'] is not None else ''
+    st.caption(
+        f"Merged {len(report['files'])} files into {report['rows']:,} rows"
+        f"{f' ({dropped:,} repeated case versions dropped)' if dropped else ''}: parsed in "
+        f"{report['parallel_parse_seconds']:.1f} s with {report['workers']} process"
+        f"{'es' if report['workers'] > 1 else ''} ({report['summed_file_seconds']:.1f} s summed per-file time{overlap})"
+    )
+    with st.expander("Merged files"):
+        files = pd.DataFrame(report['files'])
+        files['seconds'] = files['seconds'].round(2)
+        st.dataframe(files, hide_index=True, use_container_width=True)
+
+@st.cache_resource
+def metrics_server():
+    """Metrics endpoint shared by all sessions of this process, started on first use (None when the port is taken)"""
+    try:
+        return serve_metrics(REGISTRY, METRICS_PORT, METRICS_HOST)
+    except OSError as exc:
+        logging.getLogger(__name__).warning("metrics endpoint not started on %s:%s: %s", METRICS_HOST, METRICS_PORT, exc)
+        return None
+
+def _session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'unknown'
+
+@contextmanager
+def profiled_rerun(app):
+    """Time the rerun when the profiling panel, DSG_PROFILE_LOG or DSG_METRICS_PORT is on, then draw the panel"""
+    show_panel = st.session_state.get('profile_panel', False)
+    if show_panel or PROFILE_LOG or METRICS_PORT:
+        profile = None
+        try:
+            with profiled(app) as profile:
+                yield
+        finally:
+            if profile is not None:
+                st.session_state.setdefault('profile_history', deque(maxlen=PROFILE_HISTORY)).append(profile)
+                if PROFILE_LOG:
+                    log_profile(profile_logger(PROFILE_LOG), profile)
+                if METRICS_PORT:
+                    metrics_server()
+                    REGISTRY.observe_profile(profile)
+                    REGISTRY.touch_session(_session_id(), app, st.session_state.get('dataset'), len(st.session_state))
+    else:
+        yield
+    render_profile_panel(show_panel)
+
+def render_profile_panel(show_panel):
+    """Sidebar toggle and, when on, a waterfall of the spans of the last reruns"""
+    with st.sidebar:
+        st.markdown("---")
+        st.checkbox("🛠️ Profiling panel", key='profile_panel',
+                    help="Time every stage of each rerun and show the last reruns as a waterfall")
+        if not show_panel:
+            return
+        history = list(st.session_state.get('profile_history', []))
+        if not history:
+            st.caption("Timings appear from the next rerun")
+            return
+        shown = st.number_input("Reruns shown", min_value=1, max_value=PROFILE_HISTORY, value=min(10, PROFILE_HISTORY),
+                                key='profile_reruns')
+        last = history[-1]
+        rss = f"{last.rss_end_mb:,.0f} MB RSS ({last.rss_end_mb - last.rss_start_mb:+.1f} MB)" if last.rss_end_mb else ""
+        st.caption(f"Last rerun: {last.seconds * 1000:,.0f} ms {rss}")
+
+        import altair as alt
+        spans = pd.DataFrame([
+            dict(rerun=f"{p.started:%H:%M:%S.%f}"[:-3], **s)
+            for p in history[-int(shown):] for s in p.spans if s['depth'] == 0
+        ])
+        if len(spans):
+            spans['start_ms'] = spans['start'] * 1000
+            spans['end_ms'] = (spans['start'] + spans['seconds']) * 1000
+            st.altair_chart(
+                alt.Chart(spans).mark_bar().encode(
+                    x=alt.X('start_ms', title='ms'), x2='end_ms',
+                    y=alt.Y('rerun', sort='descending', title=None),
+                    color=alt.Color('name', legend=None),
+                    tooltip=['name', alt.Tooltip('seconds', format='.3f'), 'rss_mb'],
+                ).properties(height=24 * spans['rerun'].nunique() + 40),
+                use_container_width=True
+            )
+
+        detail = pd.DataFrame(last.spans)
+        if len(detail):
+            detail['span'] = ['· ' * d + n for d, n in zip(detail['depth'], detail['name'])]
+            detail['start ms'] = (detail['start'] * 1000).round(1)
+            detail['ms'] = (detail['seconds'] * 1000).round(1)
+            st.dataframe(detail[['span', 'start ms', 'ms', 'rss_mb']], hide_index=True, use_container_width=True)
+
+def reaction_tags(reactions, color=None):
+    """HTML for a list of reaction tags"""
+    style = f' style="background: {color};"' if color else ''
+    return ''.join([f'<span class="reaction-tag"{style}>{r}</span>' for r in reactions])
+
+def render_quality_badge(dataset, position):
+    """Warning badge (with details) when the displayed case failed data-quality checks"""
+    issues = dataset.case_issues(position)
+    if len(issues) == 0:
+        return
+    st.markdown(
+        f'<div class="role-badge" style="background: #fff3cd; color: #856404; border: 1px solid #ffc107;">'
+        f'⚠️ {len(issues)} data-quality issue{"s" if len(issues) > 1 else ""}</div>',
+        unsafe_allow_html=True
+    )
+    with st.expander("Data-quality details", expanded=False):
+        st.caption("List lengths that differ from the drug count are padded with NA on the drug cards, "
+                   "so drug fields may be shown against the wrong drug")
+        st.dataframe(issues.drop(columns='row'), hide_index=True, use_container_width=True)
+
+def _narrative_text(row, col):
+    value = row.get(col)
+    if value is None or pd.isna(value) or str(value).strip() in ['', 'NA']:
+        return None
+    return str(value)
+
+def render_narratives(dataset, row):
+    """Narrative and cleaned narrative with the case's drugs, PTs and indications highlighted"""
+    narrative = _narrative_text(row, 'narrative')
+    clean_narrative = _narrative_text(row, 'narrative_clean')
+    blocks = []
+    if narrative:
+        blocks.append(("📝 Case Narrative", narrative))
+    # Only show the cleaned narrative if it differs from the original
+    if clean_narrative and clean_narrative != str(row.get('narrative', '')):
+        blocks.append(("📋 Cleaned Case Narrative", clean_narrative))
+    if not blocks:
+        return
+
+    automaton = dataset.case_highlighter(dataset.position(row))
+    for title, text in blocks:
+        st.markdown(f'<div class="section-header">{title}</div>', unsafe_allow_html=True)
+        if len(automaton):
+            st.markdown(legend_html(set(automaton.kinds.values())), unsafe_allow_html=True)
+        st.markdown(f"""
+        <div style="background: white; padding: 20px; border-radius: 8px; border: 1px solid #e0e0e0; white-space: pre-wrap; font-family: monospace; font-size: 13px;">
+        {automaton.highlight(text)}
+        </div>
+        """, unsafe_allow_html=True)
+
+def render_version_history(dataset, row):
+    """Version timeline and diff between two versions of the displayed case"""
+    caseid = row.get('caseid', 'NA')
+    rows = dataset.case_versions(caseid)
+    if len(rows) < 2:
+        return
+
+    st.markdown(f'<div class="section-header">🕘 Version History ({len(rows)} versions)</div>', unsafe_allow_html=True)
+
+    timeline = dataset.version_timeline(caseid)
+    current = dataset.position(row)
+    timeline.insert(0, 'shown', np.where(timeline['row'] == current, '👁', ''))
+    st.dataframe(timeline.drop(columns='row'), hide_index=True, use_container_width=True)
+
+    labels = [f"v{v} · {p}" for v, p in zip(timeline['caseversion'], timeline['primaryid'])]
+    cmp_cols = st.columns(2)
+    with cmp_cols[0]:
+        older = st.selectbox("Compare version", range(len(rows)), index=len(rows) - 2,
+                             format_func=labels.__getitem__, key=f"version_a_{caseid}")
+    with cmp_cols[1]:
+        newer = st.selectbox("With version", range(len(rows)), index=len(rows) - 1,
+                             format_func=labels.__getitem__, key=f"version_b_{caseid}")
+    row_a, row_b = rows[older], rows[newer]
+
+    st.markdown("**Changed Fields**")
+    fields = diff_case_fields(dataset.df, row_a, row_b)
+    if len(fields) > 0:
+        st.dataframe(fields, hide_index=True, use_container_width=True)
+    else:
+        st.caption("No field changes between these versions")
+
+    st.markdown("**Reactions**")
+    reactions = diff_lists(dataset.case_reactions(row_a), dataset.case_reactions(row_b))
+    if reactions['added'] or reactions['removed']:
+        html = reaction_tags([f"+ {r}" for r in reactions['added']], '#28a745')
+        html += reaction_tags([f"− {r}" for r in reactions['removed']], '#6c757d')
+        st.markdown(html, unsafe_allow_html=True)
+    else:
+        st.caption("No reaction changes between these versions")
+
+    st.markdown("**Drugs**")
+    drugs = diff_drug_tables(dataset.case_drugs(row_a), dataset.case_drugs(row_b))
+    if len(drugs) > 0:
+        st.dataframe(drugs, hide_index=True, use_container_width=True)
+    else:
+        st.caption("No drug changes between these versions")
+
+EXPORT_DIR = os.environ.get('DSG_EXPORT_DIR', 'exports')
+# Export files older than this many hours are deleted when a new export is built
+EXPORT_MAX_AGE_HOURS = float(os.environ.get('DSG_EXPORT_MAX_AGE_HOURS', '24') or 24)
+
+def _export_path(prefix, ext, previous_key):
+    """New export file path of this session, after deleting its previous export and its stale ones
+
+    File names start with a per-session id, so sessions exporting at the
+    same moment never share a file and only prune their own.
+    """
+    session = st.session_state.setdefault('export_session', uuid.uuid4().hex)
+    previous = st.session_state.pop(previous_key, None)
+    if previous and os.path.exists(previous[0]):
+        os.remove(previous[0])
+    prune_exports(EXPORT_DIR, EXPORT_MAX_AGE_HOURS * 3600, prefix=f'{session}_')
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(EXPORT_DIR, f"{session}_{prefix}_{stamp}{ext}")
+
+def _file_download(path, label, mime, key):
+    """Download button reading the file only when clicked, not on every rerun"""
+    def read():
+        with open(path, 'rb') as fh:
+            return fh.read()
+    st.download_button(label=label, data=read, file_name=os.path.basename(path), mime=mime, key=key)
+
+def render_bulk_export(filtered_df, store=None):
+    """Bulk export of the filtered cases (or of stored assessments) to a file"""
+    with st.expander("📦 Bulk Export", expanded=False):
+        sources = ["Filtered cases"] + (["Assessments"] if store is not None else [])
+        exp_cols = st.columns(2)
+        with exp_cols[0]:
+            source = st.radio("Export", sources, horizontal=True, key="export_source")
+        with exp_cols[1]:
+            fmt = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format")
+
+        use_dates = st.checkbox(
+            "Restrict to a date range" + (" (FDA date)" if source == "Filtered cases" else " (submission date)"),
+            key="export_use_dates"
+        )
+        start = end = None
+        if use_dates:
+            today = datetime.date.today()
+            date_cols = st.columns(2)
+            with date_cols[0]:
+                start = st.date_input("From", value=today - datetime.timedelta(days=30), key="export_start")
+            with date_cols[1]:
+                end = st.date_input("To", value=today, key="export_end")
+
+        assessor = None
+        if source == "Assessments":
+            choice = st.selectbox("Assessor", ['All'] + store.assessors(), key="export_assessor")
+            assessor = None if choice == 'All' else choice
+        else:
+            st.caption(f"{len(filtered_df):,} cases match the current filters")
+
+        if st.button("🛠️ Build Export", key="export_build"):
+            ext, _ = EXPORT_FORMATS[fmt]
+            path = _export_path('cases' if source == 'Filtered cases' else 'assessments', ext, 'export_file')
+            with st.spinner("Writing export..."):
+                if source == "Filtered cases":
+                    positions = None
+                    if use_dates and 'fda_dt' in filtered_df.columns:
+                        positions = date_range_positions(filtered_df['fda_dt'], start, end)
+                    rows = export_chunks(iter_frame_chunks(filtered_df, positions), path, fmt)
+                else:
+                    rows = export_chunks(store.iter_chunks(assessor=assessor, start=start, end=end), path, fmt)
+            st.session_state['export_file'] = (path, fmt, rows)
+
+        if st.session_state.get('export_file'):
+            path, exp_fmt, rows = st.session_state['export_file']
+            if os.path.exists(path):
+                st.success(f"✅ {rows:,} rows written to {path}")
+                _file_download(path, f"📥 Download {exp_fmt}", EXPORT_FORMATS[exp_fmt][1], "export_download")
+
+BROWSE_LABELS = {
+    'primaryid': 'Primary ID', 'caseid': 'Case ID', 'assessor': 'Assessor', 'status': 'Status',
+    'suspect_drug': 'Suspect Drug', 'first_pt': 'First PT', 'fda_dt': 'FDA Date',
+}
+
+def _open_browsed_case():
+    """Selection callback of the browse grid: put the clicked primaryid in the Primary ID search box"""
+    rows = st.session_state['browse_grid'].selection.rows
+    ids = st.session_state.get('browse_page_ids', [])
+    if rows and rows[0] < len(ids):
+        st.session_state['search_primary'] = str(ids[rows[0]])
+        st.session_state['search_case'] = ''
+
+def render_case_browser(dataset, filtered_df):
+    """Sorted, paged grid of the filtered cases; only the rows of the shown page are built and sent"""
+    columns = [c for c in BROWSE_COLUMNS if c in dataset.browse_table.columns]
+    st.markdown("**Browse cases** (click a row to open it)")
+    controls = st.columns([2, 1, 1, 1])
+    with controls[0]:
+        sort_by = st.selectbox("Sort by", columns, index=columns.index('fda_dt') if 'fda_dt' in columns else 0,
+                               format_func=lambda c: BROWSE_LABELS.get(c, c), key="browse_sort")
+    with controls[1]:
+        descending = st.toggle("Descending", value=True, key="browse_desc")
+    with controls[2]:
+        size = st.selectbox("Rows per page", PAGE_SIZES, key="browse_size")
+
+    allowed = None if len(filtered_df) == len(dataset.df) else dataset.df.index.isin(filtered_df.index)
+    total = len(filtered_df)
+    pages = max(1, -(-total // size))
+    # A new sort or filter starts again from the first page
+    signature = (sort_by, descending, size, total, filtered_df.index[:1].tolist())
+    if st.session_state.get('browse_signature') != signature:
+        st.session_state['browse_signature'] = signature
+        st.session_state['browse_page'] = 1
+    with controls[3]:
+        page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key="browse_page")
+
+    rows, total = dataset.browse_page(sort_by, descending, allowed, (page - 1) * size, size)
+    st.session_state['browse_page_ids'] = rows['primaryid'].tolist() if 'primaryid' in rows.columns else []
+    view = rows[columns].copy()
+    if 'fda_dt' in view.columns:
+        view['fda_dt'] = view['fda_dt'].map(format_date_std)
+    start = (page - 1) * size
+    st.caption(f"Cases {min(start + 1, total):,}–{min(start + size, total):,} of {total:,}")
+    st.dataframe(view.rename(columns=BROWSE_LABELS), hide_index=True, use_container_width=True,
+                 on_select=_open_browsed_case, selection_mode="single-row", key="browse_grid")
+
+def render_signal_view(dataset):
+    """Disproportionality table (PRR, ROR, IC, EBGM) for all drug-PT pairs"""
+    st.markdown('<div class="section-header">📈 Signal Detection</div>', unsafe_allow_html=True)
+    st.caption("Disproportionality over the latest version of every case. "
+               "Flags: PRR ≥ 2 with χ² ≥ 4 and n ≥ 3; ROR lower 95% bound > 1 with n ≥ 3; IC025 > 0; EB05 ≥ 2.")
+
+    sig_cols = st.columns(4)
+    with sig_cols[0]:
+        drug_field = st.radio("Drug by", ['drug_name', 'product_ai'], horizontal=True,
+                              format_func={'drug_name': 'Drug name', 'product_ai': 'Active ingredient'}.get)
+    with sig_cols[1]:
+        suspect_only = st.checkbox("Suspect drugs only (PS/SS/I)", value=True)
+    with sig_cols[2]:
+        min_count = st.number_input("Minimum cases (n)", min_value=1, value=3)
+    with sig_cols[3]:
+        sort_by = st.selectbox("Sort by", ['ic025', 'eb05', 'prr', 'ror_lower', 'a'])
+
+    with st.spinner("Computing disproportionality..."):
+        signals = dataset.signals(drug_field, suspect_only)
+    scores = signals.scores
+    if signals.last_update:
+        update = signals.last_update
+        st.caption(f"Updated incrementally for the added files: {update['rescored']:,} of {update['pairs']:,} pairs "
+                   f"rescored in {update['seconds']:.2f} s" + (" (full rescore)" if update['full_rescore'] else ""))
+
+    filter_cols = st.columns(3)
+    with filter_cols[0]:
+        drug_query = st.text_input("Filter drug", placeholder="e.g. ERIVEDGE")
+    with filter_cols[1]:
+        pt_query = st.text_input("Filter PT", placeholder="e.g. Alopecia")
+    with filter_cols[2]:
+        signals_only = st.checkbox("Flagged pairs only", value=False)
+
+    table = scores[scores['a'] >= min_count]
+    if drug_query:
+        table = table[table['drug'].str.contains(drug_query.strip().upper(), regex=False)]
+    if pt_query:
+        table = table[table['pt'].str.contains(pt_query.strip(), case=False, regex=False)]
+    flags = flag_signals(table)
+    if signals_only:
+        table, flags = table[flags.any(axis=1)], flags[flags.any(axis=1)]
+
+    st.metric("Drug-PT pairs", f"{len(table):,}")
+    top = table.join(flags).sort_values(sort_by, ascending=False).head(500)
+    st.dataframe(top.round(3), hide_index=True, use_container_width=True)
+
+OVERVIEW_CASE_COLUMNS = ['primaryid', 'caseid', 'caseversion', 'fda_dt', 'occr_country', 'sex', 'age_grp', 'rept_cod', 'pt']
+
+def render_overview(dataset):
+    """Case counts pivoted over any two dimensions, with drill-down filters"""
+    st.markdown('<div class="section-header">📊 Overview</div>', unsafe_allow_html=True)
+    with st.spinner("Building overview counts..."):
+        cube = dataset.cube
+
+    filters = st.session_state.setdefault('cube_filters', {})
+    if filters:
+        crumbs = ' › '.join(f"{CUBE_DIMENSIONS[d]} = {', '.join(v)}" for d, v in filters.items())
+        crumb_cols = st.columns([4, 1])
+        with crumb_cols[0]:
+            st.markdown(f"**Drill-down:** {crumbs}")
+        with crumb_cols[1]:
+            if st.button("↩️ Reset", key="cube_reset"):
+                filters.clear()
+                st.rerun()
+
+    dims = list(CUBE_DIMENSIONS)
+    pivot_cols = st.columns(3)
+    with pivot_cols[0]:
+        row_dim = st.selectbox("Rows", dims, index=dims.index('quarter'),
+                               format_func=CUBE_DIMENSIONS.get, key="cube_rows")
+    with pivot_cols[1]:
+        col_choices = [d for d in dims if d != row_dim]
+        col_dim = st.selectbox("Columns", col_choices, index=col_choices.index('sex') if 'sex' in col_choices else 0,
+                               format_func=CUBE_DIMENSIONS.get, key="cube_cols")
+    with pivot_cols[2]:
+        top = st.slider("Top values per dimension", 5, 50, 20, key="cube_top")
+
+    start = time.perf_counter()
+    table = cube.pivot(row_dim, col_dim, filters, top=top)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    matching = cube.case_rows(filters)
+    metric_cols = st.columns(2)
+    with metric_cols[0]:
+        st.metric("Matching cases", f"{len(matching):,}")
+    with metric_cols[1]:
+        st.metric("Cases in dataset (latest versions)", f"{len(cube):,}")
+    st.caption(f"{CUBE_DIMENSIONS[row_dim]} × {CUBE_DIMENSIONS[col_dim]} computed in {elapsed:.1f} ms"
+               + (" · counts along PT are case-PT pairs" if 'pt' in (row_dim, col_dim) else ""))
+    st.dataframe(table.assign(Total=table.sum(axis=1)), use_container_width=True)
+
+    drill_cols = st.columns([2, 2, 1])
+    with drill_cols[0]:
+        drill_dim = st.radio("Drill into", [row_dim, col_dim], horizontal=True,
+                             format_func=CUBE_DIMENSIONS.get, key="cube_drill_dim")
+    with drill_cols[1]:
+        names = table.index if drill_dim == row_dim else table.columns
+        value = st.selectbox("Value", [n for n in names if n != OTHER], key="cube_drill_value")
+    with drill_cols[2]:
+        st.write("")
+        if st.button("🔎 Drill down", key="cube_drill") and value is not None:
+            filters[drill_dim] = [value]
+            st.rerun()
+
+    with st.expander("🩺 Data Quality", expanded=False):
+        issues = dataset.quality
+        st.caption(f"{issues['row'].nunique():,} of {len(dataset.df):,} rows have at least one issue")
+        if len(issues) > 0:
+            st.dataframe(issue_summary(issues), hide_index=True, use_container_width=True)
+
+    with st.expander(f"📋 Matching cases ({len(matching):,})", expanded=False):
+        columns = [c for c in OVERVIEW_CASE_COLUMNS if c in dataset.df.columns]
+        st.dataframe(dataset.df.iloc[matching[:500]][columns], hide_index=True, use_container_width=True)
+        if len(matching) > 500:
+            st.caption("Showing the first 500 cases")
+
+def render_onset_distributions(dataset, position):
+    """Dataset-wide time-to-onset distribution of the suspect drugs of the displayed case"""
+    drugs = dataset.case_drugs(position)
+    names = drugs.loc[drugs['role_code'].isin(['PS', 'SS', 'I']), 'drug_name'].astype('string').str.strip().str.upper()
+    names = [n for n in names.dropna().unique() if n != 'NA']
+    if not names:
+        return
+
+    with st.expander("⏱️ Time to Onset Across the Dataset", expanded=False):
+        with st.spinner("Computing time-to-onset distributions..."):
+            table = dataset.memo(
+                ('onset_distribution', 'drug_name'),
+                lambda: onset_distribution(dataset.drug_table, dataset.onset,
+                                           rows=np.flatnonzero(latest_version_mask(dataset.df).to_numpy()))
+            )
+        table = table[table['drug'].isin(names)]
+        st.caption("Suspect drugs of this case, over the latest version of every case with an onset "
+                   "known at least to the month (midpoint of the possible range)")
+        if len(table) == 0:
+            st.info("No dated onsets for these drugs in the dataset")
+            return
+        st.dataframe(table.round(1), hide_index=True, use_container_width=True)
+        drug = st.selectbox("Distribution of", table['drug'].tolist(), key=f"onset_drug_{position}")
+        bins = table.set_index('drug').loc[drug, ONSET_BIN_LABELS].astype(int)
+        st.bar_chart(bins.rename('cases'))
+
+def render_network_view(dataset):
+    """Drug pairs co-reported in the same cases, the PTs reported with each pair, and network export"""
+    st.markdown('<div class="section-header">🕸️ Drug Co-reporting Network</div>', unsafe_allow_html=True)
+    st.caption("Pairs of drugs reported in the same case, over the latest version of every case. "
+               "Ratio: observed over expected co-reporting; interacting: cases where either drug is coded I.")
+
+    net_cols = st.columns(3)
+    with net_cols[0]:
+        drug_field = st.radio("Drug by", ['drug_name', 'product_ai'], horizontal=True, key="net_field",
+                              format_func={'drug_name': 'Drug name', 'product_ai': 'Active ingredient'}.get)
+    with net_cols[1]:
+        suspect_only = st.checkbox("Suspect drugs only (PS/SS/I)", value=False, key="net_suspect")
+    with net_cols[2]:
+        min_count = st.number_input("Minimum co-reports", min_value=1, value=3, key="net_min")
+
+    with st.spinner("Counting co-reported drug pairs..."):
+        network = dataset.memo(('network', drug_field, suspect_only),
+                               lambda: DrugNetwork.from_dataset(dataset, drug_field, suspect_only))
+        pairs = dataset.memo(('network_pairs', drug_field, suspect_only, min_count),
+                             lambda: network.pairs(min_count))
+
+    filter_cols = st.columns(2)
+    with filter_cols[0]:
+        drug_query = st.text_input("Filter drug", placeholder="e.g. ERIVEDGE", key="net_query")
+    with filter_cols[1]:
+        interacting_only = st.checkbox("Pairs with an interacting (I) drug only", value=False, key="net_interacting")
+
+    table = pairs
+    if drug_query:
+        query = drug_query.strip().upper()
+        table = table[table['drug_a'].str.contains(query, regex=False) | table['drug_b'].str.contains(query, regex=False)]
+    if interacting_only:
+        table = table[table['n_interacting'] > 0]
+
+    st.metric("Drug pairs", f"{len(table):,}")
+    st.dataframe(table.head(500).round(3), hide_index=True, use_container_width=True)
+
+    if len(table) > 0:
+        st.markdown("**Reactions Reported with a Pair**")
+        top = table.head(200)
+        labels = [f"{a} + {b} ({n})" for a, b, n in zip(top['drug_a'], top['drug_b'], top['n_cases'])]
+        choice = st.selectbox("Pair", range(len(top)), format_func=labels.__getitem__, key="net_pair")
+        triplets = network.triplets(top.iloc[[choice]])
+        st.caption("Ratio vs single: PT rate with the pair over the higher of its rates with either drug alone")
+        st.dataframe(triplets.drop(columns=['drug_a', 'drug_b']).round(3), hide_index=True, use_container_width=True)
+
+    export_cols = st.columns(2)
+    with export_cols[0]:
+        fmt = st.selectbox("Network format", list(NETWORK_FORMATS), key="net_format")
+    with export_cols[1]:
+        st.write("")
+        if st.button("🛠️ Export Network", key="net_export"):
+            ext, _ = NETWORK_FORMATS[fmt]
+            path = _export_path('drug_network', ext, 'network_file')
+            edges = export_network(table, path, fmt)
+            st.session_state['network_file'] = (path, fmt, edges)
+
+    if st.session_state.get('network_file'):
+        path, net_fmt, edges = st.session_state['network_file']
+        if os.path.exists(path):
+            st.success(f"✅ {edges:,} edges written to {path}")
+            _file_download(path, f"📥 Download {net_fmt}", NETWORK_FORMATS[net_fmt][1], "net_download")
+
+DIFF_STYLE = 'background-color: #fff3cd'
+
+def _comparison_table(table, only_differences):
+    """Aligned comparison table with the lines on which the cases differ highlighted"""
+    if only_differences:
+        table = table[table['differs']]
+    if len(table) == 0:
+        st.caption("No differences" if only_differences else "Nothing reported")
+        return
+    table = table.reset_index(drop=True)
+    differs = table.pop('differs').to_numpy()
+    styled = table.style.apply(lambda line: [DIFF_STYLE if differs[line.name] else ''] * len(line), axis=1)
+    st.dataframe(styled, hide_index=True, use_container_width=True)
+
+def render_compare_view(dataset):
+    """Two to four cases side by side: demographics, reactions and suspect drugs, differences highlighted"""
+    st.markdown('<div class="section-header">🆚 Compare Cases</div>', unsafe_allow_html=True)
+    text = st.text_input("Primary IDs", placeholder="e.g. 102854963, 102854971",
+                         help=f"{COMPARE_MIN} to {COMPARE_MAX} Primary IDs, separated by commas or spaces",
+                         key="compare_ids")
+    only_differences = st.checkbox("Show only differences", value=False, key="compare_diff_only")
+    ids = parse_primaryids(text)
+    if len(ids) < COMPARE_MIN:
+        st.info(f"👆 Enter {COMPARE_MIN} to {COMPARE_MAX} Primary IDs to compare")
+        return
+    if len(ids) > COMPARE_MAX:
+        st.warning(f"⚠️ Comparing the first {COMPARE_MAX} of {len(ids)} Primary IDs")
+        ids = ids[:COMPARE_MAX]
+
+    positions = dataset.primaryid_positions(ids)
+    missing = [pid for pid, pos in zip(ids, positions) if pos < 0]
+    if missing:
+        st.error(f"❌ No case found with Primary ID: {', '.join(missing)}")
+    found = [(pid, pos) for pid, pos in zip(ids, positions) if pos >= 0]
+    if len(found) < COMPARE_MIN:
+        return
+    labels, positions = [pid for pid, _ in found], [pos for _, pos in found]
+
+    st.markdown("**Demographics**")
+    _comparison_table(compare_fields(dataset.df, positions, labels), only_differences)
+    st.markdown("**Reactions**")
+    _comparison_table(compare_reactions([dataset.case_reactions(p) for p in positions], labels), only_differences)
+    st.markdown("**Suspect Drugs** (role · dose · route)")
+    _comparison_table(compare_suspect_drugs([dataset.case_drugs(p) for p in positions], labels), only_differences)
+
+def render_assignment_view(dataset):
+    """Deal the unassigned cases to a roster, balanced on effort, and write assessor/date_assignement back"""
+    st.markdown('<div class="section-header">🗂️ Assign Cases</div>', unsafe_allow_html=True)
+    st.caption("Unassigned cases are dealt to the roster largest first, each to the assessor with the least open "
+               "effort (drugs, suspect drugs and narrative length). Existing assignments are kept, and new "
+               "versions of a case go to the assessor who already holds it.")
+    df = dataset.df
+    unassigned = unassigned_mask(df)
+    metric_cols = st.columns(3)
+    metric_cols[0].metric("Case rows", f"{len(df):,}")
+    metric_cols[1].metric("Unassigned rows", f"{int(unassigned.sum()):,}")
+    if 'caseid' in df.columns:
+        metric_cols[2].metric("Unassigned case IDs", f"{df.loc[unassigned, 'caseid'].nunique():,}")
+
+    current = []
+    if 'assessor' in df.columns:
+        current = sorted(df.loc[~unassigned, 'assessor'].astype(str).str.strip().unique().tolist())
+    roster = st.text_area("Roster (one assessor per line)", value='\n'.join(current), key="assign_roster")
+    opt_cols = st.columns(2)
+    with opt_cols[0]:
+        day = st.date_input("Assignment date", value=datetime.date.today(), key="assign_date")
+    with opt_cols[1]:
+        st.write("")  # Spacing
+        count_open = st.checkbox("Count the open cases assessors already hold", value=True, key="assign_count_open")
+
+    if st.button("🧮 Plan Assignment", key="assign_plan"):
+        start = time.perf_counter()
+        try:
+            plan, summary = plan_assignment(df, dataset.effort, roster.splitlines(), count_open)
+        except ValueError as exc:
+            st.error(f"❌ {exc}")
+            return
+        st.session_state['assignment_plan'] = {
+            'df': df, 'plan': plan, 'summary': summary,
+            'date': day.strftime(ASSIGNMENT_DATE_FORMAT), 'seconds': time.perf_counter() - start,
+        }
+
+    if st.session_state.get('assignment_done'):
+        st.success(st.session_state.pop('assignment_done'))
+    planned = st.session_state.get('assignment_plan')
+    if not planned or planned['df'] is not df:
+        return
+    plan, summary = planned['plan'], planned['summary']
+    st.caption(f"{len(plan):,} rows ({plan['caseid'].nunique():,} case IDs) planned in {planned['seconds']:.2f} s, "
+               f"dated {planned['date']}")
+    st.dataframe(summary.round(1), hide_index=True, use_container_width=True)
+    with st.expander("Planned rows"):
+        st.dataframe(plan.drop(columns='row').head(1000).round(2), hide_index=True, use_container_width=True)
+    if len(plan) == 0:
+        return
+
+    updates = assignment_updates(df, plan, planned['date'], ('primaryid', SOURCE_COLUMN))
+    source = st.session_state.get('source')
+    if source is not None and source.writable():
+        if st.button(f"✅ Apply and write to {source.label}", key="assign_apply"):
+            try:
+                with st.spinner("Writing assignments..."):
+                    written = source.write_fields(updates)
+            except Exception as exc:
+                st.error(f"❌ Write-back failed: {exc}")
+                return
+            st.session_state['df'] = apply_assignment(df, plan, planned['date'])
+            del st.session_state['assignment_plan']
+            st.session_state['assignment_done'] = f"✅ {written:,} rows assigned and written to {source.label}"
+            st.rerun()
+    else:
+        st.info("ℹ️ The loaded data is read-only here (uploaded files): download the assignments and "
+                "paste them into the sheet")
+        st.download_button(
+            label="📥 Download assignments (CSV)",
+            data=updates.drop(columns=SOURCE_COLUMN, errors='ignore').to_csv(index=False).encode('utf-8'),
+            file_name=f"assignments_{planned['date']}.csv",
+            mime="text/csv",
+            key="assign_download"
+        )
@@ -1,8 +1,17 @@
 import streamlit as st
-import pandas as pd
-from io import StringIO
-import gspread
-from google.oauth2.service_account import Credentials
+
+from dsgcore.fields import get_role_class, get_role_label
+from dsgcore.timing import format_exposure, format_onset
+from dsgcore.dedup import latest_version_mask
+from dsgcore.loaders import UPLOAD_TYPES, load_google_sheet, load_sample_data, open_sheet_writer, read_case_files
+from dsgcore.packed import parse_separated_values, process_drug_data
+from dsgcore.profiling import checkpoint
+from dsgcore.sources import GoogleSheetSource
+from dsgviews import (VIEWS, VIEW_ASSIGN, VIEW_COMPARE, VIEW_NETWORK, VIEW_OVERVIEW, VIEW_SIGNALS, get_dataset,
+                      load_uploads, render_assignment_view, render_bulk_export, render_case_browser,
+                      render_compare_view, render_merge_report, render_network_view, render_onset_distributions,
+                      render_overview, render_quality_badge, render_narratives, render_server_source,
+                      render_signal_view, render_version_history, profiled_rerun)
 
 # Page config
 st.set_page_config(
@@ -106,114 +115,47 @@ def load_data_from_google_sheets(sheet_url):
     try:
         # Try to use Streamlit secrets (for cloud deployment)
         if "gcp_service_account" in st.secrets:
-            credentials = Credentials.from_service_account_info(
-                st.secrets["gcp_service_account"],
-                scopes=[
-                    "https://www.googleapis.com/auth/spreadsheets.readonly",
-                    "https://www.googleapis.com/auth/drive.readonly"
-                ]
-            )
-            gc = gspread.authorize(credentials)
-        else:
-            # Fall back to user authentication (for local development)
-            st.error("⚠️ Google Sheets credentials not configured. Please set up service account.")
-            return None
-        
-        # Open the sheet
-        sheet = gc.open_by_url(sheet_url)
-        worksheet = sheet.get_worksheet(0)  # Get first worksheet
-        
-        # Get all data
-        data = worksheet.get_all_records()
-        df = pd.DataFrame(data)
-        
-        return df
+            return load_google_sheet(sheet_url, st.secrets["gcp_service_account"])
+        # Fall back to user authentication (for local development)
+        st.error("⚠️ Google Sheets credentials not configured. Please set up service account.")
+        return None
     except Exception as e:
         st.error(f"Error loading from Google Sheets: {str(e)}")
         return None
 
-def parse_separated_values(value):
-    """Parse semicolon-separated values"""
-    if pd.isna(value) or value == '' or value == 'NA':
-        return []
-    return [v.strip() for v in str(value).split(';')]
+# Shared DataFrame per file, so the indexes built on it survive reruns
+@st.cache_resource(show_spinner="Resolving case versions and duplicates...")
+def load_uploaded_files(files):
+    """Read uploaded (name, bytes) case files, merging several, and run the ingest stage"""
+    return read_case_files(files)
 
-def get_role_label(code):
-    """Get full label for role code"""
-    labels = {
-        'PS': 'Primary Suspect',
-        'SS': 'Secondary Suspect',
-        'C': 'Concomitant',
-        'I': 'Interacting'
-    }
-    return labels.get(code, code)
-
-def get_role_class(code):
-    """Get CSS class for role code"""
-    if code == 'PS':
-        return 'ps'
-    elif code == 'SS':
-        return 'ss'
-    else:
-        return 'c'
+@st.cache_resource
+def get_sheet_writer(sheet_url):
+    """Background write-back queue for the first worksheet of a Google Sheet"""
+    if "gcp_service_account" not in st.secrets:
+        return None
+    return open_sheet_writer(sheet_url, st.secrets["gcp_service_account"])
 
-def process_drug_data(row):
-    """Process and structure drug data from a row"""
-    sequences = parse_separated_values(row.get('drug_seq', ''))
-    role_codes = parse_separated_values(row.get('role_cod', ''))
-    drug_names = parse_separated_values(row.get('drugname', ''))
-    product_ai = parse_separated_values(row.get('prod_ai', ''))
-    routes = parse_separated_values(row.get('route', ''))
-    dose_amts = parse_separated_values(row.get('dose_amt', ''))
-    dose_units = parse_separated_values(row.get('dose_unit', ''))
-    dose_forms = parse_separated_values(row.get('dose_form', ''))
-    dose_freqs = parse_separated_values(row.get('dose_freq', ''))
-    indications = parse_separated_values(row.get('indi_pt', ''))
-    start_dates = parse_separated_values(row.get('start_dt', ''))
-    end_dates = parse_separated_values(row.get('end_dt', ''))
-    dechals = parse_separated_values(row.get('dechal', ''))
-    rechals = parse_separated_values(row.get('rechal', ''))
-    lot_nums = parse_separated_values(row.get('lot_num', ''))
-    
-    # Additional fields
-    val_vbms = parse_separated_values(row.get('val_vbm', ''))
-    dose_vbms = parse_separated_values(row.get('dose_vbm', ''))
-    cum_dose_chrs = parse_separated_values(row.get('cum_dose_chr', ''))
-    cum_dose_units = parse_separated_values(row.get('cum_dose_unit', ''))
-    exp_dts = parse_separated_values(row.get('exp_dt', ''))
-    nda_nums = parse_separated_values(row.get('nda_num', ''))
-    durs = parse_separated_values(row.get('dur', ''))
-    dur_cods = parse_separated_values(row.get('dur_cod', ''))
-    
-    drugs = []
-    for i in range(len(sequences)):
-        drugs.append({
-            'sequence': sequences[i] if i < len(sequences) else 'NA',
-            'role_code': role_codes[i] if i < len(role_codes) else 'NA',
-            'drug_name': drug_names[i] if i < len(drug_names) else 'NA',
-            'product_ai': product_ai[i] if i < len(product_ai) else 'NA',
-            'route': routes[i] if i < len(routes) else 'NA',
-            'dose_amount': dose_amts[i] if i < len(dose_amts) else 'NA',
-            'dose_unit': dose_units[i] if i < len(dose_units) else 'NA',
-            'dose_form': dose_forms[i] if i < len(dose_forms) else 'NA',
-            'dose_frequency': dose_freqs[i] if i < len(dose_freqs) else 'NA',
-            'indication': indications[i] if i < len(indications) else 'NA',
-            'start_date': start_dates[i] if i < len(start_dates) else 'NA',
-            'end_date': end_dates[i] if i < len(end_dates) else 'NA',
-            'dechallenge': dechals[i] if i < len(dechals) else 'NA',
-            'rechallenge': rechals[i] if i < len(rechals) else 'NA',
-            'lot_number': lot_nums[i] if i < len(lot_nums) else 'NA',
-            'val_vbm': val_vbms[i] if i < len(val_vbms) else 'NA',
-            'dose_vbm': dose_vbms[i] if i < len(dose_vbms) else 'NA',
-            'cum_dose_chr': cum_dose_chrs[i] if i < len(cum_dose_chrs) else 'NA',
-            'cum_dose_unit': cum_dose_units[i] if i < len(cum_dose_units) else 'NA',
-            'exp_dt': exp_dts[i] if i < len(exp_dts) else 'NA',
-            'nda_num': nda_nums[i] if i < len(nda_nums) else 'NA',
-            'duration': durs[i] if i < len(durs) else 'NA',
-            'duration_code': dur_cods[i] if i < len(dur_cods) else 'NA'
-        })
-    
-    return drugs
+def render_status_update(row):
+    """Queue status/assessor edits of the displayed case for write-back to the sheet"""
+    writer = get_sheet_writer(st.session_state['sheet_url'])
+    if writer is None:
+        return
+    with st.form(f"status_update_{row.get('primaryid', '')}"):
+        upd_cols = st.columns([2, 2, 1])
+        with upd_cols[0]:
+            new_status = st.text_input("Status", value=str(row.get('status', '') or ''))
+        with upd_cols[1]:
+            new_assessor = st.text_input("Assessor", value=str(row.get('assessor', '') or ''))
+        with upd_cols[2]:
+            st.write("")  # Spacing
+            queued = st.form_submit_button("💾 Save to Sheet", use_container_width=True)
+    if queued:
+        writer.set_fields(row.get('primaryid'), status=new_status, assessor=new_assessor)
+        writer.request_flush()
+        st.success("✅ Update queued; it is written to the sheet in the background")
+    if writer.last_error:
+        st.warning(f"⚠️ Sheet write-back failed ({writer.pending()} edits queued for retry): {writer.last_error}")
 
 def display_field(label, value, col=None):
     """Display a labeled field"""
@@ -221,18 +163,12 @@ def display_field(label, value, col=None):
     container.markdown(f'<div class="field-label">{label}</div>', unsafe_allow_html=True)
     container.markdown(f'<div class="field-value">{value if value else "NA"}</div>', unsafe_allow_html=True)
 
-def load_sample_data():
-    """Load sample data"""
-    sample_csv = """date_assignement,assessor,status,primaryid,caseid,drug_seq,role_cod,drugname,prod_ai,val_vbm,route,dose_vbm,cum_dose_chr,cum_dose_unit,dechal,rechal,lot_num,exp_dt,nda_num,dose_amt,dose_unit,dose_form,dose_freq,start_dt,end_dt,dur,dur_cod,caseversion,i_f_code,event_dt,mfr_dt,init_fda_dt,fda_dt,rept_cod,auth_num,mfr_num,mfr_sndr,lit_ref,age,age_cod,age_grp,sex,e_sub,wt,wt_cod,rept_dt,to_mfr,occp_cod,reporter_country,occr_country,pt,indi_pt
-06-01-2026,Lorrie,,102854963,10285496,1 ; 4 ; 2 ; 5 ; 7 ; 3 ; 6,PS ; SS ; SS ; SS ; C ; SS ; C,ERIVEDGE ; ERIVEDGE ; ERIVEDGE ; ERIVEDGE ; DILTIAZEM ; ERIVEDGE ; LISINOPRIL,ERIVEDGE ; ERIVEDGE ; ERIVEDGE ; ERIVEDGE ; DILTIAZEM ; ERIVEDGE ; LISINOPRIL,1 ; 1 ; 1 ; 1 ; 1 ; 1 ; 1,Other ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,Y ; Y ; Y ; Y ; NA ; Y ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,50242-0140-01 ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,15000 ; NA ; NA ; NA ; NA ; NA ; NA,MG ; NA ; NA ; NA ; NA ; NA ; NA,Capsule ; NA ; NA ; NA ; NA ; NA ; NA,QD ; NA ; NA ; NA ; NA ; NA ; NA,2008 ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,NA ; NA ; NA ; NA ; NA ; NA ; NA,3,F,20080101,20250116,20140709,20250128,EXP,,US-ROCHE-1428166,ROCHE,,58,YR,A,M,Y,,,20250128,,CN,US,US,Mood swings ; Upper limb fracture ; Alopecia ; Basal cell carcinoma ; Arthropathy ; Vitamin D deficiency ; Impaired healing ; Fall ; Gastrointestinal disorder ; Weight decreased,Basal cell carcinoma ; Basal cell carcinoma ; Basal cell naevus syndrome ; Basal cell carcinoma ; Basal cell carcinoma ; Basal cell carcinoma ; Hypertension ; Hypertension"""
-    
-    return pd.read_csv(StringIO(sample_csv))
-
 # Main app
 def main():
     st.title("💊 FDA Adverse Event Case Viewer")
     st.markdown("### Professional Assessment Interface")
     
+    checkpoint('sidebar')
     # Sidebar
     with st.sidebar:
         st.header("📁 Data Source")
@@ -255,6 +191,9 @@ def main():
                 if df is not None:
                     st.session_state['df'] = df
                     st.session_state['data_source'] = 'google_sheets'
+                    st.session_state['sheet_url'] = sheet_url
+                    st.session_state['source'] = GoogleSheetSource(sheet_url, st.secrets["gcp_service_account"],
+                                                                   writer=get_sheet_writer(sheet_url))
                     st.success(f"✅ Loaded {len(df):,} cases from Google Sheets!")
                     st.rerun()
         
@@ -263,21 +202,29 @@ def main():
         # File upload option
         st.subheader("📤 Option 2: Upload File")
         
-        uploaded_file = st.file_uploader(
-            "Upload CSV/TSV file",
-            type=['csv', 'tsv', 'txt'],
-            help="Export from Google Sheets as CSV or TSV"
+        uploaded_files = st.file_uploader(
+            "Upload case file(s)",
+            type=UPLOAD_TYPES,
+            accept_multiple_files=True,
+            help="Export from Google Sheets as CSV or TSV; several files (e.g. FAERS quarters) are merged"
         )
         
+        render_server_source()
+        
         st.markdown("---")
         
         # Load sample data button
         if st.button("📋 Load Sample Case", use_container_width=True):
             st.session_state['df'] = load_sample_data()
+            st.session_state.pop('source', None)
             st.success("Sample data loaded!")
         
         st.markdown("---")
         
+        view = st.radio("🧭 View", VIEWS)
+        
+        st.markdown("---")
+        
         # Instructions
         with st.expander("📖 How to Use"):
             st.markdown("""
@@ -286,6 +233,7 @@ def main():
             2. **Click "Load from Google Sheets"**
             3. **Search by Primary ID or Case ID**
             4. Data refreshes automatically every 10 minutes
+            5. **Save to Sheet** writes status/assessor edits back in the background
             
             **Option 2: Manual Upload**
             1. **Export from Google Sheets** as CSV/TSV
@@ -320,14 +268,13 @@ def main():
             Created for clinical assessors to efficiently review adverse event reports.
             """)
     
+    checkpoint('load')
     # Load data from file upload
-    if uploaded_file:
+    if uploaded_files:
         try:
-            if uploaded_file.name.endswith('.tsv') or uploaded_file.name.endswith('.txt'):
-                df = pd.read_csv(uploaded_file, sep='\t')
-            else:
-                df = pd.read_csv(uploaded_file)
+            df = load_uploads(tuple((f.name, f.getvalue()) for f in uploaded_files), load_uploaded_files)
             st.session_state['df'] = df
+            st.session_state.pop('source', None)
             st.session_state['data_source'] = 'file_upload'
             
             # Show dataset statistics
@@ -345,6 +292,7 @@ def main():
                 st.metric("Assessors", f"{assessors:,}")
             
             st.success(f"✅ Data loaded successfully!")
+            render_merge_report(df)
         except Exception as e:
             st.error(f"Error loading file: {str(e)}")
             return
@@ -354,7 +302,26 @@ def main():
         st.info("👆 Please load data from Google Sheets or upload a file from the sidebar")
         return
     
+    checkpoint('dataset')
     df = st.session_state['df']
+    dataset = get_dataset()
+    checkpoint(view)
+    
+    if view == VIEW_COMPARE:
+        render_compare_view(dataset)
+        return
+    if view == VIEW_OVERVIEW:
+        render_overview(dataset)
+        return
+    if view == VIEW_SIGNALS:
+        render_signal_view(dataset)
+        return
+    if view == VIEW_NETWORK:
+        render_network_view(dataset)
+        return
+    if view == VIEW_ASSIGN:
+        render_assignment_view(dataset)
+        return
     
     # Show dataset statistics if loaded from Google Sheets
     if st.session_state.get('data_source') == 'google_sheets':
@@ -403,14 +370,16 @@ def main():
         search_primary = st.text_input(
             "🔍 Search by Primary ID",
             placeholder="Enter Primary ID (e.g., 102854963)",
-            help="Enter the Primary ID to find a specific case"
+            help="Enter the Primary ID to find a specific case",
+            key="search_primary"
         )
     
     with col2:
         search_case = st.text_input(
             "🔍 Search by Case ID",
             placeholder="Enter Case ID (e.g., 10285496)",
-            help="Enter the Case ID to find a specific case"
+            help="Enter the Case ID to find a specific case",
+            key="search_case"
         )
     
     with col3:
@@ -418,6 +387,7 @@ def main():
         st.write("")  # Spacing
         search_button = st.button("🔎 Search", use_container_width=True)
     
+    checkpoint('filter')
     # Search logic
     row = None
     filtered_df = df.copy()
@@ -428,6 +398,10 @@ def main():
     if 'search_country' in locals() and search_country != 'All':
         filtered_df = filtered_df[filtered_df['occr_country'] == search_country]
     
+    checkpoint('bulk export')
+    render_bulk_export(filtered_df)
+    
+    checkpoint('id search')
     if search_button or search_primary or search_case:
         if search_primary:
             # Search by primary ID
@@ -451,10 +425,11 @@ def main():
             matches = filtered_df[mask]
             
             if len(matches) > 0:
-                row = matches.iloc[0]
+                # Several rows share a caseid when the file holds follow-up versions
+                row = matches[latest_version_mask(matches)].iloc[0]
                 st.success(f"✅ Found case with Case ID: {search_case}")
                 if len(matches) > 1:
-                    st.info(f"ℹ️ Found {len(matches)} matching cases. Showing first result.")
+                    st.info(f"ℹ️ Found {len(matches)} versions of this case. Showing latest version ({row.get('caseversion', 'NA')}).")
             else:
                 st.error(f"❌ No case found with Case ID: {search_case}")
                 if len(filtered_df) < len(df):
@@ -465,19 +440,18 @@ def main():
             return
     else:
         # Show prompt to search
-        st.info("👆 Enter a Primary ID or Case ID above and click Search")
-        
-        # Show sample IDs
-        if len(df) > 0:
-            st.markdown("**Sample IDs you can try:**")
-            sample_cols = st.columns(3)
-            for i, (idx, sample_row) in enumerate(df.head(3).iterrows()):
-                with sample_cols[i]:
-                    st.code(f"Primary ID: {sample_row.get('primaryid', 'NA')}\nCase ID: {sample_row.get('caseid', 'NA')}")
+        st.info("👆 Enter a Primary ID or Case ID above and click Search, or pick a case below")
+        checkpoint('browse')
+        render_case_browser(dataset, filtered_df)
         return
     
     st.markdown("---")
     
+    checkpoint('case header')
+    if row.get('probable_duplicates'):
+        st.warning(f"⚠️ Probable duplicate of Case ID(s): {row.get('probable_duplicates')}")
+    render_quality_badge(dataset, dataset.position(row))
+    
     # Administrative Section
     st.markdown('<div class="section-header">📋 Administrative Information</div>', unsafe_allow_html=True)
     
@@ -533,6 +507,12 @@ def main():
     with admin_cols4[4]:
         display_field("Occurrence Country", row.get('occr_country', 'NA'))
     
+    if st.session_state.get('data_source') == 'google_sheets':
+        render_status_update(row)
+    
+    render_version_history(dataset, row)
+    
+    checkpoint('demographics & reactions')
     # Demographics Section
     st.markdown('<div class="section-header">👤 Patient Demographics</div>', unsafe_allow_html=True)
     demo_cols = st.columns(6)
@@ -560,11 +540,15 @@ def main():
     else:
         st.info("No adverse reactions recorded")
     
+    checkpoint('drug parsing')
     # Drugs Section
     drugs = process_drug_data(row)
+    checkpoint('drug cards')
     st.markdown(f'<div class="section-header">💊 Drug Information ({len(drugs)} drugs)</div>', unsafe_allow_html=True)
     
-    for drug in drugs:
+    onset = dataset.case_onset(dataset.position(row))
+    
+    for i, drug in enumerate(drugs):
         role_class = get_role_class(drug['role_code'])
         role_label = get_role_label(drug['role_code'])
         
@@ -624,6 +608,13 @@ def main():
         with drug_cols3[4]:
             display_field("Lot Number", drug['lot_number'])
         
+        timing = onset.iloc[i] if i < len(onset) else None
+        drug_cols_tto = st.columns(5)
+        with drug_cols_tto[0]:
+            display_field("Time to Onset", format_onset(timing) if timing is not None else 'NA')
+        with drug_cols_tto[1]:
+            display_field("Exposure", format_exposure(timing) if timing is not None else 'NA')
+        
         # Row 4: Challenge and Other Info
         st.markdown("**Challenge & Regulatory**")
         drug_cols4 = st.columns(4)
@@ -640,28 +631,13 @@ def main():
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown("<br>", unsafe_allow_html=True)
     
-    # Narrative Section (if available)
-    if 'narrative' in row and pd.notna(row.get('narrative')) and str(row.get('narrative')).strip() not in ['', 'NA']:
-        st.markdown('<div class="section-header">📝 Case Narrative</div>', unsafe_allow_html=True)
-        st.markdown(f"""
-        <div style="background: white; padding: 20px; border-radius: 8px; border: 1px solid #e0e0e0; white-space: pre-wrap; font-family: monospace; font-size: 13px;">
-        {row.get('narrative', 'NA')}
-        </div>
-        """, unsafe_allow_html=True)
-    
-    # Clean Narrative Section (if different from narrative)
-    if 'narrative_clean' in row and pd.notna(row.get('narrative_clean')) and str(row.get('narrative_clean')).strip() not in ['', 'NA']:
-        clean_narrative = str(row.get('narrative_clean', ''))
-        original_narrative = str(row.get('narrative', ''))
-        
-        # Only show if different from original narrative
-        if clean_narrative != original_narrative:
-            st.markdown('<div class="section-header">📋 Cleaned Case Narrative</div>', unsafe_allow_html=True)
-            st.markdown(f"""
-            <div style="background: white; padding: 20px; border-radius: 8px; border: 1px solid #e0e0e0; white-space: pre-wrap; font-family: monospace; font-size: 13px;">
-            {clean_narrative}
-            </div>
-            """, unsafe_allow_html=True)
+    checkpoint('onset distributions')
+    render_onset_distributions(dataset, dataset.position(row))
+    
+    # Narrative Sections (if available)
+    checkpoint('narratives')
+    render_narratives(dataset, row)
 
 if __name__ == "__main__":
-    main()
+    with profiled_rerun('streamalitapp'):
+        main()
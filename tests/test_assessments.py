@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import threading
+from contextlib import closing
+
+from dsgcore.assessments import APP_DIR, AssessmentStore
+
+def _record(caseid, score):
+    return {'case_id': caseid, 'pt': 'Rash', 'drug_name': 'ASPIRIN', 'final_score': score}
+
+def test_concurrent_adds_and_reads(tmp_path):
+    store = AssessmentStore(str(tmp_path / 'assessments.sqlite3'), timeout=10)
+    errors = []
+
+    def submit(assessor):
+        try:
+            for i in range(25):
+                store.add(_record(i % 5, i), assessor, primaryid=f'{i % 5}1')
+                store.for_case(i % 5)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=submit, args=(f'assessor-{n}',)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert store.count() == 150
+    case = store.for_case(3)
+    assert len(case) == 30 and case['assessor'].nunique() == 6
+    assert case['submitted_at'].is_monotonic_decreasing
+    assert store.assessors() == [f'assessor-{n}' for n in range(6)]
+
+def test_store_is_in_wal_mode(tmp_path):
+    store = AssessmentStore(str(tmp_path / 'assessments.sqlite3'))
+    with closing(store._connect()) as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+def test_default_path_does_not_depend_on_working_directory(tmp_path):
+    code = 'from dsgcore.assessments import DEFAULT_DB_PATH; print(DEFAULT_DB_PATH)'
+    env = {k: v for k, v in os.environ.items() if k != 'DSG_ASSESSMENT_DB'}
+    env['PYTHONPATH'] = APP_DIR
+    paths = {subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env, capture_output=True, text=True,
+                            check=True).stdout.strip() for cwd in (str(tmp_path), APP_DIR)}
+    assert paths == {os.path.join(APP_DIR, 'assessments.sqlite3')}
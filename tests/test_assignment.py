@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from dsgcore.assignment import apply_assignment, plan_assignment, unassigned_mask
+from dsgcore.dataset import CaseDataset
+from dsgcore.loaders import SAMPLE_CSV, read_case_file
+from dsgcore.sources import GoogleSheetSource
+from dsgcore.writeback import FakeWorksheet, SheetWriteBack
+
+def _case_csv(assessors):
+    """Sample CSV with one case per assessor entry (blank for unassigned)"""
+    header, line = SAMPLE_CSV.splitlines()
+    lines = [line.replace('Lorrie', name).replace('102854963', f'10285496{i}').replace('10285496,', f'2000000{i},')
+             for i, name in enumerate(assessors)]
+    return '\n'.join([header] + lines).encode()
+
+def test_blank_assessors_read_from_csv_are_unassigned():
+    df = read_case_file(_case_csv(['', '', '', 'Lorrie']), 'cases.csv')
+    assert unassigned_mask(df).tolist() == [True, True, True, False]
+    assert unassigned_mask(pd.DataFrame({'assessor': ['NA', 'nan', ' ', 'Ann']})).tolist() == [True, True, True, False]
+
+def test_plan_assignment_on_loaded_file():
+    df = read_case_file(_case_csv(['', '', '', 'Lorrie']), 'cases.csv')
+    dataset = CaseDataset(df)
+    plan, summary = plan_assignment(df, dataset.effort, ['Ann', 'Bob'])
+    assert len(plan) == 3
+    assert set(plan['assessor']) == {'Ann', 'Bob'}
+    assigned = apply_assignment(df, plan, '01-02-2026')
+    assert not unassigned_mask(assigned).any()
+    assert assigned['assessor'].iloc[3] == 'Lorrie'
+
+def test_apply_assignment_keeps_missing_dates_missing():
+    df = pd.DataFrame({'primaryid': [1, 2], 'caseid': [1, 2], 'assessor': ['Ann', np.nan],
+                       'date_assignement': [np.nan, np.nan]})
+    plan = pd.DataFrame({'row': [1], 'assessor': ['Bob']})
+    out = apply_assignment(df, plan, '01-02-2026')
+    assert out['assessor'].tolist() == ['Ann', 'Bob']
+    assert out['date_assignement'].isna().tolist() == [True, False]
+
+def test_sheet_write_fields_counts_rows_written():
+    worksheet = FakeWorksheet([['primaryid', 'assessor'], ['11', ''], ['12', '']])
+    writer = SheetWriteBack(worksheet, start=False)
+    writer.set_fields(11, assessor='queued')
+    source = GoogleSheetSource('https://sheet', {}, writer=writer)
+    updates = pd.DataFrame({'primaryid': [11, 12, 99], 'assessor': ['Ann', 'Bob', 'Cat']})
+    assert source.write_fields(updates) == 2
+    assert worksheet.rows[1:] == [['11', 'Ann'], ['12', 'Bob']]
+    # The bulk write supersedes the queued edit of the same cell
+    assert writer.pending() == 0
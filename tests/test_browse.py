@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from dsgcore.browse import browse_table, sort_permutation
+
+def _table():
+    df = pd.DataFrame({'primaryid': [1, 2, 3], 'caseid': [1, 2, 3]})
+    drugs = pd.DataFrame({'row': [0, 2], 'pos': [0, 0], 'role_code': ['PS', 'PS'], 'drug_name': ['Zeta', 'Alpha']})
+    reactions = pd.Series(['Rash', 'Fall'], index=pd.MultiIndex.from_arrays([[1, 2], [0, 0]], names=['row', 'pos']))
+    return browse_table(df, drugs, reactions, np.array([0, 0, 1, 2]))
+
+def test_browse_table_keeps_missing_derived_columns_missing():
+    table = _table()
+    assert table['suspect_drug'].isna().tolist() == [False, True, False]
+    assert table['first_pt'].isna().tolist() == [True, False, False]
+
+def test_sort_permutation_puts_missing_last_both_ways():
+    table = _table()
+    assert sort_permutation(table['suspect_drug']).tolist() == [2, 0, 1]
+    assert sort_permutation(table['suspect_drug'], descending=True).tolist() == [0, 2, 1]
+    assert sort_permutation(table['first_pt'], descending=True).tolist() == [1, 2, 0]
@@ -0,0 +1,21 @@
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.dataset import CaseDataset
+from dsgcore.loaders import SAMPLE_CSV
+
+def test_prescores_of_sample_case():
+    prescore = CaseDataset(pd.read_csv(StringIO(SAMPLE_CSV))).case_prescore(0)
+    assert prescore['drug'] == 'ERIVEDGE'
+    assert prescore['q3_score'] == 1
+
+def test_prescores_without_any_drug():
+    df = pd.read_csv(StringIO(SAMPLE_CSV))
+    df[['drug_seq', 'role_cod', 'drugname']] = np.nan
+    dataset = CaseDataset(df)
+    assert len(dataset.drug_table) == 0
+    prescore = dataset.case_prescore(0)
+    assert prescore['final_score'] == 0
+    assert prescore['q2_reasoning'] == 'No suspect drug coded'
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from dsgcore.compare import compare_fields, compare_reactions, compare_suspect_drugs, parse_primaryids
+from dsgcore.dataset import CaseDataset
+
+def _dataset():
+    return CaseDataset(pd.DataFrame({
+        'primaryid': [11, 21, 31],
+        'caseid': [1, 2, 3],
+        'sex': ['F', 'F', 'M'],
+        'age': [60.0, np.nan, 60.0],
+        'drug_seq': ['1 ; 2', '1 ; 2 ; 3', '1'],
+        'role_cod': ['PS ; C', 'SS ; PS ; I', 'PS'],
+        'drugname': ['Aspirin ; METFORMIN', 'WARFARIN ; ASPIRIN ; IBUPROFEN', 'ASPIRIN'],
+        'dose_amt': ['100 ; 500', 'NA ; 300 ; 200', '100'],
+        'dose_unit': ['MG ; MG', 'NA ; MG ; MG', 'MG'],
+        'route': ['ORAL ; ORAL', 'NA ; ORAL ; NA', 'ORAL'],
+        'pt': ['Rash ; Fall', 'Fall', 'Rash ; Fall'],
+    }))
+
+def test_parse_primaryids():
+    assert parse_primaryids('11, 21;31 11') == ['11', '21', '31']
+
+def test_suspect_drugs_aligned_by_name_across_different_drug_lists():
+    dataset = _dataset()
+    table = compare_suspect_drugs([dataset.case_drugs(0), dataset.case_drugs(1)], ['A', 'B'])
+    rows = table.set_index('drug')
+    assert list(rows.index) == ['ASPIRIN', 'WARFARIN', 'IBUPROFEN']
+    assert rows.loc['ASPIRIN', 'A'] == 'PS · 100 MG · ORAL'
+    assert rows.loc['ASPIRIN', 'B'] == 'PS · 300 MG · ORAL'
+    assert rows.loc['WARFARIN'].tolist() == ['', 'SS', True]
+    assert rows.loc['IBUPROFEN', 'B'] == 'I · 200 MG'
+    assert 'METFORMIN' not in rows.index
+
+def test_identical_suspect_drugs_do_not_differ():
+    dataset = _dataset()
+    table = compare_suspect_drugs([dataset.case_drugs(0), dataset.case_drugs(2)], ['A', 'C'])
+    assert table['drug'].tolist() == ['ASPIRIN'] and not table['differs'].any()
+
+def test_reactions_union_in_first_seen_order():
+    dataset = _dataset()
+    table = compare_reactions([dataset.case_reactions(1), dataset.case_reactions(0)], ['B', 'A'])
+    assert table['reaction'].tolist() == ['Fall', 'Rash']
+    assert table['differs'].tolist() == [False, True]
+    assert table['B'].tolist() == ['✓', '']
+
+def test_fields_show_whole_floats_and_missing_values():
+    table = compare_fields(_dataset().df, [0, 1, 2], ['A', 'B', 'C'], columns=['caseid', 'sex', 'age', 'missing'])
+    rows = table.set_index('field')
+    assert list(rows.index) == ['caseid', 'sex', 'age']
+    assert rows.loc['age', ['A', 'B', 'C']].tolist() == ['60', 'NA', '60']
+    assert rows['differs'].tolist() == [True, True, True]
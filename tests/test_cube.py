@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from dsgcore.cube import CaseCube, code_dtype
+
+def _frame(n):
+    return pd.DataFrame({
+        'primaryid': np.arange(n) * 10 + 1,
+        'caseid': np.arange(n),
+        'caseversion': 1,
+        'fda_dt': 20240115,
+        'occr_country': np.where(np.arange(n) % 2, 'US', 'DE'),
+        'sex': ['F', 'M', None][:1] * n,
+        'pt': 'Rash ; Fall',
+    })
+
+def test_code_dtype():
+    assert code_dtype(2) == np.int8
+    assert code_dtype(300) == np.int16
+    assert code_dtype(70_000) == np.int32
+
+def test_cube_codes_are_compact_and_count():
+    cube = CaseCube.from_frame(_frame(400))
+    assert cube.codes['occr_country'].dtype == np.int8
+    assert cube.pt_cases.dtype == np.int16
+    assert cube.counts('occr_country').to_dict() == {'DE': 200, 'US': 200}
+    grid = cube.pivot('pt', 'occr_country')
+    assert grid.loc['Rash', 'US'] == 200
+    assert len(cube.case_rows({'occr_country': ['US'], 'pt': ['Fall']})) == 200
+
+def test_wide_dimension_gets_wider_codes():
+    df = _frame(300)
+    df['occr_country'] = [f'C{i}' for i in range(300)]
+    assert CaseCube.from_frame(df).codes['occr_country'].dtype == np.int16
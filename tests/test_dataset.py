@@ -0,0 +1,14 @@
+from dsgcore import dataset as dataset_module
+from dsgcore.dataset import CaseDataset
+from dsgcore.synthetic import synthetic_cases
+
+def test_case_highlighters_are_bounded(monkeypatch):
+    monkeypatch.setattr(dataset_module, 'HIGHLIGHTER_CACHE_SIZE', 3)
+    dataset = CaseDataset(synthetic_cases(10, seed=0))
+    first = dataset.case_highlighter(0)
+    for position in range(1, 4):
+        dataset.case_highlighter(position)
+    assert list(dataset._highlighters) == [1, 2, 3]
+    assert dataset.case_highlighter(0) is not first
+    assert dataset.case_highlighter(3) is dataset._highlighters[3]
+    assert not any(isinstance(key, tuple) and key[0] == 'highlighter' for key in dataset.derived())
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from dsgcore.dedup import deduplicate, find_probable_duplicates, latest_version_mask
+
+def test_latest_version_ranks_by_version_then_date_then_primaryid():
+    df = pd.DataFrame({
+        'caseid': [1, 1, 2, 2, 3, 3],
+        'caseversion': [1, 2, 1, 1, 1, 1],
+        'fda_dt': [20240101, 20230101, 20240101, 20240301, 20240101, 20240101],
+        'primaryid': [11, 12, 21, 22, 32, 31],
+    })
+    assert latest_version_mask(df).tolist() == [False, True, False, True, True, False]
+
+def test_missing_caseversion_ranks_below_any_version():
+    df = pd.DataFrame({'caseid': ['7', '7', '8'], 'caseversion': [np.nan, 1, np.nan], 'primaryid': [79, 71, 80]})
+    assert latest_version_mask(df).tolist() == [False, True, True]
+
+def test_every_row_is_latest_without_caseid():
+    assert latest_version_mask(pd.DataFrame({'primaryid': [1, 2]})).all()
+
+def _case(caseid, drugs, pts, suspect='ASPIRIN', country='US', age=60):
+    names = [suspect] + drugs
+    return {
+        'primaryid': caseid * 10 + 1, 'caseid': caseid, 'caseversion': 1,
+        'age': age, 'age_cod': 'YR', 'sex': 'F', 'event_dt': '20240105',
+        'drug_seq': ' ; '.join(str(i + 1) for i in range(len(names))),
+        'role_cod': ' ; '.join(['PS'] + ['C'] * len(drugs)),
+        'drugname': ' ; '.join(names),
+        'pt': ' ; '.join(pts), 'occr_country': country,
+    }
+
+def test_near_duplicates_with_different_co_medication_are_paired():
+    df = pd.DataFrame([
+        _case(100, ['METFORMIN', 'LISINOPRIL'], ['Rash', 'Pruritus']),
+        _case(200, ['METFORMIN'], ['Rash', 'Pruritus']),
+        _case(300, ['METFORMIN'], ['Rash', 'Pruritus'], suspect='IBUPROFEN'),
+        _case(400, ['METFORMIN'], ['Rash', 'Pruritus'], age=30),
+    ])
+    pairs = find_probable_duplicates(df)
+    assert pairs[['caseid_a', 'caseid_b']].values.tolist() == [['100', '200']]
+    # PTs equal (0.5), drugs 2 of 3 (0.3 * 2/3), same country (0.2)
+    assert pairs['similarity'].tolist() == [0.9]
+
+def test_cases_with_different_events_fall_below_threshold():
+    df = pd.DataFrame([
+        _case(100, ['METFORMIN'], ['Rash'], country='US'),
+        _case(200, ['LISINOPRIL'], ['Nausea'], country='FR'),
+    ])
+    assert find_probable_duplicates(df).empty
+
+def test_only_latest_versions_are_compared():
+    old = _case(100, ['METFORMIN'], ['Rash'])
+    new = dict(_case(100, ['METFORMIN'], ['Headache']), primaryid=1002, caseversion=2)
+    df = pd.DataFrame([old, new, _case(200, ['METFORMIN'], ['Rash'])])
+    assert find_probable_duplicates(df).empty
+
+def test_deduplicate_annotates_both_cases():
+    df = pd.DataFrame([_case(100, ['METFORMIN'], ['Rash']), _case(200, ['METFORMIN'], ['Rash'])])
+    annotated, pairs = deduplicate(df)
+    assert len(pairs) == 1
+    assert annotated['probable_duplicates'].tolist() == ['200', '100']
+    assert annotated['version_count'].tolist() == [1, 1]
+    assert annotated['is_latest_version'].all()
@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+
+from dsgcore.dossier import generate_dossiers, main, render_case_html
+
+def _versions():
+    return pd.DataFrame({
+        'primaryid': [5001, 5002],
+        'caseid': [500, 500],
+        'caseversion': [1, 2],
+        'fda_dt': [20240110, 20240301],
+        'drug_seq': ['1 ; 2', '1 ; 2 ; 3'],
+        'role_cod': ['PS ; C', 'PS ; C ; SS'],
+        'drugname': ['ASPIRIN ; METFORMIN', 'ASPIRIN ; METFORMIN ; IBUPROFEN'],
+        'pt': ['Rash', 'Rash ; Pruritus'],
+        'narrative': ['First report', 'Follow-up <b>report</b>'],
+    })
+
+def _read(path):
+    with open(path, encoding='utf-8') as fh:
+        return fh.read()
+
+def test_one_dossier_per_version(tmp_path):
+    stats = generate_dossiers(_versions(), str(tmp_path), workers=1, chunk_size=1)
+    assert stats['cases'] == 2
+    assert sorted(os.listdir(tmp_path)) == ['dossier_500_5001.html', 'dossier_500_5002.html']
+    first = _read(tmp_path / 'dossier_500_5001.html')
+    second = _read(tmp_path / 'dossier_500_5002.html')
+    assert 'Drug Information (2 drugs)' in first and 'IBUPROFEN' not in first
+    assert 'Drug Information (3 drugs)' in second and 'IBUPROFEN' in second
+    assert 'Pruritus' in second and 'Pruritus' not in first
+    assert 'Follow-up &lt;b&gt;report&lt;/b&gt;' in second
+    assert 'badge-ps' in second and 'badge-ss' in second
+
+def test_missing_fields_render_as_na():
+    page = render_case_html({'caseid': 7, 'primaryid': None, 'sex': float('nan')}, [], [])
+    assert '<title>Case 7 / NA</title>' in page
+    assert 'No adverse reactions recorded' in page
+    assert 'Drug Information (0 drugs)' in page
+
+def test_cli_latest_only(tmp_path):
+    source = tmp_path / 'cases.csv'
+    _versions().to_csv(source, index=False)
+    out = tmp_path / 'out'
+    main([str(source), '--out', str(out), '--latest-only', '--workers', '1'])
+    assert os.listdir(out) == ['dossier_500_5002.html']
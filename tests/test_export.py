@@ -0,0 +1,57 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from dsgcore.export import date_range_positions, export_chunks, iter_frame_chunks, prune_exports
+
+def test_parquet_keeps_integer_ids(tmp_path):
+    df = pd.DataFrame({
+        'primaryid': [102854963.0, np.nan, 102854964.0],
+        'caseid': [10285496, 10285497, 10285498],
+        'age': [58.5, np.nan, 40.0],
+        'drugname': ['A', None, 'B'],
+    })
+    path = str(tmp_path / 'cases.parquet')
+    assert export_chunks(iter_frame_chunks(df, chunksize=2), path, 'Parquet') == 3
+    table = pq.read_table(path)
+    assert str(table.schema.field('primaryid').type) == 'int64'
+    assert str(table.schema.field('caseid').type) == 'int64'
+    assert str(table.schema.field('age').type) == 'double'
+    back = table.to_pandas()
+    assert back['primaryid'].tolist()[0] == 102854963
+    assert back['primaryid'].isna().tolist() == [False, True, False]
+
+def test_prune_exports_removes_old_files(tmp_path):
+    old, new = tmp_path / 'old.csv', tmp_path / 'new.csv'
+    old.write_text('a')
+    new.write_text('b')
+    os.utime(old, (time.time() - 7200, time.time() - 7200))
+    assert prune_exports(str(tmp_path), 3600) == 1
+    assert sorted(os.listdir(tmp_path)) == ['new.csv']
+    assert prune_exports(str(tmp_path / 'missing'), 3600) == 0
+
+def test_prune_exports_only_touches_files_with_the_prefix(tmp_path):
+    mine, theirs = tmp_path / 'abc_cases.csv', tmp_path / 'xyz_cases.csv'
+    for path in (mine, theirs):
+        path.write_text('a')
+        os.utime(path, (time.time() - 7200, time.time() - 7200))
+    assert prune_exports(str(tmp_path), 3600, prefix='abc_') == 1
+    assert os.listdir(tmp_path) == ['xyz_cases.csv']
+
+def test_date_range_skips_missing_dates():
+    dates = pd.Series(['20250128', None, 'NA', '20240101'], dtype='string')
+    assert date_range_positions(dates, '2025-01-01', '2025-12-31').tolist() == [0]
+    assert date_range_positions(dates).tolist() == [0, 1, 2, 3]
+
+def test_date_range_reads_float_dates():
+    dates = pd.Series([20250128.0, np.nan, 20241231.0])
+    assert date_range_positions(dates, '2025-01-01', '2025-01-31').tolist() == [0]
+
+def test_date_range_keeps_partial_dates_overlapping_the_range():
+    dates = pd.Series(['2025', '202502', '202412', '20250301'])
+    assert date_range_positions(dates, '2025-02-15', '2025-02-20').tolist() == [0, 1]
+    assert date_range_positions(dates, start='2025-03-01').tolist() == [0, 3]
+    assert date_range_positions(dates, end='2024-12-01').tolist() == [2]
@@ -0,0 +1,35 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dsgcore.dataset import CaseDataset
+from dsgcore.metrics import MetricsRegistry
+
+def _dataset():
+    return CaseDataset(pd.DataFrame({'primaryid': [1, 2], 'pt': ['Rash', 'Fall ; Rash']}))
+
+def test_derived_lists_properties_and_memo_entries():
+    dataset = _dataset()
+    dataset.reaction_table
+    dataset.memo(('table', 1), lambda: np.zeros(4))
+    derived = dataset.derived()
+    assert 'reaction_table' in derived and ('table', 1) in derived
+    assert 'df' not in derived and '_lock' not in derived
+
+def test_dataset_sizes_while_memo_grows():
+    dataset = _dataset()
+    registry = MetricsRegistry()
+    registry.track_dataset(dataset)
+
+    def fill():
+        for i in range(2000):
+            dataset.memo(('table', i), lambda: None)
+    sizes = registry._dataset_sizes()[id(dataset)]
+    writer = threading.Thread(target=fill)
+    writer.start()
+    while writer.is_alive():
+        sizes = registry._dataset_sizes()[id(dataset)]
+    writer.join()
+    assert sizes['rows'] == 2
+    assert 'table' in registry._dataset_sizes()[id(dataset)]['indexes']
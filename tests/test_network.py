@@ -0,0 +1,54 @@
+import json
+
+import pandas as pd
+import pytest
+
+from dsgcore.dataset import CaseDataset
+from dsgcore.network import DrugNetwork, export_network
+
+def _network():
+    df = pd.DataFrame({
+        'primaryid': [11, 21, 31, 41],
+        'caseid': [1, 2, 3, 4],
+        'drug_seq': ['1 ; 2', '1 ; 2', '1 ; 2', '1 ; 2'],
+        'role_cod': ['PS ; C', 'PS ; I', 'PS ; C', 'PS ; C'],
+        'drugname': ['A ; B', 'A ; B', 'A ; C', 'B ; C'],
+        'pt': ['Rash', 'Rash ; Fall', 'Fall', 'Rash'],
+    })
+    return DrugNetwork.from_dataset(CaseDataset(df))
+
+def test_pair_counts_and_jaccard():
+    pairs = _network().pairs(min_count=1).set_index(['drug_a', 'drug_b'])
+    assert pairs['n_cases'].to_dict() == {('A', 'B'): 2, ('A', 'C'): 1, ('B', 'C'): 1}
+    assert pairs.loc[('A', 'B'), 'n_interacting'] == 1
+    assert pairs.loc[('A', 'C'), 'n_interacting'] == 0
+    assert pairs.loc[('A', 'B'), 'jaccard'] == pytest.approx(2 / 4)
+    assert pairs.loc[('A', 'C'), 'jaccard'] == pytest.approx(1 / 4)
+    assert pairs.loc[('A', 'B'), 'ratio'] == pytest.approx(2 * 4 / (3 * 3))
+
+def test_min_count_filters_pairs():
+    pairs = _network().pairs(min_count=2)
+    assert pairs[['drug_a', 'drug_b', 'n_cases']].values.tolist() == [['A', 'B', 2]]
+    assert _network().pairs(min_count=3).empty
+
+def test_triplet_counts_and_rates():
+    network = _network()
+    triplets = network.triplets(network.pairs(min_count=2)).set_index('pt')
+    assert triplets['n_cases'].to_dict() == {'Rash': 2, 'Fall': 1}
+    rash, fall = triplets.loc['Rash'], triplets.loc['Fall']
+    assert rash['pair_cases'] == 2 and rash['pair_rate'] == 1.0
+    assert rash['rate_a'] == pytest.approx(2 / 3) and rash['rate_b'] == pytest.approx(1.0)
+    assert fall['ratio_vs_single'] == pytest.approx(0.5 / (2 / 3))
+    assert len(network.triplets(network.pairs(min_count=2), min_count=2)) == 1
+
+def test_unknown_drug_in_triplets():
+    with pytest.raises(KeyError):
+        _network().triplets(pd.DataFrame({'drug_a': ['A'], 'drug_b': ['Z']}))
+
+def test_json_export(tmp_path):
+    path = str(tmp_path / 'network.json')
+    assert export_network(_network().pairs(min_count=1), path, 'JSON') == 3
+    with open(path, encoding='utf-8') as fh:
+        graph = json.load(fh)
+    assert {node['id']: node['n_cases'] for node in graph['nodes']} == {'A': 3, 'B': 3, 'C': 2}
+    assert len(graph['links']) == 3
@@ -0,0 +1,55 @@
+import json
+
+from dsgcore.profiling import active_profile, checkpoint, log_profile, profile_logger, profiled, span
+
+def _depths(profile):
+    return {s['name']: s['depth'] for s in profile.spans}
+
+def test_nested_span_depths():
+    with profiled('run') as profile:
+        with span('outer'):
+            with span('inner'):
+                with span('innermost'):
+                    pass
+        with span('second'):
+            pass
+    assert _depths(profile) == {'outer': 0, 'inner': 1, 'innermost': 2, 'second': 0}
+    assert [s['name'] for s in profile.spans] == ['outer', 'inner', 'innermost', 'second']
+    outer = profile.spans[0]
+    assert all(s['start'] >= outer['start'] for s in profile.spans[1:3])
+
+def test_checkpoint_closes_the_previous_stage():
+    with profiled() as profile:
+        checkpoint('load')
+        with span('read'):
+            pass
+        checkpoint('render')
+        with span('table'):
+            with span('cell'):
+                pass
+    assert _depths(profile) == {'load': 0, 'read': 1, 'render': 0, 'table': 1, 'cell': 2}
+    stages = {s['name']: s for s in profile.spans if s['depth'] == 0}
+    read = next(s for s in profile.spans if s['name'] == 'read')
+    # The first stage ends where the next one starts, after its spans
+    assert stages['load']['start'] + stages['load']['seconds'] <= stages['render']['start'] + 1e-6
+    assert stages['load']['start'] + stages['load']['seconds'] >= read['start'] + read['seconds']
+    assert profile.seconds >= stages['render']['start'] + stages['render']['seconds']
+
+def test_no_profile_is_a_no_op():
+    assert active_profile() is None
+    with span('ignored'):
+        checkpoint('ignored')
+    assert active_profile() is None
+
+def test_profile_log_is_json_lines(tmp_path):
+    path = str(tmp_path / 'logs' / 'profile.jsonl')
+    logger = profile_logger(path)
+    with profiled('run') as profile:
+        with span('step'):
+            pass
+    log_profile(logger, profile)
+    log_profile(logger, profile)
+    with open(path, encoding='utf-8') as fh:
+        records = [json.loads(line) for line in fh]
+    assert len(records) == 2 and records[0]['label'] == 'run'
+    assert records[0]['spans'][0]['name'] == 'step'
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from dsgcore.quality import validate_frame
+
+def _date_issues(values):
+    issues = validate_frame(pd.DataFrame({'event_dt': values}))
+    return issues.loc[issues['check'] == 'invalid date', 'row'].tolist()
+
+def test_dates_must_be_exactly_four_six_or_eight_digits():
+    values = ['2008', '200801', '20080131', '20081', '202501281', 'abc2008', '2008-01', '20080230', '', 'NA', None]
+    assert _date_issues(values) == [3, 4, 5, 6, 7]
+
+def test_numeric_date_columns():
+    assert _date_issues([20080131.0, 2008.0, np.nan, 2008.5]) == [3]
+
+def test_packed_date_entries():
+    df = pd.DataFrame({'start_dt': ['2008 ; NA ; 20081', 'NA ; NA', '20080101']})
+    issues = validate_frame(df)
+    assert issues['row'].tolist() == [0]
+    assert issues['detail'].tolist() == ['Invalid date 20081 (drug 3)']
@@ -0,0 +1,42 @@
+from dsgcore.dataset import CaseDataset
+from dsgcore.dedup import deduplicate
+from dsgcore.signals import IncrementalSignals, dataset_counts
+from dsgcore.synthetic import synthetic_cases
+
+def _pairs(counts):
+    return counts.pairs.set_index(['drug', 'pt'])['a'].sort_index()
+
+def test_apply_without_deltas_is_a_no_op():
+    dataset = CaseDataset(deduplicate(synthetic_cases(50, seed=1, drugs=40, pts=30, narrative_kb=0.1))[0])
+    signals = IncrementalSignals(dataset_counts(dataset))
+    scores = signals.scores
+    assert signals.apply()['rescored'] == 0
+    assert signals.scores is scores
+
+def test_extend_updates_signals_like_a_rebuild():
+    cases = synthetic_cases(400, seed=2, drugs=60, pts=40, narrative_kb=0.1)
+    first = cases['caseid'].isin(cases['caseid'].drop_duplicates().iloc[:300])
+    base = CaseDataset(deduplicate(cases[first].reset_index(drop=True))[0])
+    base.signals()
+    extended = base.extend(deduplicate(cases[~first].reset_index(drop=True))[0])
+
+    signals = extended.signals()
+    assert signals.last_update is not None
+    rebuilt = dataset_counts(CaseDataset(deduplicate(cases)[0]))
+    assert _pairs(signals.counts).equals(_pairs(rebuilt))
+    assert signals.counts.n == rebuilt.n
+    # The base dataset keeps its own table
+    assert base.signals().last_update is None
+    assert len(extended) == len(cases)
+
+def test_extend_with_newer_versions_of_loaded_cases():
+    cases = synthetic_cases(400, seed=3, drugs=60, pts=40, version_rate=0.4, narrative_kb=0.1)
+    cases = cases.sort_values('caseversion', kind='stable').reset_index(drop=True)
+    base = CaseDataset(deduplicate(cases.iloc[:300].reset_index(drop=True))[0])
+    base.signals()
+    batch = cases.iloc[300:].reset_index(drop=True)
+    assert batch['caseid'].isin(base.df['caseid']).any()
+    signals = base.extend(deduplicate(batch)[0]).signals()
+    rebuilt = dataset_counts(CaseDataset(deduplicate(cases)[0]))
+    assert _pairs(signals.counts).equals(_pairs(rebuilt))
+    assert signals.counts.n == rebuilt.n
@@ -0,0 +1,68 @@
+from io import StringIO
+
+import pandas as pd
+
+from dsgcore.loaders import SAMPLE_CSV
+from dsgcore.merge import align_frames
+from dsgcore.sources import CsvSource, type_columns
+
+CSV = SAMPLE_CSV + '\n' + SAMPLE_CSV.splitlines()[1].replace('Lorrie', '').replace('102854963', '102854964')
+
+def test_csv_source_keeps_missing_values_of_read_csv():
+    expected = pd.read_csv(StringIO(CSV))
+    df = CsvSource(CSV.encode(), 'cases.csv').read_raw()
+    assert list(df.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(df.isna(), expected.isna())
+    assert not df.astype(str).isin(['nan', 'None', '<NA>']).where(df.notna(), False).any().any()
+
+def test_csv_source_chunks_keep_missing_values():
+    chunks = list(CsvSource(CSV.encode(), 'cases.csv').iter_chunks(chunk_rows=1))
+    df = pd.concat(chunks, ignore_index=True)
+    assert df['assessor'].isna().tolist() == [False, True]
+    assert df['status'].isna().all()
+
+def test_type_columns_text_with_missing():
+    df = type_columns(pd.DataFrame({'a': ['x', None, float('nan')], 'b': ['1', None, '3']}))
+    assert df['a'].isna().tolist() == [False, True, True]
+    assert df['b'].tolist()[0] == 1 and df['b'].isna().tolist() == [False, True, False]
+
+def test_align_frames_leaves_absent_columns_missing():
+    first = pd.DataFrame({'primaryid': [1], 'assessor': ['Ann']})
+    second = pd.DataFrame({'primaryid': [2]})
+    merged = align_frames([first, second], ['a.csv', 'b.csv'])
+    assert merged['assessor'].tolist()[0] == 'Ann'
+    assert merged['assessor'].isna().tolist() == [False, True]
+
+def test_upload_of_compressed_csv_keeps_every_column():
+    import gzip
+    from dsgcore.loaders import upload_source
+    lines = CSV.splitlines()
+    extra = '\n'.join([lines[0] + ',extra'] + [line + ',x' for line in lines[1:]])
+    expected = pd.read_csv(StringIO(extra))
+    df = upload_source(gzip.compress(extra.encode()), 'cases.csv.gz').read_raw()
+    pd.testing.assert_frame_equal(df, expected)
+
+def test_csv_source_projects_only_when_asked():
+    df = CsvSource(CSV.encode(), 'cases.csv', columns=['primaryid', 'missing']).read_raw()
+    assert list(df.columns) == ['primaryid']
+
+def test_merge_report_sums_per_file_parse_times():
+    from dsgcore.merge import merge_sources
+    second = CSV.replace('102854963', '102854965')
+    df, report = merge_sources([CsvSource(CSV.encode(), 'a.csv'), CsvSource(second.encode(), 'b.csv')], workers=1)
+    assert report['summed_file_seconds'] == sum(f['seconds'] for f in report['files'])
+    assert 'speedup' not in report and 'serial_parse_seconds' not in report
+
+def test_sqlite_label_does_not_change_when_read(tmp_path):
+    import sqlite3
+    from dsgcore.sources import SQLiteSource
+    path = str(tmp_path / 'cases.db')
+    with sqlite3.connect(path) as conn:
+        pd.read_csv(StringIO(CSV)).to_sql('cases', conn, index=False)
+    source = SQLiteSource(path)
+    label = source.label
+    assert len(source.read_raw()) == 2
+    assert source.label == label == 'cases.db'
+    updates = pd.DataFrame({'primaryid': [102854963], 'status': ['done']})
+    assert source.write_fields(updates) == 1
+    assert source.read_raw()['status'].tolist()[0] == 'done'
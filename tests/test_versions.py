@@ -0,0 +1,43 @@
+import pandas as pd
+
+from dsgcore.dataset import CaseDataset
+from dsgcore.versions import build_version_index, diff_case_fields, diff_drug_tables
+
+def _version(primaryid, version, seqs, names, roles, doses):
+    return {
+        'primaryid': primaryid, 'caseid': 500, 'caseversion': version, 'fda_dt': 20240100 + version,
+        'drug_seq': ' ; '.join(seqs), 'drugname': ' ; '.join(names),
+        'role_cod': ' ; '.join(roles), 'dose_vbm': ' ; '.join(doses), 'pt': 'Rash',
+    }
+
+def _dataset():
+    return CaseDataset(pd.DataFrame([
+        _version(5001, 1, ['1', '2', '3'], ['ASPIRIN', 'METFORMIN', 'LISINOPRIL'], ['PS', 'C', 'C'], ['100 MG', '500 MG', '10 MG']),
+        _version(5002, 2, ['1', '3', '4'], ['ASPIRIN', 'LISINOPRIL', 'IBUPROFEN'], ['PS', 'SS', 'C'], ['300 MG', '10 MG', '200 MG']),
+    ]))
+
+def test_version_index_orders_versions_oldest_first():
+    df = _dataset().df
+    assert {k: v.tolist() for k, v in build_version_index(df.iloc[::-1]).items()} == {'500': [1, 0]}
+    assert {k: v.tolist() for k, v in build_version_index(df.iloc[[0]]).items()} == {'500': [0]}
+
+def test_drug_diff_lists_added_removed_and_changed_drugs():
+    dataset = _dataset()
+    diff = diff_drug_tables(dataset.case_drugs(0), dataset.case_drugs(1)).set_index('sequence')
+    assert diff.loc['2', 'change'] == 'removed' and diff.loc['2', 'drug_name'] == 'METFORMIN'
+    assert diff.loc['4', 'change'] == 'added' and diff.loc['4', 'drug_name'] == 'IBUPROFEN'
+    assert diff.loc['1', 'change'] == 'changed' and '100 MG → 300 MG' in diff.loc['1', 'details']
+    assert diff.loc['3', 'change'] == 'changed' and 'C → SS' in diff.loc['3', 'details']
+    assert len(diff) == 4
+
+def test_single_version_has_no_changes():
+    dataset = _dataset()
+    drugs = dataset.case_drugs(0)
+    assert diff_drug_tables(drugs, drugs).empty
+    assert list(diff_drug_tables(drugs, drugs).columns) == ['sequence', 'drug_name', 'change', 'details']
+    assert diff_case_fields(dataset.df, 0, 0).empty
+
+def test_case_field_diff():
+    diff = diff_case_fields(_dataset().df, 0, 1).set_index('field')
+    assert diff.loc['caseversion'].tolist() == ['1', '2']
+    assert 'drugname' not in diff.index and 'pt' not in diff.index
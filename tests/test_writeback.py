@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dsgcore import writeback
+from dsgcore.writeback import FakeWorksheet, SheetLayoutError, SheetWriteBack, sheet_key
+
+def _sheet():
+    return FakeWorksheet([['primaryid', 'status', 'assessor'], ['11', '', ''], ['12', '', ''], ['13', '', '']])
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(writeback.time, 'sleep', delays.append)
+    monkeypatch.setattr(writeback.random, 'uniform', lambda low, high: 0)
+    return delays
+
+def test_repeated_edits_of_a_cell_coalesce():
+    worksheet = _sheet()
+    writer = SheetWriteBack(worksheet, start=False)
+    writer.set_fields(11, status='open')
+    writer.set_fields(11, status='done')
+    assert writer.pending() == 1
+    writer.flush()
+    assert worksheet.rows[1] == ['11', 'done', '']
+    assert writer.flushed_cells == 1
+
+def test_all_edits_go_in_one_batch_update():
+    worksheet = _sheet()
+    writer = SheetWriteBack(worksheet, start=False)
+    for key in (11, 12, 13):
+        writer.set_fields(key, status='done', assessor='Ann')
+    writer.flush()
+    layout_calls = worksheet.calls - 1
+    assert layout_calls == 2  # header row and key column
+    assert [row[1:] for row in worksheet.rows[1:]] == [['done', 'Ann']] * 3
+    writer.set_fields(12, status='open')
+    calls = worksheet.calls
+    writer.flush()
+    assert worksheet.calls == calls + 1
+
+def test_float_keys_match_the_sheet():
+    assert sheet_key(102854963.0) == '102854963'
+    assert sheet_key(np.float64(12.0)) == '12'
+    assert sheet_key('12.0') == '12'
+    assert sheet_key(' 12 ') == '12'
+    worksheet = _sheet()
+    writer = SheetWriteBack(worksheet, start=False)
+    # primaryid read as float next to a blank id
+    writer.set_fields(pd.Series([12, np.nan]).iloc[0], status='done')
+    writer.flush()
+    assert worksheet.rows[2][1] == 'done'
+
+def test_failed_writes_back_off_and_retry(sleeps):
+    worksheet = _sheet()
+    writer = SheetWriteBack(worksheet, start=False, max_retries=3, backoff=1.0)
+    writer.set_fields(11, status='done')
+    worksheet.fail_next = 2
+    writer.flush()
+    assert sleeps == [1.0, 2.0]
+    assert worksheet.rows[1][1] == 'done'
+    assert writer.last_error is None
+
+def test_exhausted_retries_requeue_with_newer_edits_winning(sleeps):
+    worksheet = _sheet()
+    writer = SheetWriteBack(worksheet, start=False, max_retries=1, backoff=1.0)
+    writer.set_fields(11, status='open')
+    writer.set_fields(12, status='open')
+    worksheet.fail_next = 2
+    original = worksheet.batch_update
+
+    def edit_during_failure(data):
+        writer.set_fields(11, status='done')
+        return original(data)
+    worksheet.batch_update = edit_during_failure
+    with pytest.raises(ConnectionError):
+        writer.flush()
+    assert writer.pending() == 2
+    assert writer.last_error == 'simulated API failure'
+    worksheet.batch_update = original
+    writer.flush()
+    assert [row[1] for row in worksheet.rows[1:]] == ['done', 'open', '']
+
+def test_missing_key_column_fails_once_without_requeue():
+    worksheet = FakeWorksheet([['caseid', 'status'], ['1', '']])
+    writer = SheetWriteBack(worksheet, start=False)
+    writer.set_fields(11, status='done')
+    with pytest.raises(SheetLayoutError):
+        writer.flush()
+    assert writer.pending() == 0
+    assert 'primaryid' in writer.last_error
+    writer.flush()  # nothing left to retry
+
+def test_unknown_keys_do_not_reload_the_layout_until_asked():
+    worksheet = _sheet()
+    writer = SheetWriteBack(worksheet, start=False)
+    writer.set_fields(99, status='done')
+    writer.flush()
+    calls = worksheet.calls
+    writer.set_fields(99, status='done')
+    writer.set_fields(11, status='open')
+    writer.flush()
+    assert worksheet.calls == calls + 1  # the batch_update only
+    worksheet.rows.append(['99', '', ''])
+    writer.reload_layout()
+    writer.set_fields(99, status='done')
+    writer.flush()
+    assert worksheet.rows[4] == ['99', 'done', '']
+
+def test_concurrent_writes_and_flushes_read_the_layout_once():
+    import threading
+    worksheet = _sheet()
+    header_reads = []
+    row_values = worksheet.row_values
+    worksheet.row_values = lambda row: header_reads.append(row) or row_values(row)
+    writer = SheetWriteBack(worksheet, start=False)
+    barrier = threading.Barrier(8)
+
+    def work(n):
+        barrier.wait()
+        if n % 2:
+            writer.write({(11 + n % 3, 'status'): f'w{n}'})
+        else:
+            writer.set_fields(11 + n % 3, assessor=f'a{n}')
+            writer.flush()
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert header_reads == [1]
+    assert all(row[1] and row[2] for row in worksheet.rows[1:])